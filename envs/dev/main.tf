@@ -28,11 +28,14 @@ module "multi_account_mode" {
   count  = var.multi_account_mode ? 1 : 0
   source = "../../modules/multi_account_mode"
 
+  account_roster_bucket_arn    = module.savings_tracking_infrastructure.s3_storage_bucket_arn
+  account_roster_bucket_name   = module.savings_tracking_infrastructure.s3_storage_bucket_name
   dynamodb_accounts_table_name = module.core_infrastructure.account_table_name
   dynamodb_accounts_table_arn  = module.core_infrastructure.account_table_arn
   env                          = var.env
   inactive_accounts_list       = var.inactive_accounts_list
   management_account_role_arn  = var.management_account_role_arn
+  organization_events          = var.organization_events
   short_region                 = local.short_region
   sns_topic_arn                = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -46,9 +49,10 @@ module "multi_account_mode" {
 module "savings_tracking_infrastructure" {
   source = "../../modules/savings_tracking_infra"
 
-  account_id   = local.deployment_account_id
-  env          = var.env
-  short_region = local.short_region
+  account_id             = local.deployment_account_id
+  env                    = var.env
+  point_in_time_recovery = var.report_source == "export"
+  short_region           = local.short_region
   tags = merge(
     var.tags,
     {
@@ -60,11 +64,16 @@ module "savings_tracking_infrastructure" {
 module "ami_inventory" {
   source = "../../modules/aws/ami_inventory"
 
+  account_roster_bucket_arn         = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_arn : ""
+  account_roster_bucket_name        = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_name : ""
   account_table_name                = module.core_infrastructure.account_table_name
   account_table_arn                 = module.core_infrastructure.account_table_arn
   active_regions                    = var.active_regions
+  cost_timeseries_table_arn         = module.savings_tracking_infrastructure.resource_cost_timeseries_table_arn
+  cost_timeseries_table_name        = module.savings_tracking_infrastructure.resource_cost_timeseries_table_name
   cross_account_inventory_role_name = var.cross_account_inventory_role_name
   env                               = var.env
+  event_driven_cleanup              = var.event_driven_cleanup && !var.ami_cleanup_dry_run
   short_region                      = local.short_region
   sns_topic_arn                     = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -82,10 +91,14 @@ module "ami_cleanup" {
   account_table_arn               = module.core_infrastructure.account_table_arn
   ami_table_name                  = module.ami_inventory.ami_inventory_table_name
   ami_table_arn                   = module.ami_inventory.ami_inventory_table_arn
+  ami_table_stream_arn            = module.ami_inventory.ami_inventory_table_stream_arn
   cleanup_savings_table_arn       = module.savings_tracking_infrastructure.resource_cleanup_savings_table_arn
   cleanup_savings_table_name      = module.savings_tracking_infrastructure.resource_cleanup_savings_table_name
+  cleanup_total_segments          = var.cleanup_total_segments
   cross_account_cleanup_role_name = var.cross_account_cleanup_role_name
+  dry_run                         = var.ami_cleanup_dry_run
   env                             = var.env
+  event_driven_cleanup            = var.event_driven_cleanup && !var.ami_cleanup_dry_run
   short_region                    = local.short_region
   sns_topic_arn                   = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -99,11 +112,17 @@ module "ami_cleanup" {
 module "ebs_snapshot_inventory" {
   source = "../../modules/aws/ebs_snapshot_inventory"
 
+  account_roster_bucket_arn         = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_arn : ""
+  account_roster_bucket_name        = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_name : ""
   account_table_name                = module.core_infrastructure.account_table_name
   account_table_arn                 = module.core_infrastructure.account_table_arn
   active_regions                    = var.active_regions
+  cost_timeseries_table_arn         = module.savings_tracking_infrastructure.resource_cost_timeseries_table_arn
+  cost_timeseries_table_name        = module.savings_tracking_infrastructure.resource_cost_timeseries_table_name
   cross_account_inventory_role_name = var.cross_account_inventory_role_name
   env                               = var.env
+  event_driven_cleanup              = var.event_driven_cleanup
+  point_in_time_recovery            = var.report_source == "export"
   short_region                      = local.short_region
   sns_topic_arn                     = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -121,10 +140,13 @@ module "ebs_snapshot_cleanup" {
   account_table_arn               = module.core_infrastructure.account_table_arn
   ebs_snapshot_table_name         = module.ebs_snapshot_inventory.ebs_snapshot_dynamodb_table_name
   ebs_snapshot_table_arn          = module.ebs_snapshot_inventory.ebs_snapshot_dynamodb_table_arn
+  ebs_snapshot_table_stream_arn   = module.ebs_snapshot_inventory.ebs_snapshot_dynamodb_table_stream_arn
   cleanup_savings_table_arn       = module.savings_tracking_infrastructure.resource_cleanup_savings_table_arn
   cleanup_savings_table_name      = module.savings_tracking_infrastructure.resource_cleanup_savings_table_name
+  cleanup_total_segments          = var.cleanup_total_segments
   cross_account_cleanup_role_name = var.cross_account_cleanup_role_name
   env                             = var.env
+  event_driven_cleanup            = var.event_driven_cleanup
   short_region                    = local.short_region
   sns_topic_arn                   = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -138,11 +160,17 @@ module "ebs_snapshot_cleanup" {
 module "ebs_volume_inventory" {
   source = "../../modules/aws/ebs_volume_inventory"
 
+  account_roster_bucket_arn         = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_arn : ""
+  account_roster_bucket_name        = var.multi_account_mode ? module.savings_tracking_infrastructure.s3_storage_bucket_name : ""
   account_table_name                = module.core_infrastructure.account_table_name
   account_table_arn                 = module.core_infrastructure.account_table_arn
   active_regions                    = var.active_regions
+  cost_timeseries_table_arn         = module.savings_tracking_infrastructure.resource_cost_timeseries_table_arn
+  cost_timeseries_table_name        = module.savings_tracking_infrastructure.resource_cost_timeseries_table_name
   cross_account_inventory_role_name = var.cross_account_inventory_role_name
   env                               = var.env
+  event_driven_cleanup              = var.event_driven_cleanup
+  point_in_time_recovery            = var.report_source == "export"
   short_region                      = local.short_region
   sns_topic_arn                     = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -160,10 +188,13 @@ module "ebs_volume_cleanup" {
   account_table_arn               = module.core_infrastructure.account_table_arn
   ebs_volume_table_name           = module.ebs_volume_inventory.detached_ebs_volume_inventory_table_name
   ebs_volume_table_arn            = module.ebs_volume_inventory.detached_ebs_volume_inventory_table_arn
+  ebs_volume_table_stream_arn     = module.ebs_volume_inventory.detached_ebs_volume_inventory_table_stream_arn
   cleanup_savings_table_arn       = module.savings_tracking_infrastructure.resource_cleanup_savings_table_arn
   cleanup_savings_table_name      = module.savings_tracking_infrastructure.resource_cleanup_savings_table_name
+  cleanup_total_segments          = var.cleanup_total_segments
   cross_account_cleanup_role_name = var.cross_account_cleanup_role_name
   env                             = var.env
+  event_driven_cleanup            = var.event_driven_cleanup
   short_region                    = local.short_region
   sns_topic_arn                   = module.core_infrastructure.idp_automation_sns_topic
   tags = merge(
@@ -177,11 +208,14 @@ module "ebs_volume_cleanup" {
 module "savings_reports" {
   source = "../../modules/aws/savings_reports"
 
+  account_table_arn           = module.core_infrastructure.account_table_arn
+  account_table_name          = module.core_infrastructure.account_table_name
   ebs_volume_table_arn        = module.ebs_volume_inventory.detached_ebs_volume_inventory_table_arn
   ebs_volume_table_name       = module.ebs_volume_inventory.detached_ebs_volume_inventory_table_name
   ebs_snapshot_table_arn      = module.ebs_snapshot_inventory.ebs_snapshot_dynamodb_table_arn
   ebs_snapshot_table_name     = module.ebs_snapshot_inventory.ebs_snapshot_dynamodb_table_name
   env                         = var.env
+  report_source               = var.report_source
   resource_savings_table_arn  = module.savings_tracking_infrastructure.resource_cleanup_savings_table_arn
   resource_savings_table_name = module.savings_tracking_infrastructure.resource_cleanup_savings_table_name
   s3_storage_bucket_arn       = module.savings_tracking_infrastructure.s3_storage_bucket_arn
@@ -196,6 +230,25 @@ module "savings_reports" {
   )
 }
 
+module "savings_rollups" {
+  source = "../../modules/aws/savings_rollups"
+
+  env                               = var.env
+  resource_savings_table_arn        = module.savings_tracking_infrastructure.resource_cleanup_savings_table_arn
+  resource_savings_table_name       = module.savings_tracking_infrastructure.resource_cleanup_savings_table_name
+  resource_savings_table_stream_arn = module.savings_tracking_infrastructure.resource_cleanup_savings_table_stream_arn
+  savings_rollup_table_arn          = module.savings_tracking_infrastructure.resource_cleanup_savings_rollups_table_arn
+  savings_rollup_table_name         = module.savings_tracking_infrastructure.resource_cleanup_savings_rollups_table_name
+  short_region                      = local.short_region
+  sns_topic_arn                     = module.core_infrastructure.idp_automation_sns_topic
+  tags = merge(
+    var.tags,
+    {
+      module = "aws/savings_rollups"
+    }
+  )
+}
+
 module "http_requests_python313" {
   source = "../../modules/http_requests"
 }
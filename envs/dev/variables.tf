@@ -4,12 +4,24 @@ variable "active_regions" {
   default     = "us-west-1, us-west-2, us-east-1, us-east-2"
 }
 
+variable "ami_cleanup_dry_run" {
+  description = "Only check that AMIs could be deregistered, without deregistering them. AMIs stay on the scheduled cleanup while this is on"
+  type        = bool
+  default     = true
+}
+
 variable "aws_region" {
   description = "AWS region in which to deploy."
   type        = string
   default     = "us-east-1"
 }
 
+variable "cleanup_total_segments" {
+  description = "Number of concurrent worker invocations each cleanup Lambda fans out over (1 disables fan-out)"
+  type        = number
+  default     = 1
+}
+
 variable "cross_account_inventory_role_name" {
   description = "Name of the role to assume in target accounts to perform resource cleanup"
   type        = string
@@ -26,6 +38,12 @@ variable "env" {
   default     = "dev"
 }
 
+variable "event_driven_cleanup" {
+  description = "Expire due inventory records with DynamoDB TTL and clean up resources from the table streams"
+  type        = bool
+  default     = false
+}
+
 variable "inactive_accounts_list" {
   description = "List of AWS account IDs to exclude from the accounts table"
   type        = string
@@ -43,6 +61,18 @@ variable "multi_account_mode" {
   default     = false
 }
 
+variable "organization_events" {
+  description = "Update accounts from Organizations events forwarded by the management account, with the full account pull run weekly to reconcile"
+  type        = bool
+  default     = false
+}
+
+variable "report_source" {
+  description = "Where the savings reports read the tables from, scan or export (enables point-in-time recovery on the report tables)"
+  type        = string
+  default     = "scan"
+}
+
 variable "sns_contact_email" {
   description = "Email address to subscribe to SNS topic for notifications"
   type        = string
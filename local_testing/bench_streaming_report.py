@@ -0,0 +1,176 @@
+"""
+Benchmark the streaming savings report writer against the previous approach of
+building every row in a list and writing the whole CSV to /tmp before uploading.
+
+Synthetic savings records are generated lazily and S3 is replaced by a client that
+only counts the bytes it receives, so the numbers reflect the report pipeline alone.
+
+Example:
+    python local_testing/bench_streaming_report.py --rows 1000000 --gzip
+"""
+import argparse
+import csv
+import importlib.util
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+LAMBDA_PATH = os.path.join(os.path.dirname(__file__), '..', 'modules', 'aws', \
+    'savings_reports', 'lambda_code', 'lambda_function.py')
+
+class CountingS3Client:
+    """Accepts uploads and keeps only their sizes."""
+
+    def __init__(self):
+        self.bytes_received = 0
+        self.parts = 0
+
+    def put_object(self, Body, **kwargs):
+        self.bytes_received += len(Body)
+        self.parts += 1
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'local'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        self.bytes_received += len(Body)
+        self.parts += 1
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+def load_report_module(gzip_reports):
+    """
+    Import the savings report Lambda with placeholder environment settings.
+    Args:
+        gzip_reports (bool): Whether the reports are gzipped.
+    Returns:
+        module: The imported Lambda function module.
+    """
+    os.environ.setdefault('EBS_VOLUME_TABLE', 'local')
+    os.environ.setdefault('EBS_SNAPSHOT_TABLE', 'local')
+    os.environ.setdefault('CLEANUP_SAVINGS_TABLE', 'local')
+    os.environ.setdefault('S3_BUCKET', 'local')
+    os.environ['REPORT_GZIP'] = 'true' if gzip_reports else 'false'
+
+    spec = importlib.util.spec_from_file_location('savings_reports', LAMBDA_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def generate_savings_items(row_count):
+    """
+    Generate cleanup savings records shaped like the DynamoDB scan output.
+    Args:
+        row_count (int): Number of records to generate.
+    Yields:
+        dict: A savings record in DynamoDB-JSON format.
+    """
+    for index in range(row_count):
+        is_volume = index % 2 == 0
+        item = {
+            'ResourceId': {'S': f"{'vol' if is_volume else 'snap'}-{index:017x}"},
+            'ResourceType': {'S': 'EBS Volume' if is_volume else 'EBS Snapshot'},
+            'ResourceState': {'S': 'available' if is_volume else 'completed'},
+            'AccountId': {'S': f'{100000000000 + index % 500}'},
+            'AccountName': {'S': f'account-{index % 500}'},
+            'ResourceRegion': {'S': ('us-west-2', 'us-east-1', 'us-east-2')[index % 3]},
+            'ExceptionFlag': {'S': 'False'},
+            'VolumeSize': {'N': str(8 + index % 500)},
+            'DeletionDate': {'S': f'2025-{1 + index % 12:02d}-{1 + index % 28:02d}'},
+            'MonthlyCost': {'N': f'{(index % 1000) / 10:.2f}'}
+        }
+        if is_volume:
+            item['VolumeType'] = {'S': 'gp3'}
+            item['VolumeIops'] = {'N': '3000'}
+            item['VolumeThroughput'] = {'N': '125'}
+        else:
+            item['StorageTier'] = {'S': 'standard'}
+        yield item
+
+def run_streaming(report_module, row_count):
+    """
+    Run the streaming report writer.
+    Args:
+        report_module (module): The savings report Lambda module.
+        row_count (int): Number of records to report on.
+    Returns:
+        int: Bytes uploaded.
+    """
+    s3_client = CountingS3Client()
+    rows = report_module.get_resource_savings_rows(generate_savings_items(row_count))
+    report_module.write_report(s3_client, report_module.FILE_NAME, report_module.SAVINGS_FIELDNAMES, rows)
+    return s3_client.bytes_received
+
+def run_materialized(report_module, row_count):
+    """
+    Run the previous approach of a list of rows written to a temporary file.
+    Args:
+        report_module (module): The savings report Lambda module.
+        row_count (int): Number of records to report on.
+    Returns:
+        int: Bytes written.
+    """
+    items = list(generate_savings_items(row_count))
+    csv_data = list(report_module.get_resource_savings_rows(items))
+
+    with tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', suffix='.csv') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=report_module.SAVINGS_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(csv_data)
+        csvfile.flush()
+        return os.path.getsize(csvfile.name)
+
+def measure(run, report_module, row_count):
+    """
+    Measure the wall time and peak resident memory of a report run.
+    Each run happens in its own forked process so its peak is not mixed up with
+    the other writer's.
+    Args:
+        run (function): The report run to measure.
+        report_module (module): The savings report Lambda module.
+        row_count (int): Number of records to report on.
+    Returns:
+        tuple: Seconds elapsed, peak resident memory in MiB and bytes produced.
+    """
+    def run_in_child(result_queue):
+        start = time.perf_counter()
+        bytes_produced = run(report_module, row_count)
+        elapsed = time.perf_counter() - start
+        peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result_queue.put((elapsed, peak_kib / 1024, bytes_produced))
+
+    context = multiprocessing.get_context('fork')
+    result_queue = context.Queue()
+    process = context.Process(target=run_in_child, args=(result_queue,))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming savings report writer.')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of savings records')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the streamed report')
+    parser.add_argument('--skip-materialized', action='store_true', help='Only run the streaming writer')
+    args = parser.parse_args()
+
+    report_module = load_report_module(args.gzip)
+
+    runs = [('streaming', run_streaming)]
+    if not args.skip_materialized:
+        runs.append(('materialized', run_materialized))
+
+    print(f"{'writer':<14}{'rows':>10}{'seconds':>10}{'peak RSS MiB':>14}{'MiB out':>10}")
+    for name, run in runs:
+        elapsed, peak_mib, bytes_produced = measure(run, report_module, args.rows)
+        print(f"{name:<14}{args.rows:>10}{elapsed:>10.1f}{peak_mib:>14.1f}{bytes_produced / (1024 * 1024):>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark the HCP Terraform workspace sync against the local API stand-in.
+
+For each organization size, runs get_all_workspaces and create_workspace_records
+against tfc_api_stand_in.py, with DynamoDB replaced by an in-memory table that
+counts the writes it receives. Each size is synced three times: into an empty
+table, again with nothing changed, and after a share of the workspaces changed
+and some were deleted.
+
+Example:
+    python local_testing/bench_workspace_sync.py --sizes 1000 10000 50000 --latency 0.05 --throttle-rate 0.02
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+from tfc_api_stand_in import get_api_url, start_stand_in
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', 'modules', 'hcp', \
+    'terraform_workspaces', 'lambda_code', 'terraform_workspaces')
+
+class FakeDynamoDBClient:
+    """Keeps workspace items in memory and counts the writes made to them."""
+
+    def __init__(self):
+        self.items = {}
+        self.puts = 0
+        self.deletes = 0
+        self.batch_calls = 0
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, TableName, ProjectionExpression=None, **kwargs):
+        items = list(self.items.values())
+        for start in range(0, len(items), 1000):
+            yield {'Items': items[start:start + 1000]}
+
+    def batch_write_item(self, RequestItems):
+        self.batch_calls += 1
+        for write_requests in RequestItems.values():
+            for write_request in write_requests:
+                if 'PutRequest' in write_request:
+                    item = write_request['PutRequest']['Item']
+                    self.items[item['WorkspaceId']['S']] = item
+                    self.puts += 1
+                else:
+                    del self.items[write_request['DeleteRequest']['Key']['WorkspaceId']['S']]
+                    self.deletes += 1
+        return {'UnprocessedItems': {}}
+
+def load_workspace_module(api_url):
+    """
+    Import the workspace Lambda pointed at the stand-in.
+    Args:
+        api_url (str): API root of the running stand-in.
+    Returns:
+        module: The imported Lambda function module.
+    """
+    os.environ['HCP_ORG_ID'] = 'local'
+    os.environ['HCP_API_URL'] = api_url
+    sys.path.insert(0, LAMBDA_DIR)
+
+    spec = importlib.util.spec_from_file_location('terraform_workspaces', os.path.join(LAMBDA_DIR, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_sync(workspace_module, dynamodb_client, server):
+    """
+    Run one fetch and table sync.
+    Args:
+        workspace_module (module): The workspace Lambda module.
+        dynamodb_client (FakeDynamoDBClient): The in-memory table.
+        server (ThreadingHTTPServer): The running stand-in.
+    Returns:
+        dict: Timings, request counts and writes of the run.
+    """
+    hcp_api_client = workspace_module.hcp_api_client
+    requests_before = server.state['requests']
+    puts_before, deletes_before = dynamodb_client.puts, dynamodb_client.deletes
+
+    start = time.perf_counter()
+    client = hcp_api_client.create_client('local', workspace_module.WORKSPACE_FETCH_WORKERS, workspace_module.BASE_URL)
+    workspaces, complete = workspace_module.get_all_workspaces('local', client)
+    hcp_api_client.close_client(client)
+    fetch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    workspace_module.create_workspace_records(workspaces, complete, dynamodb_client)
+    sync_seconds = time.perf_counter() - start
+
+    metrics = hcp_api_client.get_metrics(client)
+    return {
+        'fetch_seconds': fetch_seconds,
+        'sync_seconds': sync_seconds,
+        'requests': server.state['requests'] - requests_before,
+        'retries': metrics['Retries'],
+        'complete': complete,
+        'writes': dynamodb_client.puts - puts_before + dynamodb_client.deletes - deletes_before
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the workspace sync against the local API stand-in.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Organization sizes')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds each page takes to serve')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Retry-After seconds sent with each 429')
+    parser.add_argument('--churn', type=float, default=0.01, help='Share of workspaces changed before the last run')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent page fetches')
+    args = parser.parse_args()
+
+    os.environ['WORKSPACE_FETCH_WORKERS'] = str(args.workers)
+    print(f"{'workspaces':>10} {'run':<10}{'fetch s':>9}{'sync s':>8}{'requests':>10}{'retries':>9}{'writes':>8}")
+    for size in args.sizes:
+        server = start_stand_in(size, args.latency, args.throttle_rate, args.server_error_rate, args.retry_after)
+        workspace_module = load_workspace_module(get_api_url(server))
+        dynamodb_client = FakeDynamoDBClient()
+
+        for run_name in ('initial', 'unchanged', 'churn'):
+            if run_name == 'churn':
+                changed_count = int(size * args.churn)
+                server.state['changed'].update(range(changed_count))
+                server.state['workspaces'] = size - changed_count # Deleted from the end of the organization
+
+            result = run_sync(workspace_module, dynamodb_client, server)
+            print(f"{size:>10} {run_name:<10}{result['fetch_seconds']:>9.2f}{result['sync_seconds']:>8.2f}" \
+                f"{result['requests']:>10}{result['retries']:>9}{result['writes']:>8}" \
+                f"{'' if result['complete'] else '  (incomplete)'}")
+
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
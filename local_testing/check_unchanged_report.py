@@ -0,0 +1,95 @@
+"""
+Check that an unchanged savings report is not uploaded again.
+
+Writes synthetic savings records as a local DynamoDB export spread over several
+data files, so the report reads them in parallel and rows arrive in a different
+order on each run. The report and its summaries are then published twice against
+the same data with S3 replaced by a client that counts what it receives. The
+second run must upload nothing and only move each manifest entry's CheckedAt.
+
+Example:
+    python local_testing/check_unchanged_report.py --rows 100000 --files 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from bench_streaming_report import CountingS3Client, generate_savings_items, load_report_module
+from ddb_export_stand_in import write_export
+
+class PublishingS3Client(CountingS3Client):
+    """Counts uploads and the copies made to keep the fixed keys current."""
+
+    def __init__(self):
+        super().__init__()
+        self.copies = 0
+
+    def copy_object(self, **kwargs):
+        self.copies += 1
+
+def run_report(report_module, table_name, manifest_reports):
+    """
+    Publish the savings report and its summaries, like total_resource_savings.
+    Args:
+        report_module (module): The savings report Lambda module.
+        table_name (str): Table with a local export source.
+        manifest_reports (dict): Manifest entries by report key, updated in place.
+    Returns:
+        tuple: The S3 client after the run and the ResourceIds in the order read.
+    """
+    s3_client = PublishingS3Client()
+    read_order = []
+
+    def record_order(items):
+        for item in items:
+            read_order.append(item['ResourceId']['S'])
+            yield item
+
+    summaries = report_module.new_summaries(report_module.FILE_NAME)
+    rows = report_module.get_resource_savings_rows(record_order(report_module.scan_table_items(table_name)), summaries)
+    report_module.write_report(s3_client, report_module.FILE_NAME, report_module.SAVINGS_FIELDNAMES, rows, manifest_reports)
+    report_module.write_summaries(s3_client, report_module.FILE_NAME, summaries, manifest_reports)
+    return s3_client, read_order
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that an unchanged report is not uploaded again.')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of savings records')
+    parser.add_argument('--files', type=int, default=8, help='Export data files read in parallel')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the reports')
+    args = parser.parse_args()
+
+    report_module = load_report_module(args.gzip)
+    table_name = 'local-savings'
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        write_export(export_dir, generate_savings_items(args.rows), args.files)
+        report_module.export_sources[table_name] = {'Directory': export_dir}
+
+        manifest_reports = {}
+        first_client, first_order = run_report(report_module, table_name, manifest_reports)
+        published = {key: dict(entry) for key, entry in manifest_reports.items()}
+        second_client, second_order = run_report(report_module, table_name, manifest_reports)
+
+    print(f"first run:  {first_client.parts} parts, {first_client.bytes_received} bytes, {first_client.copies} copies")
+    print(f"second run: {second_client.parts} parts, {second_client.bytes_received} bytes, {second_client.copies} copies")
+    print(f"rows read in the same order both runs: {first_order == second_order}")
+
+    failures = []
+    if first_client.parts == 0:
+        failures.append('the first run uploaded nothing')
+    if second_client.parts or second_client.bytes_received or second_client.copies:
+        failures.append('the second run uploaded unchanged reports')
+    for key, entry in published.items():
+        if {name: value for name, value in manifest_reports[key].items() if name != 'CheckedAt'} != \
+            {name: value for name, value in entry.items() if name != 'CheckedAt'}:
+            failures.append(f'the manifest entry of {key} changed')
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: the unchanged reports were not uploaded again")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Local stand-in for a DynamoDB export to S3, for the savings reports export source.
+
+Writes items in the layout of a DYNAMODB_JSON export: a manifest-files.json listing
+gzipped data files of one {"Item": ...} object per line. Items are read from the
+output of `aws dynamodb scan --output json`, or generated with --synthetic-rows.
+Run the reports Lambda with REPORT_SOURCE=local and REPORT_LOCAL_EXPORT_DIR set to
+the output directory to build the reports from these files instead of the tables.
+
+Example:
+    aws dynamodb scan --table-name resource-cleanup-savings-dev --output json > savings.json
+    python local_testing/ddb_export_stand_in.py --out /tmp/ddb_exports \\
+        --table resource-cleanup-savings-dev=savings.json --files 4
+"""
+import argparse
+import gzip
+import json
+import os
+
+from ddb_stream_stand_in import load_items
+from bench_streaming_report import generate_savings_items
+
+def write_export(table_dir, items, file_count):
+    """
+    Write items as a DynamoDB JSON export.
+    Args:
+        table_dir (str): Directory for the table's export.
+        items (iterable): Items in DynamoDB-JSON format.
+        file_count (int): Number of data files to spread the items over.
+    Returns:
+        int: Number of items written.
+    """
+    os.makedirs(os.path.join(table_dir, 'data'), exist_ok=True)
+    data_file_keys = [f'data/{index:05d}.json.gz' for index in range(file_count)]
+    data_files = [gzip.open(os.path.join(table_dir, key), 'wt', encoding='utf-8') for key in data_file_keys]
+    item_counts = [0] * file_count
+
+    try:
+        for index, item in enumerate(items):
+            data_files[index % file_count].write(json.dumps({'Item': item}) + '\n')
+            item_counts[index % file_count] += 1
+    finally:
+        for data_file in data_files:
+            data_file.close()
+
+    with open(os.path.join(table_dir, 'manifest-files.json'), 'w', encoding='utf-8') as manifest_file:
+        for key, item_count in zip(data_file_keys, item_counts):
+            manifest_file.write(json.dumps({'itemCount': item_count, 'dataFileS3Key': key}) + '\n')
+
+    return sum(item_counts)
+
+def main():
+    parser = argparse.ArgumentParser(description='Write scan output as a local DynamoDB export.')
+    parser.add_argument('--out', default='/tmp/ddb_exports', help='Directory to write the exports to')
+    parser.add_argument('--table', action='append', default=[], help='TABLE_NAME=scan_output.json, repeatable')
+    parser.add_argument('--synthetic-rows', type=int, default=0, help='Generate savings records for the tables given without a file')
+    parser.add_argument('--files', type=int, default=4, help='Data files per table')
+    args = parser.parse_args()
+
+    for table in args.table:
+        table_name, _, items_path = table.partition('=')
+        items = load_items(items_path) if items_path else generate_savings_items(args.synthetic_rows)
+        item_count = write_export(os.path.join(args.out, table_name), items, args.files)
+        print(f'{table_name}: {item_count} items in {args.files} files')
+
+if __name__ == '__main__':
+    main()
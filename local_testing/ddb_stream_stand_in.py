@@ -0,0 +1,168 @@
+"""
+Local stand-in for a DynamoDB stream feeding a cleanup Lambda.
+
+Builds the stream records DynamoDB emits when TTL expires inventory items, applies
+the same filter as the event source mapping, and invokes the cleanup handler in
+micro-batches. Items are read from the output of `aws dynamodb scan --output json`.
+
+Example:
+    aws dynamodb scan --table-name detached-ebs-volumes-inventory-dev --output json > items.json
+    python local_testing/ddb_stream_stand_in.py \\
+        --lambda-path modules/aws/ebs_volume_cleanup/lambda_code/lambda_function.py \\
+        --items items.json --key-name VolumeId --dry-run
+"""
+import argparse
+import importlib.util
+import json
+import time
+import uuid
+
+STREAM_FILTER = {
+    'eventName': 'REMOVE',
+    'userIdentity': {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'}
+}
+
+def load_items(items_path):
+    """
+    Load DynamoDB-JSON items from a file.
+    Args:
+        items_path (str): Path to a scan output file or a JSON list of items.
+    Returns:
+        list: The items in DynamoDB-JSON format.
+    """
+    with open(items_path, encoding='utf-8') as items_file:
+        items = json.load(items_file)
+    return items['Items'] if isinstance(items, dict) else items
+
+def build_ttl_expiry_record(item, table_arn, key_name):
+    """
+    Build the stream record DynamoDB emits when TTL removes an item.
+    Args:
+        item (dict): The expired item in DynamoDB-JSON format.
+        table_arn (str): ARN of the table the record is attributed to.
+        key_name (str): Name of the table's partition key.
+    Returns:
+        dict: A REMOVE stream record with the OLD_IMAGE view.
+    """
+    return {
+        'eventID': uuid.uuid4().hex,
+        'eventName': 'REMOVE',
+        'eventVersion': '1.1',
+        'eventSource': 'aws:dynamodb',
+        'awsRegion': table_arn.split(':')[3],
+        'dynamodb': {
+            'ApproximateCreationDateTime': int(time.time()),
+            'Keys': {key_name: item[key_name]},
+            'OldImage': item,
+            'SequenceNumber': str(int(time.time() * 1000000)),
+            'StreamViewType': 'OLD_IMAGE'
+        },
+        'userIdentity': {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'},
+        'eventSourceARN': f'{table_arn}/stream/local'
+    }
+
+def build_insert_record(item, table_arn):
+    """
+    Build the stream record DynamoDB emits when an item is written.
+    Args:
+        item (dict): The new item in DynamoDB-JSON format.
+        table_arn (str): ARN of the table the record is attributed to.
+    Returns:
+        dict: An INSERT stream record with the NEW_IMAGE view.
+    """
+    return {
+        'eventID': uuid.uuid4().hex,
+        'eventName': 'INSERT',
+        'eventVersion': '1.1',
+        'eventSource': 'aws:dynamodb',
+        'awsRegion': table_arn.split(':')[3],
+        'dynamodb': {
+            'ApproximateCreationDateTime': int(time.time()),
+            'NewImage': item,
+            'SequenceNumber': str(int(time.time() * 1000000)),
+            'StreamViewType': 'NEW_IMAGE'
+        },
+        'eventSourceARN': f'{table_arn}/stream/local'
+    }
+
+def matches_filter(record, pattern):
+    """
+    Check a record against an event source mapping filter of exact values.
+    Args:
+        record (dict): A stream record.
+        pattern (dict): Nested attribute names to required values.
+    Returns:
+        bool: True if every value in the pattern matches the record.
+    """
+    for name, value in pattern.items():
+        if isinstance(value, dict):
+            if not matches_filter(record.get(name, {}), value):
+                return False
+        elif record.get(name) != value:
+            return False
+    return True
+
+def get_expired_items(items, now):
+    """
+    Select the items whose TTL has passed.
+    Args:
+        items (list): Items in DynamoDB-JSON format.
+        now (int): Epoch seconds to compare ExpirationTime against.
+    Returns:
+        list: Items with an ExpirationTime at or before now.
+    """
+    return [item for item in items \
+        if 'ExpirationTime' in item and int(item['ExpirationTime']['N']) <= now]
+
+def micro_batches(records, batch_size):
+    """
+    Split records into the batches the event source mapping would deliver.
+    Args:
+        records (list): Stream records.
+        batch_size (int): Maximum records per invocation.
+    Yields:
+        list: A batch of records.
+    """
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+def load_handler(lambda_path):
+    """
+    Import a Lambda function module from a file path.
+    Args:
+        lambda_path (str): Path to lambda_function.py.
+    Returns:
+        function: The module's lambda_handler.
+    """
+    spec = importlib.util.spec_from_file_location('lambda_function', lambda_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.lambda_handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay TTL expiry stream records into a cleanup Lambda.')
+    parser.add_argument('--lambda-path', required=True, help='Path to the cleanup lambda_function.py')
+    parser.add_argument('--items', required=True, help='Scan output or JSON list of inventory items')
+    parser.add_argument('--table-arn', default='arn:aws:dynamodb:us-west-2:000000000000:table/local', help='Table ARN for the records')
+    parser.add_argument('--key-name', default='ResourceId', help='Partition key of the table (VolumeId for the EBS volume table)')
+    parser.add_argument('--batch-size', type=int, default=25, help='Records per invocation, matches the event source mapping')
+    parser.add_argument('--now', type=int, default=None, help='Epoch seconds to evaluate TTL against (default: current time)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the events instead of invoking the handler')
+    args = parser.parse_args()
+
+    now = args.now if args.now is not None else int(time.time())
+    expired_items = get_expired_items(load_items(args.items), now)
+    records = [build_ttl_expiry_record(item, args.table_arn, args.key_name) for item in expired_items]
+    records = [record for record in records if matches_filter(record, STREAM_FILTER)]
+    print(f'{len(records)} expired records')
+
+    lambda_handler = None if args.dry_run else load_handler(args.lambda_path)
+    for batch in micro_batches(records, args.batch_size):
+        event = {'Records': batch}
+        if args.dry_run:
+            print(json.dumps(event, indent=2))
+        else:
+            print('Handler returned:', lambda_handler(event, None))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Local stand-in for the HCP Terraform (Terraform Cloud) workspaces API.
+
+Serves JSON:API pages of synthetic workspaces for
+/api/v2/organizations/<org>/workspaces, with a configurable organization size,
+per-page latency and injected 429 and 5xx responses, so the workspace sync can be
+tested and benchmarked without app.terraform.io. Point the workspace Lambda at it
+with HCP_API_URL=http://127.0.0.1:<port>/api/v2.
+
+Example:
+    python local_testing/tfc_api_stand_in.py --workspaces 10000 --latency 0.1 \\
+        --throttle-rate 0.05 --server-error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MAX_PAGE_SIZE = 100
+
+def build_workspace(index, changed=False):
+    """
+    Build a synthetic workspace record shaped like the workspaces API output.
+    Args:
+        index (int): Position of the workspace in the organization.
+        changed (bool): Whether the workspace has had a change since it was created.
+    Returns:
+        dict: A JSON:API workspace record.
+    """
+    return {
+        'id': f'ws-{index:016x}',
+        'type': 'workspaces',
+        'attributes': {
+            'name': f'workspace-{index}',
+            'resource-count': index % 250,
+            'tag-names': [f'team-{index % 20}', ('dev', 'test', 'prod')[index % 3]],
+            'description': f'Synthetic workspace {index}',
+            'created-at': '2024-01-01T00:00:00.000Z',
+            'latest-change-at': '2025-06-02T00:00:00.000Z' if changed else '2025-06-01T00:00:00.000Z',
+            'execution-mode': ('remote', 'agent', 'local')[index % 3],
+            'vcs-repo-identifier': f'example/infra-{index % 50}',
+            'vcs-repo': {'identifier': f'example/infra-{index % 50}', 'branch': 'main'},
+            'locked': index % 97 == 0,
+            'apply-duration-average': 30000 + index % 60000,
+            'working-directory': f'stacks/{index % 10}',
+            'terraform-version': '1.9.8'
+        },
+        'relationships': {
+            'project': {'data': {'id': f'prj-{index % 40:016x}', 'type': 'projects'}},
+            'current-run': {'data': {'id': f'run-{index:016x}', 'type': 'runs'}},
+            'current-state-version': {'data': None}
+        }
+    }
+
+def make_handler(server_state):
+    """
+    Build the request handler class bound to the stand-in's settings and counters.
+    Args:
+        server_state (dict): Settings and counters shared by the request threads.
+    Returns:
+        type: The BaseHTTPRequestHandler subclass to serve with.
+    """
+    class WorkspacesHandler(BaseHTTPRequestHandler):
+        """Serves workspace pages and injects the configured errors."""
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/vnd.api+json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            with server_state['lock']:
+                server_state['requests'] += 1
+                roll = server_state['random'].random()
+
+            url = urlparse(self.path)
+            if not url.path.endswith('/workspaces'):
+                self.send_json(404, {'errors': [{'status': '404', 'title': 'not found'}]})
+                return
+
+            if roll < server_state['throttle_rate']:
+                with server_state['lock']:
+                    server_state['throttled'] += 1
+                self.send_json(429, {'errors': [{'status': '429', 'title': 'Too many requests'}]}, {
+                    'Retry-After': str(server_state['retry_after']),
+                    'X-RateLimit-Limit': '30',
+                    'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset': str(server_state['retry_after'])
+                })
+                return
+
+            if roll < server_state['throttle_rate'] + server_state['server_error_rate']:
+                with server_state['lock']:
+                    server_state['server_errors'] += 1
+                self.send_json(503, {'errors': [{'status': '503', 'title': 'Service unavailable'}]})
+                return
+
+            time.sleep(server_state['latency'])
+            query = parse_qs(url.query)
+            page_number = max(1, int(query.get('page[number]', ['1'])[0]))
+            page_size = min(MAX_PAGE_SIZE, max(1, int(query.get('page[size]', ['20'])[0])))
+            workspace_count = server_state['workspaces']
+            total_pages = max(1, -(-workspace_count // page_size))
+            first = (page_number - 1) * page_size
+            indexes = range(first, min(workspace_count, first + page_size))
+
+            self.send_json(200, {
+                'data': [build_workspace(index, index in server_state['changed']) for index in indexes],
+                'meta': {'pagination': {
+                    'current-page': page_number,
+                    'page-size': page_size,
+                    'total-pages': total_pages,
+                    'total-count': workspace_count
+                }}
+            }, {'X-RateLimit-Limit': '30', 'X-RateLimit-Remaining': '29'})
+
+    return WorkspacesHandler
+
+def start_stand_in(workspaces, latency=0.0, throttle_rate=0.0, server_error_rate=0.0, retry_after=1.0, port=0, seed=1):
+    """
+    Start the stand-in API on a background thread.
+    Args:
+        workspaces (int): Number of workspaces in the organization.
+        latency (float): Seconds each page takes to serve.
+        throttle_rate (float): Share of requests answered with 429.
+        server_error_rate (float): Share of requests answered with 503.
+        retry_after (float): Retry-After seconds sent with each 429.
+        port (int): Port to listen on, 0 for any free port.
+        seed (int): Seed for the injected errors.
+    Returns:
+        ThreadingHTTPServer: The running server, with its counters in server.state.
+    """
+    server_state = {
+        'workspaces': workspaces,
+        'latency': latency,
+        'throttle_rate': throttle_rate,
+        'server_error_rate': server_error_rate,
+        'retry_after': retry_after,
+        'changed': set(),
+        'requests': 0,
+        'throttled': 0,
+        'server_errors': 0,
+        'random': random.Random(seed),
+        'lock': threading.Lock()
+    }
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(server_state))
+    server.daemon_threads = True
+    server.state = server_state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def get_api_url(server):
+    """
+    Get the API root of a running stand-in.
+    Args:
+        server (ThreadingHTTPServer): Server from start_stand_in.
+    Returns:
+        str: The URL to use as HCP_API_URL.
+    """
+    return f'http://127.0.0.1:{server.server_port}/api/v2'
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic Terraform Cloud workspace pages.')
+    parser.add_argument('--workspaces', type=int, default=1000, help='Number of workspaces in the organization')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds each page takes to serve')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with each 429')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    args = parser.parse_args()
+
+    server = start_stand_in(args.workspaces, args.latency, args.throttle_rate, args.server_error_rate, \
+        args.retry_after, args.port)
+    print(f'Serving {args.workspaces} workspaces at {get_api_url(server)}, press Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
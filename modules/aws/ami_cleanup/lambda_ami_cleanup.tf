@@ -16,12 +16,14 @@ resource "aws_lambda_function" "ami_cleanup_lambda_function" {
   description = "Lambda function to clean up amis."
   environment {
     variables = {
-      ENV                   = var.env,
-      SNS_ARN               = var.sns_topic_arn,
-      CROSS_ACCOUNT_ROLE    = var.cross_account_cleanup_role_name,
-      ACCOUNT_TABLE         = var.account_table_name,
-      AMI_TABLE             = var.ami_table_name,
-      CLEANUP_SAVINGS_TABLE = var.cleanup_savings_table_name
+      ENV                    = var.env,
+      SNS_ARN                = var.sns_topic_arn,
+      CROSS_ACCOUNT_ROLE     = var.cross_account_cleanup_role_name,
+      ACCOUNT_TABLE          = var.account_table_name,
+      AMI_TABLE              = var.ami_table_name,
+      CLEANUP_SAVINGS_TABLE  = var.cleanup_savings_table_name,
+      CLEANUP_TOTAL_SEGMENTS = tostring(var.cleanup_total_segments),
+      DRY_RUN                = tostring(var.dry_run)
     }
   }
 
@@ -55,3 +57,29 @@ resource "aws_lambda_function_event_invoke_config" "ami_cleanup_lambda_failure_e
     }
   }
 }
+
+# Invoke cleanup in micro-batches as records expire from the inventory table
+# Expired records are not restored after a dry run, so this waits for real deregistration
+resource "aws_lambda_event_source_mapping" "ami_cleanup_ttl_expiry_stream" {
+  count = var.event_driven_cleanup && !var.dry_run ? 1 : 0
+
+  event_source_arn                   = var.ami_table_stream_arn
+  function_name                      = aws_lambda_function.ami_cleanup_lambda_function.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 25
+  maximum_batching_window_in_seconds = 60
+  bisect_batch_on_function_error     = true
+  maximum_retry_attempts             = 2
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["REMOVE"]
+        userIdentity = {
+          type        = ["Service"]
+          principalId = ["dynamodb.amazonaws.com"]
+        }
+      })
+    }
+  }
+}
@@ -5,19 +5,30 @@ Returns:
     _type_: _description_
 """
 import os
-from datetime import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import boto3
 from botocore.exceptions import ClientError
+from botocore.config import Config
 import botocore
 
 AWS_REGION = os.environ['AWS_REGION']
 CROSS_ACCOUNT_ROLE = os.environ['CROSS_ACCOUNT_ROLE']
+# AMIs are only deregistered for real once DRY_RUN is set to false
+DRY_RUN = os.environ.get('DRY_RUN', 'true').lower() == 'true'
 
 ACCOUNT_DDB_TABLE = os.environ['ACCOUNT_TABLE']
 ACCOUNT_DDB_TABLE_INDEX = 'AccountName-index'
 
 RESOURCE_TABLE = os.environ['AMI_TABLE']
+DELETION_DATE_INDEX = 'CleanupStatus-DeletionDate-index'
+CLEANUP_STATUS_PENDING = 'PENDING'
 CLEANUP_SAVINGS_TABLE = os.environ['CLEANUP_SAVINGS_TABLE']
+CLEANUP_TOTAL_SEGMENTS = int(os.environ.get('CLEANUP_TOTAL_SEGMENTS', '1'))
+LEASE_SECONDS = 900 # Matches the Lambda timeout so a lease outlives the worker holding it
+DEADLINE_MARGIN_SECONDS = 60 # Time the coordinator keeps to collect results and notify
 
 SNSTOPICARN=os.environ['SNS_ARN']
 
@@ -92,39 +103,170 @@ def delete_resource(resource_id, account_id, region):
         resource_id (str): The ID of the resource to delete.
         account_id (str): The ID of the account where the resource resides.
         region (str): The AWS region where the resource resides.
+    Returns:
+        bool: True if the resource was deleted, or would have been in a dry run, False otherwise.
     """
     access_key, secret_access_key, session_token = assume_new_account_role(account_id)
     ec2_client = get_multi_account_ec2_client(access_key, secret_access_key, session_token, region)
 
     try:
         ec2_client.deregister_image(
-          ResourceId=resource_id,
-          DryRun=True
+          ImageId=resource_id,
+          DryRun=DRY_RUN
         )
 
     except ClientError as e:
+        # A dry run that would have succeeded still raises, with this code
+        if e.response['Error']['Code'] == 'DryRunOperation':
+            print(f"Dry run, AMI ({resource_id}) would have been deregistered")
+            return True
         error_message = f"Error in deregistering AMI ({resource_id}): {str(e)}"
         print(error_message)
         error_log.append(error_message)
+        return False
 
-    return
+    return True
+
+def query_due_resource_ddb_records(today_date):
+    """
+    Query the sparse deletion date index for resources that are due for cleanup.
+    Only resources without an exception carry the CleanupStatus key, so the read
+    cost scales with the number of due resources rather than the table size.
+    Args:
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+    Returns:
+        list: Resource records with a deletion date before today.
+    """
+    primary_session = boto3.Session()
+    dynamodb_client = primary_session.client('dynamodb')
+
+    query_kwargs = {
+        'TableName': RESOURCE_TABLE,
+        'IndexName': DELETION_DATE_INDEX,
+        'KeyConditionExpression': "CleanupStatus = :cleanupStatus AND DeletionDate < :today",
+        'ExpressionAttributeValues': {
+            ':cleanupStatus': {'S': CLEANUP_STATUS_PENDING},
+            ':today': {'S': today_date}
+        }
+    }
+
+    query_response = dynamodb_client.query(**query_kwargs)
+    items = query_response['Items']
+
+    while 'LastEvaluatedKey' in query_response:
+        query_response = dynamodb_client.query(ExclusiveStartKey=query_response['LastEvaluatedKey'], **query_kwargs)
+        items.extend(query_response['Items'])
+
+    return items
+
+def scan_due_resource_ddb_segment(today_date, segment, total_segments):
+    """
+    Scan one segment of the sparse deletion date index for resources that are due for cleanup.
+    Args:
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+        segment (int): The segment of the index to scan.
+        total_segments (int): The number of segments the index is split into.
+    Returns:
+        list: Resource records in the segment with a deletion date before today.
+    """
+    primary_session = boto3.Session()
+    dynamodb_client = primary_session.client('dynamodb')
+
+    scan_kwargs = {
+        'TableName': RESOURCE_TABLE,
+        'IndexName': DELETION_DATE_INDEX,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': "DeletionDate < :today",
+        'ExpressionAttributeValues': {
+            ':today': {'S': today_date}
+        }
+    }
+
+    scan_response = dynamodb_client.scan(**scan_kwargs)
+    items = scan_response['Items']
+
+    while 'LastEvaluatedKey' in scan_response:
+        scan_response = dynamodb_client.scan(ExclusiveStartKey=scan_response['LastEvaluatedKey'], **scan_kwargs)
+        items.extend(scan_response['Items'])
 
-def delete_old_resources():
+    return items
+
+def claim_resource_ddb_record(resource_id, lease_owner):
     """
-    Delete old resources.
+    Claim a resource record with a conditional lease so no other worker cleans it up.
+    Args:
+        resource_id (str): The ID of the resource to claim.
+        lease_owner (str): ID of the worker invocation taking the lease.
+    Returns:
+        bool: True if the lease was taken, False if the record is gone or leased by another worker.
     """
+    now = int(time.time())
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb')
 
+        dynamodb_client.update_item(
+            TableName=RESOURCE_TABLE,
+            Key={
+                'ResourceId': {
+                    'S': resource_id
+                }
+            },
+            UpdateExpression="SET LeaseOwner = :owner, LeaseExpires = :expires",
+            ConditionExpression="attribute_exists(ResourceId) AND (attribute_not_exists(LeaseExpires) OR LeaseExpires < :now)",
+            ExpressionAttributeValues={
+                ':owner': {'S': lease_owner},
+                ':expires': {'N': str(now + LEASE_SECONDS)},
+                ':now': {'N': str(now)}
+            }
+        )
+
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            error_message = f"Error in {RESOURCE_TABLE} DynamoDB lease claim ({resource_id}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+        return False
+
+    return True
+
+def delete_old_resources(segment=None, total_segments=None, lease_owner=None, deadline=None):
+    """
+    Delete resources that are past their deletion date.
+    When a segment is given, only that segment of the deletion date index is
+    processed and each record is claimed with a lease before it is cleaned up.
+    Args:
+        segment (int): The segment of the index to process, or None for all due resources.
+        total_segments (int): The number of segments the index is split into.
+        lease_owner (str): ID of the worker invocation taking leases.
+        deadline (float): Epoch seconds after which no more resources are deleted.
+    Returns:
+        int: The number of resources deleted.
+    """
+    deleted_count = 0
+
+    try:
         today_date = datetime.now().strftime('%Y-%m-%d')
 
-        scan_response = dynamodb_client.scan(TableName=RESOURCE_TABLE)
+        if segment is None:
+            due_items = query_due_resource_ddb_records(today_date)
+        else:
+            due_items = scan_due_resource_ddb_segment(today_date, segment, total_segments)
 
-        for table_item in scan_response['Items']:
-            if today_date > table_item['DeletionDate']['S'] and table_item['ExceptionFlag']['S'] == 'False':
+        for table_item in due_items:
+            # The index key is only cleared on the next inventory run, so recheck the flag
+            if table_item['ExceptionFlag']['S'] == 'False':
+                # Leased resources left over are picked up once the lease expires
+                if deadline is not None and time.time() > deadline:
+                    print('Deadline reached, leaving remaining resources for the next run')
+                    break
+                if lease_owner is not None and not claim_resource_ddb_record(table_item['ResourceId']['S'], lease_owner):
+                    continue
                 print('Remove: ', table_item['ResourceId']['S'], "in", table_item['AccountName']['S'], "with deletion date:", table_item['DeletionDate']['S'] )
-                delete_resource(table_item['ResourceId']['S'], table_item['AccountId']['S'], table_item['ResourceRegion']['S'])
+                if delete_resource(table_item['ResourceId']['S'], table_item['AccountId']['S'], table_item['ResourceRegion']['S']):
+                    deleted_count += 1
                 remove_resource_ddb_record(table_item['ResourceId']['S'])
 
     except ClientError as e:
@@ -132,6 +274,117 @@ def delete_old_resources():
         print(error_message)
         error_log.append(error_message)
 
+    return deleted_count
+
+def invoke_cleanup_segment(lambda_client, function_name, segment, deadline):
+    """
+    Invoke a worker for one segment and wait for its result.
+    Args:
+        lambda_client (boto3.client): Lambda client with a read timeout covering the worker run.
+        function_name (str): Name of this Lambda function.
+        segment (int): The segment for the worker to process.
+        deadline (float): Epoch seconds after which the worker stops deleting.
+    Returns:
+        dict: The worker's summary of the segment.
+    """
+    try:
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'Segment': segment, 'TotalSegments': CLEANUP_TOTAL_SEGMENTS, 'Deadline': deadline})
+        )
+        payload = json.loads(response['Payload'].read())
+        if 'FunctionError' in response:
+            return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker failed: {payload}"]}
+        return payload
+
+    except (ClientError, botocore.exceptions.ReadTimeoutError) as e:
+        return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker invoke failed: {str(e)}"]}
+
+def run_cleanup_coordinator(context):
+    """
+    Fan cleanup out over one worker invocation per index segment and send one summary.
+    Args:
+        context (LambdaContext): The context of the coordinator invocation.
+    """
+    deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    lambda_client = boto3.client('lambda', config=Config(read_timeout=900, retries={'max_attempts': 0}))
+
+    with ThreadPoolExecutor(max_workers=CLEANUP_TOTAL_SEGMENTS) as executor:
+        segment_results = list(executor.map(
+            lambda segment: invoke_cleanup_segment(lambda_client, context.function_name, segment, deadline),
+            range(CLEANUP_TOTAL_SEGMENTS)
+        ))
+
+    message = f"Deleted {sum(result['Deleted'] for result in segment_results)} AMIs across {CLEANUP_TOTAL_SEGMENTS} segments" \
+        f"{' (dry run)' if DRY_RUN else ''}.\n"
+    for result in segment_results:
+        message += f"Segment {result['Segment']}: {result['Deleted']} deleted, {len(result['Errors'])} errors\n"
+        for error in result['Errors']:
+            message += error + ",\n"
+    print(message)
+    publish_sns_topic('AMI Cleanup Summary', message)
+
+def is_ttl_expiry_record(record):
+    """
+    Check if a DynamoDB stream record was produced by TTL expiring an item.
+    Args:
+        record (dict): A DynamoDB stream record.
+    Returns:
+        bool: True if DynamoDB removed the item because its TTL expired.
+    """
+    user_identity = record.get('userIdentity', {})
+    return record.get('eventName') == 'REMOVE' \
+        and user_identity.get('type') == 'Service' \
+        and user_identity.get('principalId') == 'dynamodb.amazonaws.com'
+
+def restore_resource_ddb_record(table_item, retry_cleanup):
+    """
+    Put back a resource record that was expired by TTL but not cleaned up.
+    Args:
+        table_item (dict): The expired resource record from the stream.
+        retry_cleanup (bool): If True the record expires again tomorrow to retry cleanup,
+            otherwise it is restored without the cleanup attributes.
+    """
+    restored_item = {name: value for name, value in table_item.items() \
+        if name not in ('CleanupStatus', 'ExpirationTime')}
+    if retry_cleanup:
+        retry_time = datetime.now(timezone.utc) + timedelta(days=1)
+        restored_item['CleanupStatus'] = {'S': CLEANUP_STATUS_PENDING}
+        restored_item['ExpirationTime'] = {'N': str(int(retry_time.timestamp()))}
+
+    try:
+        primary_session = boto3.Session()
+        dynamodb_client = primary_session.client('dynamodb')
+        dynamodb_client.put_item(TableName=RESOURCE_TABLE, Item=restored_item)
+
+    except ClientError as e:
+        error_message = f"Error in {RESOURCE_TABLE} DynamoDB item restore ({table_item['ResourceId']['S']}): {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
+
+def cleanup_expired_resources(records):
+    """
+    Delete resources whose inventory records were expired by DynamoDB TTL.
+    Records arrive from the table stream in micro-batches. The item is already
+    gone from the inventory table, so resources that fail to delete are restored.
+    Args:
+        records (list): DynamoDB stream records from the event source mapping.
+    """
+    for record in records:
+        if not is_ttl_expiry_record(record):
+            continue
+
+        table_item = record['dynamodb']['OldImage']
+        if table_item['ExceptionFlag']['S'] != 'False':
+            print('Exception set after expiry was scheduled, restoring:', table_item['ResourceId']['S'])
+            restore_resource_ddb_record(table_item, retry_cleanup=False)
+            continue
+
+        print('Remove (TTL expired): ', table_item['ResourceId']['S'], "in", table_item['AccountName']['S'], "with deletion date:", table_item['DeletionDate']['S'])
+        if not delete_resource(table_item['ResourceId']['S'], table_item['AccountId']['S'], table_item['ResourceRegion']['S']):
+            restore_resource_ddb_record(table_item, retry_cleanup=True)
+
 ##### ERROR NOTIFICATION FUNCTIONS #####
 # SNS serves as an easy mechanism to alert responsible owners about function errors
 def publish_sns_topic(subject_message, sns_input):
@@ -162,6 +415,9 @@ def publish_sns_topic(subject_message, sns_input):
 def lambda_handler(event, context):
     """
     Lambda function to clean up old AMIs.
+    Runs on a schedule, or on TTL expiry records from the inventory table stream.
+    With more than one cleanup segment, the scheduled run coordinates one worker
+    invocation per segment and the workers return their results to it.
     Args:
         event (dict): The event data passed to the Lambda function.
         context (LambdaContext): The context object containing runtime information.
@@ -169,7 +425,19 @@ def lambda_handler(event, context):
         dict: The response object containing the status code and message.
     """
     print("Event: ", event, "Context: ", context)
-    delete_old_resources()
+    # Warm containers keep module state, so start each run with an empty log
+    error_log.clear()
+
+    if 'Segment' in event:
+        deleted_count = delete_old_resources(event['Segment'], event['TotalSegments'], context.aws_request_id, event.get('Deadline'))
+        return {'Segment': event['Segment'], 'Deleted': deleted_count, 'Errors': list(error_log)}
+
+    if 'Records' in event:
+        cleanup_expired_resources(event['Records'])
+    elif CLEANUP_TOTAL_SEGMENTS > 1:
+        run_cleanup_coordinator(context)
+    else:
+        delete_old_resources()
 
     if error_log:
         message = ""
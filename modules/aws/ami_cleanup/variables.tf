@@ -31,18 +31,36 @@ variable "cleanup_savings_table_name" {
   default     = "resource-cleanup-savings"
 }
 
+variable "cleanup_total_segments" {
+  description = "Number of index segments to fan cleanup out over, each handled by its own invocation (1 runs cleanup in a single invocation)"
+  type        = number
+  default     = 1
+}
+
 variable "cross_account_cleanup_role_name" {
   description = "Name of the role to assume in target accounts to perform resource cleanup"
   type        = string
   default     = "cloud-resource-management-role"
 }
 
+variable "dry_run" {
+  description = "Only check that AMIs could be deregistered, without deregistering them. Event driven cleanup is not used for AMIs while this is on"
+  type        = bool
+  default     = true
+}
+
 variable "env" {
   description = "Deployment environment of the solution."
   type        = string
   default     = "dev"
 }
 
+variable "event_driven_cleanup" {
+  description = "Clean up resources from TTL expiry records on the inventory table stream instead of only on the schedule"
+  type        = bool
+  default     = false
+}
+
 variable "short_region" {
   description = "Short region code (e.g., usw2 for us-west-2)"
   type        = string
@@ -58,3 +76,9 @@ variable "tags" {
   type        = map(string)
   default     = {}
 }
+
+variable "ami_table_stream_arn" {
+  description = "Stream ARN of the DynamoDB table to store AMI inventory information, required for event driven cleanup"
+  type        = string
+  default     = ""
+}
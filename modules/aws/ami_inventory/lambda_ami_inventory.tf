@@ -16,12 +16,15 @@ resource "aws_lambda_function" "ami_inventory_lambda_function" {
   description = "Lambda function to scan, document, and inventory amis."
   environment {
     variables = {
-      ACCOUNT_TABLE      = var.account_table_name,
-      ACTIVE_REGIONS     = var.active_regions,
-      AMI_TABLE          = aws_dynamodb_table.ami_inventory_table.id,
-      CROSS_ACCOUNT_ROLE = var.cross_account_inventory_role_name,
-      ENV                = var.env,
-      SNS_ARN            = var.sns_topic_arn
+      ACCOUNT_ROSTER_BUCKET = var.account_roster_bucket_name,
+      ACCOUNT_TABLE         = var.account_table_name,
+      ACTIVE_REGIONS        = var.active_regions,
+      AMI_TABLE             = aws_dynamodb_table.ami_inventory_table.id,
+      COST_TIMESERIES_TABLE = var.cost_timeseries_table_name,
+      CROSS_ACCOUNT_ROLE    = var.cross_account_inventory_role_name,
+      ENV                   = var.env,
+      EVENT_DRIVEN_CLEANUP  = tostring(var.event_driven_cleanup),
+      SNS_ARN               = var.sns_topic_arn
     }
   }
 
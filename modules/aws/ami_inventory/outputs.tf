@@ -7,3 +7,8 @@ output "ami_inventory_table_arn" {
   value       = aws_dynamodb_table.ami_inventory_table.arn
   description = "The ARN of the DynamoDB table to store AMI inventory"
 }
+
+output "ami_inventory_table_stream_arn" {
+  value       = aws_dynamodb_table.ami_inventory_table.stream_arn
+  description = "Stream ARN of the DynamoDB table for AMI inventory (empty unless event driven cleanup is enabled)"
+}
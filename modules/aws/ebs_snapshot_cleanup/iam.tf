@@ -52,9 +52,23 @@ resource "aws_iam_policy" "ebs_snapshot_cleanup_policy" {
         Resource = [
           var.account_table_arn,
           var.ebs_snapshot_table_arn,
+          "${var.ebs_snapshot_table_arn}/index/*",
           var.cleanup_savings_table_arn
         ]
       },
+      {
+        Sid    = "InventoryStreamPermissions"
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = [
+          "${var.ebs_snapshot_table_arn}/stream/*"
+        ]
+      },
       {
         Sid    = "ResourceCleanupPermissions"
         Effect = "Allow",
@@ -80,6 +94,16 @@ resource "aws_iam_policy" "ebs_snapshot_cleanup_policy" {
           }
         }
       },
+      {
+        Sid    = "CleanupFanOutPermissions"
+        Effect = "Allow",
+        Action = [
+          "lambda:InvokeFunction"
+        ],
+        Resource = [
+          aws_lambda_function.ebs_snapshot_cleanup_lambda_function.arn
+        ]
+      },
       {
         Sid    = "AssumeRolePermissions"
         Effect = "Allow",
@@ -4,7 +4,10 @@ Returns:
     dict: The response object.
 """
 import os
-from datetime import datetime, timedelta
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import boto3
 from botocore.exceptions import ClientError
 from botocore.config import Config
@@ -14,8 +17,14 @@ AWS_REGION = os.environ['AWS_REGION']
 CROSS_ACCOUNT_ROLE = os.environ['CROSS_ACCOUNT_ROLE']
 CLEANUP_SAVINGS_TABLE = os.environ['CLEANUP_SAVINGS_TABLE']
 DELETION_TABLE = os.environ['SNAPSHOT_DELETION_TABLE']
+DELETION_DATE_INDEX = 'CleanupStatus-DeletionDate-index'
+CLEANUP_STATUS_PENDING = 'PENDING'
 SNS_TOPIC_ARN=os.environ['SNS_ARN']
 DYNAMODB_TABLE_REGION = os.environ['DYNAMODB_TABLE_REGION']
+CLEANUP_TOTAL_SEGMENTS = int(os.environ.get('CLEANUP_TOTAL_SEGMENTS', '1'))
+LEASE_SECONDS = 900 # Matches the Lambda timeout so a lease outlives the worker holding it
+DEADLINE_MARGIN_SECONDS = 60 # Time the coordinator keeps to collect results and notify
+MAX_TRANSACTION_RESOURCES = 50 # TransactWriteItems takes 100 actions, two per snapshot
 
 config = Config(
   retries = {
@@ -24,7 +33,6 @@ config = Config(
   }
 )
 
-today_date = datetime.now().strftime('%Y-%m-%d')
 error_log = []
 
 def assume_new_account_role(account_id):
@@ -62,125 +70,426 @@ def get_multi_account_ec2_client(access_key, secret_access_key, session_token, r
 
     return ec2_client
 
-def scan_snapshot_ddb_records(table_name):
+def query_due_snapshot_ddb_records(table_name, today_date):
     """
-    Scan the DynamoDB table for EBS snapshot records.
+    Query the sparse deletion date index for EBS snapshots that are due for cleanup.
+    Only snapshots without an exception carry the CleanupStatus key, so the read
+    cost scales with the number of due snapshots rather than the table size.
+    Args:
+        table_name (str): The name of the DynamoDB table to query.
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+    Returns:
+        list: A list of EBS snapshot records with a deletion date before today.
+    """
+    items = []
+
+    try:
+        primary_session = boto3.Session()
+        dynamodb_client = primary_session.client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
+
+        query_kwargs = {
+            'TableName': table_name,
+            'IndexName': DELETION_DATE_INDEX,
+            'KeyConditionExpression': "CleanupStatus = :cleanupStatus AND DeletionDate < :today",
+            'ExpressionAttributeValues': {
+                ':cleanupStatus': {'S': CLEANUP_STATUS_PENDING},
+                ':today': {'S': today_date}
+            }
+        }
+
+        query_response = dynamodb_client.query(**query_kwargs)
+        items = query_response['Items']
+
+        while 'LastEvaluatedKey' in query_response:
+            query_response = dynamodb_client.query(ExclusiveStartKey=query_response['LastEvaluatedKey'], **query_kwargs)
+            items.extend(query_response['Items'])
+
+    except ClientError as e:
+        error_message = f"Error in DynamoDB query: {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
+
+    return items
+
+def scan_due_snapshot_ddb_segment(table_name, today_date, segment, total_segments):
+    """
+    Scan one segment of the sparse deletion date index for EBS snapshots that are due for cleanup.
     Args:
         table_name (str): The name of the DynamoDB table to scan.
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+        segment (int): The segment of the index to scan.
+        total_segments (int): The number of segments the index is split into.
     Returns:
-        list: A list of EBS snapshot records from the DynamoDB table.
+        list: EBS snapshot records in the segment with a deletion date before today.
     """
-    scan_response = {}
+    items = []
 
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
-        scan_response = dynamodb_client.scan(TableName=table_name)
+
+        scan_kwargs = {
+            'TableName': table_name,
+            'IndexName': DELETION_DATE_INDEX,
+            'Segment': segment,
+            'TotalSegments': total_segments,
+            'FilterExpression': "DeletionDate < :today",
+            'ExpressionAttributeValues': {
+                ':today': {'S': today_date}
+            }
+        }
+
+        scan_response = dynamodb_client.scan(**scan_kwargs)
+        items = scan_response['Items']
+
+        while 'LastEvaluatedKey' in scan_response:
+            scan_response = dynamodb_client.scan(ExclusiveStartKey=scan_response['LastEvaluatedKey'], **scan_kwargs)
+            items.extend(scan_response['Items'])
+
     except ClientError as e:
-        error_message = f"Error in DynamoDB scan: {str(e)}"
+        error_message = f"Error in DynamoDB scan of segment {segment}: {str(e)}"
         print(error_message)
+        error_log.append(error_message)
 
-    return scan_response['Items']
+    return items
 
-def remove_snapshot_ddb_record(snapshot_id):
+def claim_snapshot_ddb_record(snapshot_id, lease_owner):
     """
-    Removes an EBS Snapshot record from the DynamoDB table.
+    Claims an EBS Snapshot record with a conditional lease so no other worker cleans it up.
     Args:
-        snapshot_id (str): The ID of the snapshot to remove.
+        snapshot_id (str): The ID of the snapshot to claim.
+        lease_owner (str): ID of the worker invocation taking the lease.
+    Returns:
+        bool: True if the lease was taken, False if the record is gone or leased by another worker.
     """
+    now = int(time.time())
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
 
-        dynamodb_client.delete_item(
+        dynamodb_client.update_item(
             TableName=DELETION_TABLE,
             Key={
                 'ResourceId': {
                     'S': snapshot_id
                 }
+            },
+            UpdateExpression="SET LeaseOwner = :owner, LeaseExpires = :expires",
+            ConditionExpression="attribute_exists(ResourceId) AND (attribute_not_exists(LeaseExpires) OR LeaseExpires < :now)",
+            ExpressionAttributeValues={
+                ':owner': {'S': lease_owner},
+                ':expires': {'N': str(now + LEASE_SECONDS)},
+                ':now': {'N': str(now)}
             }
         )
 
     except ClientError as e:
-        error_message = f"Error in {DELETION_TABLE} DynamoDB scan and processing: {str(e)}"
-        print(error_message)
-        error_log.append(error_message)
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            error_message = f"Error in {DELETION_TABLE} DynamoDB lease claim ({snapshot_id}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+        return False
 
-    return
+    return True
 
-def delete_old_snapshots():
+def delete_old_snapshots(segment=None, total_segments=None, lease_owner=None, deadline=None):
     """
     Deletes EBS snapshots that are older than 90 days.
+    When a segment is given, only that segment of the deletion date index is
+    processed and each record is claimed with a lease before it is cleaned up.
+    Args:
+        segment (int): The segment of the index to process, or None for all due snapshots.
+        total_segments (int): The number of segments the index is split into.
+        lease_owner (str): ID of the worker invocation taking leases.
+        deadline (float): Epoch seconds after which no more snapshots are deleted.
+    Returns:
+        int: The number of EBS snapshots deleted.
     """
+    today_date = datetime.now().strftime('%Y-%m-%d')
     seven_days_ago = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
 
-    old_snapshots = scan_snapshot_ddb_records(DELETION_TABLE)
+    if segment is None:
+        old_snapshots = query_due_snapshot_ddb_records(DELETION_TABLE, today_date)
+    else:
+        old_snapshots = scan_due_snapshot_ddb_segment(DELETION_TABLE, today_date, segment, total_segments)
+    dynamodb_client = boto3.Session().client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
+    deleted_snapshots = []
     count = 0
     for snapshot in old_snapshots:
         print(snapshot)
-        if snapshot['ExceptionFlag']['S'] == 'False' and today_date > snapshot['DeletionDate']['S']:
+        # The index key is only cleared on the next inventory run, so recheck the flag
+        if snapshot['ExceptionFlag']['S'] == 'False':
             if snapshot['ConnectedResource']['S'] == "" or snapshot['LastUpdated']['S'] < seven_days_ago:
-                count += 1
+                # Leased snapshots left over are picked up once the lease expires
+                if deadline is not None and time.time() > deadline:
+                    print('Deadline reached, leaving remaining snapshots for the next run')
+                    break
+                if lease_owner is not None and not claim_snapshot_ddb_record(snapshot['ResourceId']['S'], lease_owner):
+                    continue
                 try:
                     access_key, secret_access_key, session_token = assume_new_account_role(snapshot['AccountId']['S'])
                     ec2_client = get_multi_account_ec2_client(access_key, secret_access_key, session_token, snapshot['ResourceRegion']['S'])
                     ec2_client.delete_snapshot(SnapshotId=snapshot['ResourceId']['S'], DryRun=False)
                     print("Creating snapshot savings record:", snapshot)
-                    create_cost_saving_ddb_record(snapshot)
-                    remove_snapshot_ddb_record(snapshot['ResourceId']['S'])
+                    deleted_snapshots.append(snapshot)
+                    count += 1
+                    if len(deleted_snapshots) == MAX_TRANSACTION_RESOURCES:
+                        write_cleanup_bookkeeping(dynamodb_client, deleted_snapshots)
+                        deleted_snapshots = []
                 except ClientError as e:
                     error_message = f'Error deleting snapshot {snapshot["ResourceId"]["S"]} in account {snapshot["AccountName"]["S"]} in region {snapshot["ResourceRegion"]["S"]}: {e}'
                     client_error_message = str(e)
                     if "(InvalidSnapshot.InUse)" in client_error_message:
-                        resource_substring = client_error_message[144:165] if len(client_error_message) > 166 else client_error_message[144:] 
-                        if resource_substring.startswith("ami-"):
-                            update_snapshot_ddb_record(snapshot['ResourceId']['S'], resource_substring)
+                        connected_ami = get_connected_ami(client_error_message)
+                        if connected_ami is not None:
+                            update_snapshot_ddb_record(snapshot['ResourceId']['S'], connected_ami)
                         else:
                             error_log.append(error_message)
                     continue
+    write_cleanup_bookkeeping(dynamodb_client, deleted_snapshots)
     print(count)
+    return count
 
-def create_cost_saving_ddb_record(snapshot_item):
+def invoke_cleanup_segment(lambda_client, function_name, segment, deadline):
     """
-    Creates a cost-saving record for an EBS Snapshot in the DynamoDB table.
+    Invokes a worker for one segment and waits for its result.
     Args:
-        snapshot_item (dict): The EBS Snapshot record to save.
+        lambda_client (boto3.client): Lambda client with a read timeout covering the worker run.
+        function_name (str): Name of this Lambda function.
+        segment (int): The segment for the worker to process.
+        deadline (float): Epoch seconds after which the worker stops deleting.
+    Returns:
+        dict: The worker's summary of the segment.
+    """
+    try:
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'Segment': segment, 'TotalSegments': CLEANUP_TOTAL_SEGMENTS, 'Deadline': deadline})
+        )
+        payload = json.loads(response['Payload'].read())
+        if 'FunctionError' in response:
+            return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker failed: {payload}"]}
+        return payload
+
+    except (ClientError, botocore.exceptions.ReadTimeoutError) as e:
+        return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker invoke failed: {str(e)}"]}
+
+def run_cleanup_coordinator(context):
+    """
+    Fans cleanup out over one worker invocation per index segment and sends one summary.
+    Args:
+        context (LambdaContext): The context of the coordinator invocation.
+    """
+    deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    lambda_client = boto3.client('lambda', config=Config(read_timeout=900, retries={'max_attempts': 0}))
+
+    with ThreadPoolExecutor(max_workers=CLEANUP_TOTAL_SEGMENTS) as executor:
+        segment_results = list(executor.map(
+            lambda segment: invoke_cleanup_segment(lambda_client, context.function_name, segment, deadline),
+            range(CLEANUP_TOTAL_SEGMENTS)
+        ))
+
+    message = f"Deleted {sum(result['Deleted'] for result in segment_results)} EBS snapshots across {CLEANUP_TOTAL_SEGMENTS} segments.\n"
+    for result in segment_results:
+        message += f"Segment {result['Segment']}: {result['Deleted']} deleted, {len(result['Errors'])} errors\n"
+        for error in result['Errors']:
+            message += error + ",\n"
+    print(message)
+    publish_sns_topic('EBS Snapshot Cleanup Summary', message)
+
+def get_connected_ami(client_error_message):
+    """
+    Get the AMI ID from an InvalidSnapshot.InUse error message.
+    Args:
+        client_error_message (str): The ClientError message from delete_snapshot.
+    Returns:
+        str: The ID of the AMI using the snapshot, or None if it is not an AMI.
+    """
+    resource_substring = client_error_message[144:165] if len(client_error_message) > 166 else client_error_message[144:]
+    if resource_substring.startswith("ami-"):
+        return resource_substring
+    return None
+
+def is_ttl_expiry_record(record):
+    """
+    Check if a DynamoDB stream record was produced by TTL expiring an item.
+    Args:
+        record (dict): A DynamoDB stream record.
+    Returns:
+        bool: True if DynamoDB removed the item because its TTL expired.
+    """
+    user_identity = record.get('userIdentity', {})
+    return record.get('eventName') == 'REMOVE' \
+        and user_identity.get('type') == 'Service' \
+        and user_identity.get('principalId') == 'dynamodb.amazonaws.com'
+
+def restore_snapshot_ddb_record(snapshot_item, retry_cleanup):
     """
+    Put back an EBS Snapshot record that was expired by TTL but not cleaned up.
+    Args:
+        snapshot_item (dict): The expired EBS Snapshot record from the stream.
+        retry_cleanup (bool): If True the record expires again tomorrow to retry cleanup,
+            otherwise it is restored without the cleanup attributes.
+    """
+    restored_item = {name: value for name, value in snapshot_item.items() \
+        if name not in ('CleanupStatus', 'ExpirationTime')}
+    if retry_cleanup:
+        retry_time = datetime.now(timezone.utc) + timedelta(days=1)
+        restored_item['CleanupStatus'] = {'S': CLEANUP_STATUS_PENDING}
+        restored_item['ExpirationTime'] = {'N': str(int(retry_time.timestamp()))}
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
+        dynamodb_client.put_item(TableName=DELETION_TABLE, Item=restored_item)
 
-        # Add to table
-        dynamodb_client.update_item(
-            Key={
-                'ResourceId': {
-                    'S': snapshot_item['ResourceId']['S'],
-                }
-            },
-            UpdateExpression="SET ResourceType= :resourceType, AccountId = :accountId, \
-              DeletionDate = :date, ExceptionFlag = :exception, AccountName = :accountName, \
-                ResourceRegion = :region, ResourceState = :state, StorageTier = :storageTier, \
-                VolumeSize = :volumeSize, MonthlyCost = :monthlyCost",
-            ConditionExpression="attribute_not_exists(ResourceId)",
-            ExpressionAttributeValues={
-                ':resourceType': {'S': 'EBS Snapshot'},
-                ':accountId': {'S': snapshot_item['AccountId']['S']},
-                ':date': {'S': snapshot_item['DeletionDate']['S']},
-                ':exception': {'S': snapshot_item['ExceptionFlag']['S']},
-                ':accountName': {'S': snapshot_item['AccountName']['S']},
-                ':region': {'S': snapshot_item['ResourceRegion']['S']},
-                ':state': {'S': snapshot_item['ResourceState']['S']},
-                ':storageTier': {'S': snapshot_item['StorageTier']['S']},
-                ':volumeSize': {'N': str(snapshot_item['VolumeSize']['N'])},
-                ':monthlyCost': {'N': str(snapshot_item['MonthlyCost']['N'])}
-            },
-            TableName=CLEANUP_SAVINGS_TABLE,
-        )
+    except ClientError as e:
+        error_message = f"Error in {DELETION_TABLE} DynamoDB item restore ({snapshot_item['ResourceId']['S']}): {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
+
+def cleanup_expired_snapshots(records):
+    """
+    Deletes EBS snapshots whose records were expired by DynamoDB TTL.
+    Records arrive from the table stream in micro-batches. The item is already
+    gone from the deletion table, so snapshots that cannot be deleted yet are restored.
+    Args:
+        records (list): DynamoDB stream records from the event source mapping.
+    """
+    seven_days_ago = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    dynamodb_client = boto3.Session().client('dynamodb', region_name=DYNAMODB_TABLE_REGION)
+
+    for record in records:
+        if not is_ttl_expiry_record(record):
+            continue
+
+        snapshot = record['dynamodb']['OldImage']
+        if snapshot['ExceptionFlag']['S'] != 'False':
+            print('Exception set after expiry was scheduled, restoring:', snapshot['ResourceId']['S'])
+            restore_snapshot_ddb_record(snapshot, retry_cleanup=False)
+            continue
+
+        if snapshot['ConnectedResource']['S'] != "" and snapshot['LastUpdated']['S'] >= seven_days_ago:
+            restore_snapshot_ddb_record(snapshot, retry_cleanup=True)
+            continue
 
+        try:
+            access_key, secret_access_key, session_token = assume_new_account_role(snapshot['AccountId']['S'])
+            ec2_client = get_multi_account_ec2_client(access_key, secret_access_key, session_token, snapshot['ResourceRegion']['S'])
+            ec2_client.delete_snapshot(SnapshotId=snapshot['ResourceId']['S'], DryRun=False)
+            print("Creating snapshot savings record:", snapshot)
+            # The deletion table record is already gone, so a failed savings write is only left in the error log
+            write_snapshot_bookkeeping(dynamodb_client, snapshot)
+        except ClientError as e:
+            error_message = f'Error deleting snapshot {snapshot["ResourceId"]["S"]} in account {snapshot["AccountName"]["S"]} in region {snapshot["ResourceRegion"]["S"]}: {e}'
+            connected_ami = get_connected_ami(str(e)) if "(InvalidSnapshot.InUse)" in str(e) else None
+            if connected_ami is not None:
+                snapshot['ConnectedResource'] = {'S': connected_ami}
+                snapshot['LastUpdated'] = {'S': datetime.now().strftime('%Y-%m-%d')}
+            else:
+                error_log.append(error_message)
+            restore_snapshot_ddb_record(snapshot, retry_cleanup=True)
+
+def get_cost_saving_update(snapshot_item):
+    """
+    Builds the update that writes a cost-saving record for an EBS Snapshot.
+    Args:
+        snapshot_item (dict): The EBS Snapshot record to save.
+    Returns:
+        dict: update_item parameters, also usable as a TransactWriteItems Update.
+    """
+    return {
+        'Key': {
+            'ResourceId': {
+                'S': snapshot_item['ResourceId']['S'],
+            }
+        },
+        'UpdateExpression': "SET ResourceType= :resourceType, AccountId = :accountId, \
+          DeletionDate = :date, ExceptionFlag = :exception, AccountName = :accountName, \
+            ResourceRegion = :region, ResourceState = :state, StorageTier = :storageTier, \
+            VolumeSize = :volumeSize, MonthlyCost = :monthlyCost, SavedAt = if_not_exists(SavedAt, :savedAt)",
+        'ConditionExpression': "attribute_not_exists(ResourceId)",
+        'ExpressionAttributeValues': {
+            ':resourceType': {'S': 'EBS Snapshot'},
+            ':accountId': {'S': snapshot_item['AccountId']['S']},
+            ':date': {'S': snapshot_item['DeletionDate']['S']},
+            ':exception': {'S': snapshot_item['ExceptionFlag']['S']},
+            ':accountName': {'S': snapshot_item['AccountName']['S']},
+            ':region': {'S': snapshot_item['ResourceRegion']['S']},
+            ':state': {'S': snapshot_item['ResourceState']['S']},
+            ':storageTier': {'S': snapshot_item['StorageTier']['S']},
+            ':volumeSize': {'N': str(snapshot_item['VolumeSize']['N'])},
+            ':monthlyCost': {'N': str(snapshot_item['MonthlyCost']['N'])},
+            ':savedAt': {'N': f"{time.time():.3f}"}
+        },
+        'TableName': CLEANUP_SAVINGS_TABLE,
+    }
+
+def get_cleanup_transact_items(snapshot_item):
+    """
+    Builds the transaction that records a deleted EBS snapshot's savings and removes its deletion table record.
+    Args:
+        snapshot_item (dict): The EBS Snapshot record of the deleted snapshot.
+    Returns:
+        list: TransactWriteItems entries for the snapshot.
+    """
+    return [
+        {'Update': get_cost_saving_update(snapshot_item)},
+        {'Delete': {'TableName': DELETION_TABLE, 'Key': {'ResourceId': snapshot_item['ResourceId']}}}
+    ]
+
+def write_snapshot_bookkeeping(dynamodb_client, snapshot_item):
+    """
+    Records savings and removes the deletion table record for one deleted EBS snapshot.
+    If the savings record already exists, such as after an earlier run that could
+    not remove the deletion table record, only the removal is written.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client for the table region.
+        snapshot_item (dict): The EBS Snapshot record of the deleted snapshot.
+    """
+    try:
+        dynamodb_client.transact_write_items(TransactItems=get_cleanup_transact_items(snapshot_item))
     except ClientError as e:
-        error_message = f"Error in DynamoDB update_item ({snapshot_item['SnapshotId']}): {str(e)}"
-        print('ResourceId:', snapshot_item['SnapshotId'], ', AccountId:', snapshot_item['AccountId'], ', AccountName:',  snapshot_item['AccountName'], ', Region:', snapshot_item['Region'], ', VolumeSize:', str(snapshot_item['VolumeSize']), ', MonthlyCost:', str(snapshot_item['MonthlyCost']))
+        cancellation_reasons = e.response.get('CancellationReasons', [])
+        if cancellation_reasons and cancellation_reasons[0].get('Code') == 'ConditionalCheckFailed':
+            print("Savings already recorded, removing deletion table record:", snapshot_item['ResourceId']['S'])
+            try:
+                dynamodb_client.delete_item(TableName=DELETION_TABLE, Key={'ResourceId': snapshot_item['ResourceId']})
+                return
+            except ClientError as delete_error:
+                e = delete_error
+        error_message = f"Error in DynamoDB savings and removal transaction ({snapshot_item['ResourceId']['S']}): {str(e)}"
         print(error_message)
+        error_log.append(error_message)
+
+def write_cleanup_bookkeeping(dynamodb_client, deleted_snapshots):
+    """
+    Records savings and removes deletion table records for deleted EBS snapshots.
+    Each snapshot's savings record and removal are written in the same transaction,
+    with up to 50 snapshots per TransactWriteItems request. If a transaction is
+    cancelled, its snapshots are retried one transaction each so a single bad
+    record does not hold back the others.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client for the table region.
+        deleted_snapshots (list): EBS Snapshot records of the deleted snapshots.
+    """
+    for start in range(0, len(deleted_snapshots), MAX_TRANSACTION_RESOURCES):
+        snapshot_chunk = deleted_snapshots[start:start + MAX_TRANSACTION_RESOURCES]
+        try:
+            dynamodb_client.transact_write_items(
+                TransactItems=[transact_item for snapshot_item in snapshot_chunk for transact_item in get_cleanup_transact_items(snapshot_item)]
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                error_message = f"Error in DynamoDB savings and removal transaction ({len(snapshot_chunk)} snapshots): {str(e)}"
+                print(error_message)
+                error_log.append(error_message)
+                continue
+
+            for snapshot_item in snapshot_chunk:
+                write_snapshot_bookkeeping(dynamodb_client, snapshot_item)
 
 def update_snapshot_ddb_record(snapshot_id, connected_resource):
     """
@@ -205,7 +514,7 @@ def update_snapshot_ddb_record(snapshot_id, connected_resource):
             UpdateExpression="SET ConnectedResource = :connectedResource, LastUpdated = :lastUpdated",
             ExpressionAttributeValues={
                 ':connectedResource': {'S': connected_resource},
-                ':lastUpdated': {'S': today_date}
+                ':lastUpdated': {'S': datetime.now().strftime('%Y-%m-%d')}
             },
             TableName=DELETION_TABLE,
         )
@@ -238,6 +547,9 @@ def publish_sns_topic(subject_message, sns_input):
 
 def lambda_handler(event, context):
     """Handles the Lambda function events.
+    Runs on a schedule, or on TTL expiry records from the deletion table stream.
+    With more than one cleanup segment, the scheduled run coordinates one worker
+    invocation per segment and the workers return their results to it.
 
     Args:
         event (dict): The event data passed to the Lambda function.
@@ -247,7 +559,19 @@ def lambda_handler(event, context):
         dict: The response object.
     """
     print("Event: ", event, "Context: ", context)
-    delete_old_snapshots()
+    # Warm containers keep module state, so start each run with an empty log
+    error_log.clear()
+
+    if 'Segment' in event:
+        deleted_count = delete_old_snapshots(event['Segment'], event['TotalSegments'], context.aws_request_id, event.get('Deadline'))
+        return {'Segment': event['Segment'], 'Deleted': deleted_count, 'Errors': list(error_log)}
+
+    if 'Records' in event:
+        cleanup_expired_snapshots(event['Records'])
+    elif CLEANUP_TOTAL_SEGMENTS > 1:
+        run_cleanup_coordinator(context)
+    else:
+        delete_old_snapshots()
 
     if error_log:
         message = ""
@@ -22,7 +22,8 @@ resource "aws_lambda_function" "ebs_snapshot_cleanup_lambda_function" {
       ACCOUNT_TABLE           = var.account_table_name,
       CLEANUP_SAVINGS_TABLE   = var.cleanup_savings_table_name,
       SNAPSHOT_DELETION_TABLE = var.ebs_snapshot_table_name,
-      DYNAMODB_TABLE_REGION   = var.dynamodb_table_region
+      DYNAMODB_TABLE_REGION   = var.dynamodb_table_region,
+      CLEANUP_TOTAL_SEGMENTS  = tostring(var.cleanup_total_segments)
     }
   }
 
@@ -55,4 +56,29 @@ resource "aws_lambda_function_event_invoke_config" "ebs_snapshot_cleanup_lambda_
       destination = var.sns_topic_arn
     }
   }
-}
\ No newline at end of file
+}
+
+# Invoke cleanup in micro-batches as records expire from the inventory table
+resource "aws_lambda_event_source_mapping" "ebs_snapshot_cleanup_ttl_expiry_stream" {
+  count = var.event_driven_cleanup ? 1 : 0
+
+  event_source_arn                   = var.ebs_snapshot_table_stream_arn
+  function_name                      = aws_lambda_function.ebs_snapshot_cleanup_lambda_function.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 25
+  maximum_batching_window_in_seconds = 60
+  bisect_batch_on_function_error     = true
+  maximum_retry_attempts             = 2
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["REMOVE"]
+        userIdentity = {
+          type        = ["Service"]
+          principalId = ["dynamodb.amazonaws.com"]
+        }
+      })
+    }
+  }
+}
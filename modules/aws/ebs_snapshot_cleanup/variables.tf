@@ -4,6 +4,12 @@ variable "env" {
   default     = "dev"
 }
 
+variable "event_driven_cleanup" {
+  description = "Clean up resources from TTL expiry records on the inventory table stream instead of only on the schedule"
+  type        = bool
+  default     = false
+}
+
 variable "account_table_arn" {
   description = "ARN of the DynamoDB table to store AWS accounts"
   type        = string
@@ -25,6 +31,12 @@ variable "cleanup_savings_table_name" {
   default     = "resource-cleanup-savings"
 }
 
+variable "cleanup_total_segments" {
+  description = "Number of index segments to fan cleanup out over, each handled by its own invocation (1 runs cleanup in a single invocation)"
+  type        = number
+  default     = 1
+}
+
 variable "ebs_snapshot_table_arn" {
   description = "ARN of the DynamoDB table to store EBS snapshots"
   type        = string
@@ -63,3 +75,9 @@ variable "dynamodb_table_region" {
   type        = string
   default     = "us-west-2"
 }
+
+variable "ebs_snapshot_table_stream_arn" {
+  description = "Stream ARN of the DynamoDB table to store EBS snapshot information, required for event driven cleanup"
+  type        = string
+  default     = ""
+}
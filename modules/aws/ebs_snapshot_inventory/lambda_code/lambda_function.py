@@ -4,6 +4,8 @@ Gathers EBS snapshot data from all accounts and regions and stores it in a Dynam
 Deletion date is set to establish a time to live for each snapshot based on environment tag.
 """
 import os
+import gzip
+import json
 from datetime import datetime, timedelta, timezone
 import boto3
 from botocore.exceptions import ClientError
@@ -15,7 +17,16 @@ CROSS_ACCOUNT_ROLE = os.environ['CROSS_ACCOUNT_ROLE']
 ACTIVE_REGIONS = os.environ['ACTIVE_REGIONS'].split(',')
 ACCOUNT_DDB_TABLE = os.environ['ACCOUNT_TABLE']
 ACCOUNT_DDB_TABLE_INDEX = 'AccountName-index'
+ACTIVE_ROSTER_INDEX = 'ActiveRoster-index' # Sparse index of the active accounts
 DELETION_TABLE = os.environ['SNAPSHOT_DELETION_TABLE']
+CLEANUP_STATUS_PENDING = 'PENDING' # Sparse key for the CleanupStatus-DeletionDate-index
+CLEANUP_ATTRIBUTES = ['CleanupStatus', 'ExpirationTime']
+EVENT_DRIVEN_CLEANUP = os.environ.get('EVENT_DRIVEN_CLEANUP', 'false') == 'true'
+COST_TIMESERIES_TABLE = os.environ.get('COST_TIMESERIES_TABLE', '') # Optional daily cost trend table
+ACCOUNT_ROSTER_BUCKET = os.environ.get('ACCOUNT_ROSTER_BUCKET', '') # Optional roster published by the account pull
+ACCOUNT_ROSTER_KEY = 'account_roster/active_accounts.json.gz'
+ACCOUNT_ROSTER_CACHE = '/tmp/account_roster.json.gz'
+ACCOUNT_ROSTER_ETAG_CACHE = '/tmp/account_roster.etag'
 SNSTOPICARN=os.environ['SNS_ARN']
 EBS_SNAPSHOT_PRICING = {
     'us-west-2': {
@@ -57,19 +68,82 @@ thirty_days_ago = datetime.now() - timedelta(days=30)
 
 error_log = []
 
+def load_account_roster():
+    """
+    Load the roster of active accounts published by the account pull.
+    The roster is cached in /tmp across warm starts and only downloaded again
+    when its ETag has changed.
+    Returns:
+        list: Active accounts in DynamoDB-JSON format, with AccountId, AccountName,
+        Environment and AccountStatus.
+    """
+    request = {'Bucket': ACCOUNT_ROSTER_BUCKET, 'Key': ACCOUNT_ROSTER_KEY}
+    if os.path.exists(ACCOUNT_ROSTER_CACHE) and os.path.exists(ACCOUNT_ROSTER_ETAG_CACHE):
+        with open(ACCOUNT_ROSTER_ETAG_CACHE, encoding='utf-8') as etag_file:
+            request['IfNoneMatch'] = etag_file.read()
+
+    try:
+        response = boto3.client('s3').get_object(**request)
+        roster_data = response['Body'].read()
+        with open(ACCOUNT_ROSTER_CACHE, 'wb') as roster_file:
+            roster_file.write(roster_data)
+        with open(ACCOUNT_ROSTER_ETAG_CACHE, 'w', encoding='utf-8') as etag_file:
+            etag_file.write(response['ETag'])
+
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('304', 'NotModified') or 'IfNoneMatch' not in request:
+            raise
+        with open(ACCOUNT_ROSTER_CACHE, 'rb') as roster_file:
+            roster_data = roster_file.read()
+        print("Account roster unchanged, using cached copy")
+
+    roster = json.loads(gzip.decompress(roster_data))
+    return [{attribute: {'S': value} for attribute, value in account.items()} for account in roster['Accounts']]
+
+def query_active_accounts(dynamodb_client):
+    """
+    Get the active accounts from the sparse ActiveRoster index of the account table.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+    Returns:
+        list: Active accounts with AccountId, AccountName, Environment and AccountStatus.
+    """
+    active_accounts = []
+    paginator = dynamodb_client.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=ACCOUNT_DDB_TABLE,
+        IndexName=ACTIVE_ROSTER_INDEX,
+        KeyConditionExpression='ActiveRoster = :active',
+        ExpressionAttributeValues={':active': {'S': 'ACTIVE'}}
+    ):
+        active_accounts.extend(page['Items'])
+    return active_accounts
+
 def get_active_accounts():
     """
-    Get active accounts from DynamoDB.
+    Get active accounts from the account roster, or from DynamoDB without one.
     Returns:
         list: A list of active account information.
     """
+    if ACCOUNT_ROSTER_BUCKET:
+        try:
+            return load_account_roster()
+        except (ClientError, OSError, ValueError) as e:
+            print(f"Account roster not loaded, querying {ACCOUNT_DDB_TABLE} instead: {str(e)}")
+
     try:
         dynamodb_client = boto3.client('dynamodb')
+        active_accounts = query_active_accounts(dynamodb_client)
+        if active_accounts:
+            return active_accounts
+
+        # The index is empty until the account pull has set ActiveRoster on the accounts
+        print(f"No accounts in {ACTIVE_ROSTER_INDEX}, scanning {ACCOUNT_DDB_TABLE}")
         scan_response = dynamodb_client.scan(TableName=ACCOUNT_DDB_TABLE)
         return scan_response['Items']
 
     except ClientError as e:
-        error_message = f"Error in {ACCOUNT_DDB_TABLE} DynamoDB scan and processing: {str(e)}"
+        error_message = f"Error in {ACCOUNT_DDB_TABLE} DynamoDB query and processing: {str(e)}"
         print(error_message)
         error_log.append(error_message)
 
@@ -310,6 +384,9 @@ def create_snapshot_ddb_record(snapshot):
         snapshot (dict): The snapshot data to store in the DDB table.
     """
 
+    cleanup_attributes = get_cleanup_attributes(calculate_deletion_date(snapshot), snapshot['ExceptionFlag'])
+    cleanup_expression = "".join(f", {name} = :{name}" for name in cleanup_attributes)
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb')
@@ -324,7 +401,7 @@ def create_snapshot_ddb_record(snapshot):
                 ExceptionFlag = :exception, AccountName = :accountName, \
                 ResourceRegion = :region, ResourceState = :state, StorageTier = :storageTier, \
                 VolumeSize = :volumeSize, MonthlyCost = :monthlyCost, \
-                ConnectedResource = :connectedResource, LastUpdated = :lastUpdated",
+                ConnectedResource = :connectedResource, LastUpdated = :lastUpdated" + cleanup_expression,
             ConditionExpression="attribute_not_exists(ResourceId)",
             ExpressionAttributeValues={
               ':accountId': {'S': snapshot['AccountId']},
@@ -337,7 +414,8 @@ def create_snapshot_ddb_record(snapshot):
               ':volumeSize': {'N': str(snapshot['VolumeSize'])},
               ':monthlyCost': {'N': snapshot['MonthlyCost']},
               ':connectedResource': {'S': snapshot['ConnectedResource']},
-              ':lastUpdated': {'S': today_date}
+              ':lastUpdated': {'S': today_date},
+              **{f":{name}": value for name, value in cleanup_attributes.items()}
             },
             TableName=DELETION_TABLE,
         )
@@ -401,6 +479,74 @@ def update_snapshot_ddb_record(snapshot):
         print(error_message)
         error_log.append(error_message)
 
+def get_cleanup_attributes(deletion_date, exception_flag):
+    """
+    Build the attributes that make a record visible to the cleanup function.
+    CleanupStatus keys the sparse deletion date index. With event driven cleanup
+    enabled, ExpirationTime lets DynamoDB TTL expire the record the day after its
+    deletion date. Records with an exception carry neither attribute.
+    Args:
+        deletion_date (str): The deletion date in 'YYYY-MM-DD' format.
+        exception_flag (str): The ExceptionFlag value of the record.
+    Returns:
+        dict: Attribute names mapped to DynamoDB attribute values.
+    """
+    if exception_flag != 'False':
+        return {}
+
+    cleanup_attributes = {'CleanupStatus': {'S': CLEANUP_STATUS_PENDING}}
+    if EVENT_DRIVEN_CLEANUP:
+        expiration_date = datetime.strptime(deletion_date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+        cleanup_attributes['ExpirationTime'] = {'N': str(int(expiration_date.timestamp()))}
+
+    return cleanup_attributes
+
+def sync_cleanup_status(table_item):
+    """
+    Keep the CleanupStatus and ExpirationTime attributes in line with the ExceptionFlag.
+    Only snapshots without an exception carry them, so only they are returned by the
+    deletion date index or expired by TTL for the cleanup function.
+    Args:
+        table_item (dict): The EBS snapshot record from DynamoDB.
+    """
+    cleanup_attributes = get_cleanup_attributes(table_item['DeletionDate']['S'], table_item['ExceptionFlag']['S'])
+    set_attributes = {name: value for name, value in cleanup_attributes.items() if table_item.get(name) != value}
+    # A retry scheduled by the cleanup function expires later than the DeletionDate, so keep it
+    if 'ExpirationTime' in set_attributes and 'ExpirationTime' in table_item \
+        and int(table_item['ExpirationTime']['N']) > int(set_attributes['ExpirationTime']['N']):
+        del set_attributes['ExpirationTime']
+    remove_attributes = [name for name in CLEANUP_ATTRIBUTES if name in table_item and name not in cleanup_attributes]
+    if not set_attributes and not remove_attributes:
+        return
+
+    update_expression = ""
+    if set_attributes:
+        update_expression += "SET " + ", ".join(f"{name} = :{name}" for name in set_attributes)
+    if remove_attributes:
+        update_expression += " REMOVE " + ", ".join(remove_attributes)
+
+    update_kwargs = {
+        'Key': {
+            'ResourceId': {
+                'S': table_item['ResourceId']['S'],
+            }
+        },
+        'UpdateExpression': update_expression.strip(),
+        'TableName': DELETION_TABLE,
+    }
+    if set_attributes:
+        update_kwargs['ExpressionAttributeValues'] = {f":{name}": value for name, value in set_attributes.items()}
+
+    try:
+        primary_session = boto3.Session()
+        dynamodb_client = primary_session.client('dynamodb')
+        dynamodb_client.update_item(**update_kwargs)
+
+    except ClientError as e:
+        error_message = f"Error in DynamoDB cleanup attribute update_item ({table_item['ResourceId']['S']}): {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
+
 def update_ddb_records(snapshots):
     """
     Update DynamoDB records for EBS snapshots.
@@ -421,6 +567,9 @@ def update_ddb_records(snapshots):
                 print('updating:', table_item['ResourceId']['S'])
                 update_snapshot_ddb_record(snapshot_entry)
 
+            # Backfill or clear the cleanup index key if the ExceptionFlag changed
+            sync_cleanup_status(table_item)
+
             # Check if EBS snapshot has deletion tag and if it is accurate
             deletion_tag_value = check_snapshot_for_deletion_tag(snapshot_entry)
             if deletion_tag_value == None or deletion_tag_value != table_item['DeletionDate']['S']:
@@ -539,6 +688,65 @@ def get_snapshot_by_id(snapshot_id, account_id, account_name, region):
 
     return snapshot_list_output
 
+def get_cost_aggregates(snapshots):
+    """
+    Total the snapshots by account and region.
+    Args:
+        snapshots (list): Snapshots from get_snapshots.
+    Returns:
+        dict: [count, size in GB, monthly cost] keyed by (account id, region).
+    """
+    aggregates = {}
+    for snapshot in snapshots:
+        totals = aggregates.setdefault((snapshot['AccountId'], snapshot['Region']), [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += snapshot['VolumeSize']
+        totals[2] += float(snapshot['MonthlyCost'])
+    return aggregates
+
+def write_cost_timeseries(resource_type, aggregates):
+    """
+    Write today's totals into the monthly cost time-series items.
+    Each series gets one item per month with a DD attribute per day, so a year of
+    trend data is twelve reads per series regardless of fleet size. Reruns on the
+    same day overwrite that day.
+    Args:
+        resource_type (str): The resource type of the series.
+        aggregates (dict): [count, size, cost] keyed by (account id, region).
+    """
+    if COST_TIMESERIES_TABLE == '':
+        return
+
+    today = datetime.now(timezone.utc)
+    fleet_totals = [0, 0, 0.0]
+    series = {}
+    for (account_id, region), totals in aggregates.items():
+        series[f"{resource_type}#{account_id}#{region}"] = totals
+        fleet_totals = [fleet_total + total for fleet_total, total in zip(fleet_totals, totals)]
+    series[f"{resource_type}#ALL"] = fleet_totals
+
+    dynamodb_client = boto3.Session().client('dynamodb')
+    for series_key, totals in series.items():
+        try:
+            dynamodb_client.update_item(
+                TableName=COST_TIMESERIES_TABLE,
+                Key={
+                    'SeriesKey': {'S': series_key},
+                    'Period': {'S': today.strftime('%Y-%m')}
+                },
+                UpdateExpression="SET #day = :totals, LastUpdated = :lastUpdated",
+                ExpressionAttributeNames={'#day': f"D{today.strftime('%d')}"},
+                ExpressionAttributeValues={
+                    ':totals': {'L': [{'N': str(totals[0])}, {'N': str(totals[1])}, {'N': f"{totals[2]:.2f}"}]},
+                    ':lastUpdated': {'S': today.strftime('%Y-%m-%dT%H:%M:%SZ')}
+                }
+            )
+
+        except ClientError as e:
+            error_message = f"Error in {COST_TIMESERIES_TABLE} cost time-series update ({series_key}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+
 def publish_sns_topic(subject_message, sns_input):
     """
     Publish a message to an SNS topic.
@@ -605,6 +813,7 @@ def lambda_handler(event, context):
     print("Number of Snapshots to be deleted:", len(snapshot_list))
 
     update_ddb_records(snapshot_list)
+    write_cost_timeseries('EBS Snapshot', get_cost_aggregates(snapshot_list))
 
     if error_log:
         message = ""
@@ -20,7 +20,10 @@ resource "aws_lambda_function" "ebs_snapshot_inventory_lambda_function" {
       ACTIVE_REGIONS          = var.active_regions,
       CROSS_ACCOUNT_ROLE      = var.cross_account_inventory_role_name,
       ACCOUNT_TABLE           = var.account_table_name,
-      SNAPSHOT_DELETION_TABLE = aws_dynamodb_table.ebs_snapshot_table.id
+      ACCOUNT_ROSTER_BUCKET   = var.account_roster_bucket_name,
+      SNAPSHOT_DELETION_TABLE = aws_dynamodb_table.ebs_snapshot_table.id,
+      EVENT_DRIVEN_CLEANUP    = tostring(var.event_driven_cleanup),
+      COST_TIMESERIES_TABLE   = var.cost_timeseries_table_name
     }
   }
 
@@ -7,3 +7,8 @@ output "ebs_snapshot_dynamodb_table_arn" {
   description = "DynamoDB table ARN for EBS snapshot inventory"
   value       = aws_dynamodb_table.ebs_snapshot_table.arn
 }
+
+output "ebs_snapshot_dynamodb_table_stream_arn" {
+  value       = aws_dynamodb_table.ebs_snapshot_table.stream_arn
+  description = "Stream ARN of the DynamoDB table for EBS snapshot inventory (empty unless event driven cleanup is enabled)"
+}
@@ -1,3 +1,15 @@
+variable "account_roster_bucket_arn" {
+  description = "ARN of the S3 bucket holding the account roster published by the account pull, empty to scan the account table"
+  type        = string
+  default     = ""
+}
+
+variable "account_roster_bucket_name" {
+  description = "Name of the S3 bucket holding the account roster published by the account pull, empty to scan the account table"
+  type        = string
+  default     = ""
+}
+
 
 variable "active_regions" {
   description = "Comma-separated list of AWS regions to inventory EBS snapshots in"
@@ -15,6 +27,18 @@ variable "account_table_name" {
   type        = string
 }
 
+variable "cost_timeseries_table_arn" {
+  description = "ARN of the DynamoDB table for daily cost time-series, empty to not record them"
+  type        = string
+  default     = ""
+}
+
+variable "cost_timeseries_table_name" {
+  description = "Name of the DynamoDB table for daily cost time-series, empty to not record them"
+  type        = string
+  default     = ""
+}
+
 variable "cross_account_inventory_role_name" {
   description = "Name of the IAM role to assume in target accounts"
   type        = string
@@ -26,6 +50,18 @@ variable "env" {
   default     = "dev"
 }
 
+variable "event_driven_cleanup" {
+  description = "Set a TTL on due records and enable the table stream so cleanup runs as records expire"
+  type        = bool
+  default     = false
+}
+
+variable "point_in_time_recovery" {
+  description = "Enable point-in-time recovery on the table, required to report from table exports"
+  type        = bool
+  default     = false
+}
+
 variable "short_region" {
   description = "Short region code (e.g., usw2 for us-west-2)"
   type        = string
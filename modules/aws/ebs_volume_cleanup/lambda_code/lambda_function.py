@@ -5,14 +5,26 @@ and logs any errors.
 It also sends notifications via SNS if any issues occur during the process.
 """
 import os
-from datetime import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import boto3
 from botocore.exceptions import ClientError
+from botocore.config import Config
 import botocore
 
 AWS_REGION = os.environ['AWS_REGION']
 CROSS_ACCOUNT_ROLE = os.environ['CROSS_ACCOUNT_ROLE']
 EBS_VOLUME_DDB_TABLE = os.environ['EBS_VOLUME_TABLE']
+DELETION_DATE_INDEX = 'CleanupStatus-DeletionDate-index'
+CLEANUP_STATUS_PENDING = 'PENDING'
+REVALIDATION_CHUNK_SIZE = 200 # Volume IDs per describe_volumes filter
+CLEANUP_TOTAL_SEGMENTS = int(os.environ.get('CLEANUP_TOTAL_SEGMENTS', '1'))
+LEASE_SECONDS = 900 # Matches the Lambda timeout so a lease outlives the worker holding it
+DEADLINE_MARGIN_SECONDS = 60 # Time the coordinator keeps to collect results and notify
+WORKER_RETURN_SECONDS = 30 # Time past the deadline a worker has to write bookkeeping and return
+MAX_TRANSACTION_RESOURCES = 50 # TransactWriteItems takes 100 actions, two per volume
 CLEANUP_SAVINGS_TABLE = os.environ['CLEANUP_SAVINGS_TABLE']
 SNSTOPICARN = os.environ['SNS_ARN']
 
@@ -81,17 +93,15 @@ def remove_ebs_volume_ddb_record(volume_id):
 
     return
 
-def delete_ebs_volume(volume_id, account_id, region):
+def delete_ebs_volume(ec2_client, volume_id):
     """
     Deletes an EBS volume.
     Args:
+        ec2_client (boto3.client): EC2 client for the account and region of the volume.
         volume_id (str): The ID of the EBS volume to delete.
-        account_id (str): The ID of the AWS account.
-        region (str): The AWS region where the volume is located.
+    Returns:
+        bool: True if the volume was deleted, False otherwise.
     """
-    access_key, secret_access_key, session_token = assume_new_account_role(account_id)
-    ec2_client = get_multi_account_ec2_client(access_key, secret_access_key, session_token, region)
-
     try:
         ec2_client.delete_volume(
           VolumeId=volume_id,
@@ -102,98 +112,491 @@ def delete_ebs_volume(volume_id, account_id, region):
         error_message = f"Error in deleting EBS Volume ({volume_id}): {str(e)}"
         print(error_message)
         error_log.append(error_message)
+        return False
 
-    return
+    return True
+
+def query_due_ebs_volume_ddb_records(today_date):
+    """
+    Query the sparse deletion date index for EBS volumes that are due for cleanup.
+    Only volumes without an exception carry the CleanupStatus key, so the read
+    cost scales with the number of due volumes rather than the table size.
+    Args:
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+    Returns:
+        list: EBS volume records with a deletion date before today.
+    """
+    primary_session = boto3.Session()
+    dynamodb_client = primary_session.client('dynamodb')
+
+    query_kwargs = {
+        'TableName': EBS_VOLUME_DDB_TABLE,
+        'IndexName': DELETION_DATE_INDEX,
+        'KeyConditionExpression': "CleanupStatus = :cleanupStatus AND DeletionDate < :today",
+        'ExpressionAttributeValues': {
+            ':cleanupStatus': {'S': CLEANUP_STATUS_PENDING},
+            ':today': {'S': today_date}
+        }
+    }
+
+    query_response = dynamodb_client.query(**query_kwargs)
+    items = query_response['Items']
+
+    while 'LastEvaluatedKey' in query_response:
+        query_response = dynamodb_client.query(ExclusiveStartKey=query_response['LastEvaluatedKey'], **query_kwargs)
+        items.extend(query_response['Items'])
+
+    return items
+
+def get_live_ebs_volumes(ec2_client, volume_ids):
+    """
+    Get the current state of EBS volumes in one account and region.
+    A volume-id filter is used instead of VolumeIds so that volumes which no
+    longer exist are left out of the response rather than failing the call.
+    Args:
+        ec2_client (boto3.client): EC2 client for the account and region.
+        volume_ids (list): IDs of the EBS volumes to look up.
+    Returns:
+        dict: Volume descriptions keyed by VolumeId.
+    """
+    live_volumes = {}
+    paginator = ec2_client.get_paginator('describe_volumes')
 
-def delete_old_ebs_volumes():
+    for start in range(0, len(volume_ids), REVALIDATION_CHUNK_SIZE):
+        volume_id_chunk = volume_ids[start:start + REVALIDATION_CHUNK_SIZE]
+        for page in paginator.paginate(Filters=[{'Name': 'volume-id', 'Values': volume_id_chunk}]):
+            for volume in page['Volumes']:
+                live_volumes[volume['VolumeId']] = volume
+
+    return live_volumes
+
+def group_ebs_volume_candidates(candidates):
+    """
+    Group cleanup candidates by account and region.
+    Args:
+        candidates (list): EBS volume records that are due for cleanup.
+    Returns:
+        dict: Lists of records keyed by (account ID, region).
+    """
+    candidate_groups = {}
+    for table_item in candidates:
+        group_key = (table_item['AccountId']['S'], table_item['ResourceRegion']['S'])
+        candidate_groups.setdefault(group_key, []).append(table_item)
+    return candidate_groups
+
+def revalidate_ebs_volume_candidates(candidates):
+    """
+    Check the live state of cleanup candidates before deleting them.
+    Candidates are grouped by account and region so each group needs one role
+    assumption and a describe_volumes call per 200 volumes. Volumes that were
+    re-attached are skipped and left for the next inventory run to reconcile.
+    Records of volumes that no longer exist are removed without a savings record.
+    Args:
+        candidates (list): EBS volume records that are due for cleanup.
+    Returns:
+        tuple: A list of (EC2 client, still detached volume records) per account and
+            region, and a list of records that could not be checked.
     """
-    Deletes EBS volumes older than 30 days.
+    revalidated_groups = []
+    unchecked_items = []
+    for (account_id, region), group_items in group_ebs_volume_candidates(candidates).items():
+        try:
+            access_key, secret_access_key, session_token = assume_new_account_role(account_id)
+            ec2_client = get_multi_account_ec2_client(access_key, secret_access_key, session_token, region)
+            live_volumes = get_live_ebs_volumes(ec2_client, [table_item['VolumeId']['S'] for table_item in group_items])
+
+        except ClientError as e:
+            error_message = f"Error revalidating EBS volumes in account {account_id} in region {region}: {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+            unchecked_items.extend(group_items)
+            continue
+
+        detached_items = []
+        for table_item in group_items:
+            volume = live_volumes.get(table_item['VolumeId']['S'])
+            if volume is None:
+                print('Volume no longer exists, removing record:', table_item['VolumeId']['S'])
+                remove_ebs_volume_ddb_record(table_item['VolumeId']['S'])
+            elif volume['State'] != 'available' or volume.get('Attachments'):
+                print('Volume is attached, skipping cleanup:', table_item['VolumeId']['S'])
+            else:
+                detached_items.append(table_item)
+
+        if detached_items:
+            revalidated_groups.append((ec2_client, detached_items))
+
+    return revalidated_groups, unchecked_items
+
+def scan_due_ebs_volume_ddb_segment(today_date, segment, total_segments):
     """
+    Scan one segment of the sparse deletion date index for EBS volumes that are due for cleanup.
+    Args:
+        today_date (str): Today's date in 'YYYY-MM-DD' format.
+        segment (int): The segment of the index to scan.
+        total_segments (int): The number of segments the index is split into.
+    Returns:
+        list: EBS volume records in the segment with a deletion date before today.
+    """
+    primary_session = boto3.Session()
+    dynamodb_client = primary_session.client('dynamodb')
+
+    scan_kwargs = {
+        'TableName': EBS_VOLUME_DDB_TABLE,
+        'IndexName': DELETION_DATE_INDEX,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': "DeletionDate < :today",
+        'ExpressionAttributeValues': {
+            ':today': {'S': today_date}
+        }
+    }
+
+    scan_response = dynamodb_client.scan(**scan_kwargs)
+    items = scan_response['Items']
+
+    while 'LastEvaluatedKey' in scan_response:
+        scan_response = dynamodb_client.scan(ExclusiveStartKey=scan_response['LastEvaluatedKey'], **scan_kwargs)
+        items.extend(scan_response['Items'])
+
+    return items
+
+def claim_ebs_volume_ddb_record(volume_id, lease_owner):
+    """
+    Claim an EBS volume record with a conditional lease so no other worker cleans it up.
+    Args:
+        volume_id (str): The ID of the EBS volume to claim.
+        lease_owner (str): ID of the worker invocation taking the lease.
+    Returns:
+        bool: True if the lease was taken, False if the record is gone or leased by another worker.
+    """
+    now = int(time.time())
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb')
 
+        dynamodb_client.update_item(
+            TableName=EBS_VOLUME_DDB_TABLE,
+            Key={
+                'VolumeId': {
+                    'S': volume_id
+                }
+            },
+            UpdateExpression="SET LeaseOwner = :owner, LeaseExpires = :expires",
+            ConditionExpression="attribute_exists(VolumeId) AND (attribute_not_exists(LeaseExpires) OR LeaseExpires < :now)",
+            ExpressionAttributeValues={
+                ':owner': {'S': lease_owner},
+                ':expires': {'N': str(now + LEASE_SECONDS)},
+                ':now': {'N': str(now)}
+            }
+        )
+
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            error_message = f"Error in {EBS_VOLUME_DDB_TABLE} DynamoDB lease claim ({volume_id}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+        return False
+
+    return True
+
+def delete_old_ebs_volumes(segment=None, total_segments=None, lease_owner=None, deadline=None):
+    """
+    Deletes EBS volumes that are past their deletion date.
+    When a segment is given, only that segment of the deletion date index is
+    processed and each record is claimed with a lease before it is cleaned up.
+    Args:
+        segment (int): The segment of the index to process, or None for all due volumes.
+        total_segments (int): The number of segments the index is split into.
+        lease_owner (str): ID of the worker invocation taking leases.
+        deadline (float): Epoch seconds after which no more volumes are deleted.
+    Returns:
+        int: The number of EBS volumes deleted.
+    """
+    deleted_count = 0
+
+    try:
         today_date = datetime.now().strftime('%Y-%m-%d')
 
-        scan_response = dynamodb_client.scan(TableName=EBS_VOLUME_DDB_TABLE)
+        if segment is None:
+            due_items = query_due_ebs_volume_ddb_records(today_date)
+        else:
+            due_items = scan_due_ebs_volume_ddb_segment(today_date, segment, total_segments)
 
-        for table_item in scan_response['Items']:
-            if today_date > table_item['DeletionDate']['S'] and table_item['ExceptionFlag']['S'] == 'False':
-                print('Remove: ', table_item['VolumeId']['S'], "in", table_item['AccountName']['S'], "with deletion date:", table_item['DeletionDate']['S'] )
-                create_cost_saving_ddb_record(table_item)
-                delete_ebs_volume(table_item['VolumeId']['S'], table_item['AccountId']['S'], table_item['ResourceRegion']['S'])
-                remove_ebs_volume_ddb_record(table_item['VolumeId']['S'])
+        # The index key is only cleared on the next inventory run, so recheck the flag
+        unflagged_items = [table_item for table_item in due_items if table_item['ExceptionFlag']['S'] == 'False']
+
+        dynamodb_client = boto3.Session().client('dynamodb')
+        deleted_volumes = []
+        past_deadline = False
+
+        # Claim and revalidate one account and region at a time, so a worker out of
+        # time stops before assuming another role and leaves the rest unleased
+        for group_items in group_ebs_volume_candidates(unflagged_items).values():
+            if past_deadline or (deadline is not None and time.time() > deadline):
+                break
+            candidates = [table_item for table_item in group_items \
+                if lease_owner is None or claim_ebs_volume_ddb_record(table_item['VolumeId']['S'], lease_owner)]
+
+            revalidated_groups, _ = revalidate_ebs_volume_candidates(candidates)
+            for ec2_client, detached_items in revalidated_groups:
+                for table_item in detached_items:
+                    # Leased volumes left over are picked up once the lease expires
+                    if deadline is not None and time.time() > deadline:
+                        past_deadline = True
+                        break
+                    print('Remove: ', table_item['VolumeId']['S'], "in", table_item['AccountName']['S'], "with deletion date:", table_item['DeletionDate']['S'] )
+                    if delete_ebs_volume(ec2_client, table_item['VolumeId']['S']):
+                        deleted_volumes.append(table_item)
+                        deleted_count += 1
+                    if len(deleted_volumes) == MAX_TRANSACTION_RESOURCES:
+                        write_cleanup_bookkeeping(dynamodb_client, deleted_volumes)
+                        deleted_volumes = []
+
+        write_cleanup_bookkeeping(dynamodb_client, deleted_volumes)
 
     except ClientError as e:
         error_message = f"Error deleting EBS volume and removing it from DDB table: {str(e)}"
         print(error_message)
         error_log.append(error_message)
 
-def create_cost_saving_ddb_record(deleted_volume):
+    return deleted_count
+
+def invoke_cleanup_segment(lambda_client, function_name, segment, deadline):
     """
-    Creates a cost-saving record in the DynamoDB table for the deleted EBS volume.
+    Invoke a worker for one segment and wait for its result.
     Args:
-        deleted_volume (dict): The deleted EBS volume record.
+        lambda_client (boto3.client): Lambda client with a read timeout ending before the coordinator times out.
+        function_name (str): Name of this Lambda function.
+        segment (int): The segment for the worker to process.
+        deadline (float): Epoch seconds after which the worker stops deleting.
+    Returns:
+        dict: The worker's summary of the segment.
     """
-    today_date = datetime.now().strftime('%Y-%m-%d')
+    try:
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({'Segment': segment, 'TotalSegments': CLEANUP_TOTAL_SEGMENTS, 'Deadline': deadline})
+        )
+        payload = json.loads(response['Payload'].read())
+        if 'FunctionError' in response:
+            return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker failed: {payload}"]}
+        return payload
+
+    except (ClientError, botocore.exceptions.ReadTimeoutError) as e:
+        return {'Segment': segment, 'Deleted': 0, 'Errors': [f"Segment {segment} worker invoke failed: {str(e)}"]}
+
+def run_cleanup_coordinator(context):
+    """
+    Fan cleanup out over one worker invocation per index segment and send one summary.
+    Args:
+        context (LambdaContext): The context of the coordinator invocation.
+    """
+    deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    # Stop waiting on workers while there is still time to publish the summary
+    read_timeout = max(1, int(deadline - time.time() + WORKER_RETURN_SECONDS))
+    lambda_client = boto3.client('lambda', config=Config(read_timeout=read_timeout, retries={'max_attempts': 0}))
+
+    with ThreadPoolExecutor(max_workers=CLEANUP_TOTAL_SEGMENTS) as executor:
+        segment_results = list(executor.map(
+            lambda segment: invoke_cleanup_segment(lambda_client, context.function_name, segment, deadline),
+            range(CLEANUP_TOTAL_SEGMENTS)
+        ))
+
+    message = f"Deleted {sum(result['Deleted'] for result in segment_results)} EBS volumes across {CLEANUP_TOTAL_SEGMENTS} segments.\n"
+    for result in segment_results:
+        message += f"Segment {result['Segment']}: {result['Deleted']} deleted, {len(result['Errors'])} errors\n"
+        for error in result['Errors']:
+            message += error + ",\n"
+    print(message)
+    publish_sns_topic('EBS Volume Cleanup Summary', message)
+
+def is_ttl_expiry_record(record):
+    """
+    Check if a DynamoDB stream record was produced by TTL expiring an item.
+    Args:
+        record (dict): A DynamoDB stream record.
+    Returns:
+        bool: True if DynamoDB removed the item because its TTL expired.
+    """
+    user_identity = record.get('userIdentity', {})
+    return record.get('eventName') == 'REMOVE' \
+        and user_identity.get('type') == 'Service' \
+        and user_identity.get('principalId') == 'dynamodb.amazonaws.com'
+
+def restore_ebs_volume_ddb_record(table_item, retry_cleanup):
+    """
+    Put back an EBS volume record that was expired by TTL but not cleaned up.
+    Args:
+        table_item (dict): The expired EBS volume record from the stream.
+        retry_cleanup (bool): If True the record expires again tomorrow to retry cleanup,
+            otherwise it is restored without the cleanup attributes.
+    """
+    restored_item = {name: value for name, value in table_item.items() \
+        if name not in ('CleanupStatus', 'ExpirationTime')}
+    if retry_cleanup:
+        retry_time = datetime.now(timezone.utc) + timedelta(days=1)
+        restored_item['CleanupStatus'] = {'S': CLEANUP_STATUS_PENDING}
+        restored_item['ExpirationTime'] = {'N': str(int(retry_time.timestamp()))}
 
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb')
+        dynamodb_client.put_item(TableName=EBS_VOLUME_DDB_TABLE, Item=restored_item)
 
-        # Add to table
-        dynamodb_client.update_item(
-            Key={
-                'ResourceId': {
-                    'S': deleted_volume['VolumeId']['S'],
-                }
-            },
-            UpdateExpression="SET ResourceType= :resourceType, \
-                AccountId = :accountId, \
-                DeletionDate = :date, \
-                ExceptionFlag = :exception, \
-                AccountName = :accountName, \
-                ResourceRegion = :region, \
-                ResourceState = :state, \
-                VolumeType = :volumeType, \
-                VolumeSize = :volumeSize, \
-                VolumeIops = :volumeIops, \
-                VolumeThroughput = :volumeThroughput, \
-                MonthlyCost = :monthlyCost",
-            ConditionExpression="attribute_not_exists(VolumeId)",
-            ExpressionAttributeValues={
-                ':resourceType': {'S': 'EBS Volume'},
-                ':accountId': {'S': deleted_volume['AccountId']['S']},
-                ':date': {'S': today_date},
-                ':exception': {'S': deleted_volume['ExceptionFlag']['S']},
-                ':accountName': {'S': deleted_volume['AccountName']['S']},
-                ':region': {'S': deleted_volume['ResourceRegion']['S']},
-                ':state': {'S': deleted_volume['ResourceState']['S']},
-                ':volumeType': {'S': deleted_volume['VolumeType']['S']},
-                ':volumeSize': {'N': str(deleted_volume['VolumeSize']['N'])},
-                ':volumeIops': {'N': str(deleted_volume['VolumeIops']['N'])},
-                ':volumeThroughput': {'N': str(deleted_volume['VolumeThroughput']['N'])},
-                ':monthlyCost': {'N': str(deleted_volume['MonthlyCost']['N'])}
-            },
-            TableName=CLEANUP_SAVINGS_TABLE,
-        )
+    except ClientError as e:
+        error_message = f"Error in {EBS_VOLUME_DDB_TABLE} DynamoDB item restore ({table_item['VolumeId']['S']}): {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
 
+def cleanup_expired_ebs_volumes(records):
+    """
+    Deletes EBS volumes whose inventory records were expired by DynamoDB TTL.
+    Records arrive from the table stream in micro-batches. The item is already
+    gone from the inventory table, so only the volume and savings record remain.
+    Args:
+        records (list): DynamoDB stream records from the event source mapping.
+    """
+    candidates = []
+    for record in records:
+        if not is_ttl_expiry_record(record):
+            continue
+
+        table_item = record['dynamodb']['OldImage']
+        if table_item['ExceptionFlag']['S'] != 'False':
+            print('Exception set after expiry was scheduled, restoring:', table_item['VolumeId']['S'])
+            restore_ebs_volume_ddb_record(table_item, retry_cleanup=False)
+            continue
+        candidates.append(table_item)
+
+    revalidated_groups, unchecked_items = revalidate_ebs_volume_candidates(candidates)
+    for table_item in unchecked_items:
+        restore_ebs_volume_ddb_record(table_item, retry_cleanup=True)
+
+    dynamodb_client = boto3.Session().client('dynamodb')
+    for ec2_client, detached_items in revalidated_groups:
+        for table_item in detached_items:
+            print('Remove (TTL expired): ', table_item['VolumeId']['S'], "in", table_item['AccountName']['S'], "with deletion date:", table_item['DeletionDate']['S'])
+            if delete_ebs_volume(ec2_client, table_item['VolumeId']['S']):
+                # The inventory record is already gone, so the removal has nothing to delete
+                write_volume_bookkeeping(dynamodb_client, table_item)
+            else:
+                restore_ebs_volume_ddb_record(table_item, retry_cleanup=True)
+
+def get_cost_saving_update(deleted_volume):
+    """
+    Builds the update that writes a cost-saving record for the deleted EBS volume.
+    Args:
+        deleted_volume (dict): The deleted EBS volume record.
+    Returns:
+        dict: update_item parameters, also usable as a TransactWriteItems Update.
+    """
+    today_date = datetime.now().strftime('%Y-%m-%d')
+
+    return {
+        'Key': {
+            'ResourceId': {
+                'S': deleted_volume['VolumeId']['S'],
+            }
+        },
+        'UpdateExpression': "SET ResourceType= :resourceType, \
+            AccountId = :accountId, \
+            DeletionDate = :date, \
+            ExceptionFlag = :exception, \
+            AccountName = :accountName, \
+            ResourceRegion = :region, \
+            ResourceState = :state, \
+            VolumeType = :volumeType, \
+            VolumeSize = :volumeSize, \
+            VolumeIops = :volumeIops, \
+            VolumeThroughput = :volumeThroughput, \
+            MonthlyCost = :monthlyCost, \
+            SavedAt = if_not_exists(SavedAt, :savedAt)",
+        'ConditionExpression': "attribute_not_exists(ResourceId)",
+        'ExpressionAttributeValues': {
+            ':resourceType': {'S': 'EBS Volume'},
+            ':accountId': {'S': deleted_volume['AccountId']['S']},
+            ':date': {'S': today_date},
+            ':exception': {'S': deleted_volume['ExceptionFlag']['S']},
+            ':accountName': {'S': deleted_volume['AccountName']['S']},
+            ':region': {'S': deleted_volume['ResourceRegion']['S']},
+            ':state': {'S': deleted_volume['ResourceState']['S']},
+            ':volumeType': {'S': deleted_volume['VolumeType']['S']},
+            ':volumeSize': {'N': str(deleted_volume['VolumeSize']['N'])},
+            ':volumeIops': {'N': str(deleted_volume['VolumeIops']['N'])},
+            ':volumeThroughput': {'N': str(deleted_volume['VolumeThroughput']['N'])},
+            ':monthlyCost': {'N': str(deleted_volume['MonthlyCost']['N'])},
+            ':savedAt': {'N': f"{time.time():.3f}"}
+        },
+        'TableName': CLEANUP_SAVINGS_TABLE,
+    }
+
+def get_cleanup_transact_items(deleted_volume):
+    """
+    Builds the transaction that records a deleted EBS volume's savings and removes its inventory record.
+    Args:
+        deleted_volume (dict): The deleted EBS volume record.
+    Returns:
+        list: TransactWriteItems entries for the volume.
+    """
+    return [
+        {'Update': get_cost_saving_update(deleted_volume)},
+        {'Delete': {'TableName': EBS_VOLUME_DDB_TABLE, 'Key': {'VolumeId': deleted_volume['VolumeId']}}}
+    ]
+
+def write_volume_bookkeeping(dynamodb_client, deleted_volume):
+    """
+    Records savings and removes the inventory record for one deleted EBS volume.
+    If the savings record already exists, such as after an earlier run that could
+    not remove the inventory record, only the removal is written.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        deleted_volume (dict): The deleted EBS volume record.
+    """
+    try:
+        dynamodb_client.transact_write_items(TransactItems=get_cleanup_transact_items(deleted_volume))
     except ClientError as e:
-        error_message = f"Error in DynamoDB update_item ({deleted_volume['VolumeId']}): {str(e)}"
-        print('ResourceId:', deleted_volume['VolumeId']['S'], ', AccountId:', \
-            deleted_volume['AccountId']['S'], ', DeletionDate:', \
-            deleted_volume['DeletionDate']['S'], ', ExceptionFlag:', \
-            deleted_volume['ExceptionFlag']['S'], ', AccountName:',  \
-            deleted_volume['AccountName']['S'], ', ResourceRegion:', \
-            deleted_volume['ResourceRegion']['S'], ', ResourceState:',  \
-            deleted_volume['ResourceState']['S'], ', VolumeType:', \
-            deleted_volume['VolumeType']['S'], ', VolumeSize:', \
-            str(deleted_volume['VolumeSize']['N']), ', VolumeIops:', \
-            str(deleted_volume['VolumeIops']['N']), ', MonthlyCost:', \
-            str(deleted_volume['MonthlyCost']['N']))
+        cancellation_reasons = e.response.get('CancellationReasons', [])
+        if cancellation_reasons and cancellation_reasons[0].get('Code') == 'ConditionalCheckFailed':
+            print("Savings already recorded, removing inventory record:", deleted_volume['VolumeId']['S'])
+            try:
+                dynamodb_client.delete_item(TableName=EBS_VOLUME_DDB_TABLE, Key={'VolumeId': deleted_volume['VolumeId']})
+                return
+            except ClientError as delete_error:
+                e = delete_error
+        error_message = f"Error in DynamoDB savings and removal transaction ({deleted_volume['VolumeId']['S']}): {str(e)}"
         print(error_message)
         error_log.append(error_message)
 
+def write_cleanup_bookkeeping(dynamodb_client, deleted_volumes):
+    """
+    Records savings and removes inventory records for deleted EBS volumes.
+    Each volume's savings record and inventory removal are written in the same
+    transaction, with up to 50 volumes per TransactWriteItems request. If a
+    transaction is cancelled, its volumes are retried one transaction each so a
+    single bad record does not hold back the others.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        deleted_volumes (list): EBS volume records of the deleted volumes.
+    """
+    for start in range(0, len(deleted_volumes), MAX_TRANSACTION_RESOURCES):
+        volume_chunk = deleted_volumes[start:start + MAX_TRANSACTION_RESOURCES]
+        try:
+            dynamodb_client.transact_write_items(
+                TransactItems=[transact_item for deleted_volume in volume_chunk for transact_item in get_cleanup_transact_items(deleted_volume)]
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                error_message = f"Error in DynamoDB savings and removal transaction ({len(volume_chunk)} volumes): {str(e)}"
+                print(error_message)
+                error_log.append(error_message)
+                continue
+
+            for deleted_volume in volume_chunk:
+                write_volume_bookkeeping(dynamodb_client, deleted_volume)
+
 def publish_sns_topic(subject_message, sns_input):
     """Publish a message to an SNS topic.
 
@@ -220,6 +623,9 @@ def publish_sns_topic(subject_message, sns_input):
 def lambda_handler(event, context):
     """
     Lambda function to clean up old EBS volumes.
+    Runs on a schedule, or on TTL expiry records from the inventory table stream.
+    With more than one cleanup segment, the scheduled run coordinates one worker
+    invocation per segment and the workers return their results to it.
     Args:
         event (_type_): _description_
         context (_type_): _description_
@@ -227,7 +633,19 @@ def lambda_handler(event, context):
         _type_: _description_
     """
     print("Event: ", event, "Context: ", context)
-    delete_old_ebs_volumes()
+    # Warm containers keep module state, so start each run with an empty log
+    error_log.clear()
+
+    if 'Segment' in event:
+        deleted_count = delete_old_ebs_volumes(event['Segment'], event['TotalSegments'], context.aws_request_id, event.get('Deadline'))
+        return {'Segment': event['Segment'], 'Deleted': deleted_count, 'Errors': list(error_log)}
+
+    if 'Records' in event:
+        cleanup_expired_ebs_volumes(event['Records'])
+    elif CLEANUP_TOTAL_SEGMENTS > 1:
+        run_cleanup_coordinator(context)
+    else:
+        delete_old_ebs_volumes()
 
     if error_log:
         message = ""
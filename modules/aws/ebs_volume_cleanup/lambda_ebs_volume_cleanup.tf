@@ -16,12 +16,13 @@ resource "aws_lambda_function" "ebs_volume_cleanup_lambda_function" {
   description = "Lambda function to scan, document, and clean up detached ebs volumes."
   environment {
     variables = {
-      ENV                   = var.env,
-      SNS_ARN               = var.sns_topic_arn,
-      CROSS_ACCOUNT_ROLE    = var.cross_account_cleanup_role_name,
-      ACCOUNT_TABLE         = var.account_table_name,
-      EBS_VOLUME_TABLE      = var.ebs_volume_table_name,
-      CLEANUP_SAVINGS_TABLE = var.cleanup_savings_table_name,
+      ENV                    = var.env,
+      SNS_ARN                = var.sns_topic_arn,
+      CROSS_ACCOUNT_ROLE     = var.cross_account_cleanup_role_name,
+      ACCOUNT_TABLE          = var.account_table_name,
+      EBS_VOLUME_TABLE       = var.ebs_volume_table_name,
+      CLEANUP_SAVINGS_TABLE  = var.cleanup_savings_table_name,
+      CLEANUP_TOTAL_SEGMENTS = tostring(var.cleanup_total_segments)
     }
   }
 
@@ -54,4 +55,29 @@ resource "aws_lambda_function_event_invoke_config" "ebs_volume_cleanup_lambda_fa
       destination = var.sns_topic_arn
     }
   }
-}
\ No newline at end of file
+}
+
+# Invoke cleanup in micro-batches as records expire from the inventory table
+resource "aws_lambda_event_source_mapping" "ebs_volume_cleanup_ttl_expiry_stream" {
+  count = var.event_driven_cleanup ? 1 : 0
+
+  event_source_arn                   = var.ebs_volume_table_stream_arn
+  function_name                      = aws_lambda_function.ebs_volume_cleanup_lambda_function.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 25
+  maximum_batching_window_in_seconds = 60
+  bisect_batch_on_function_error     = true
+  maximum_retry_attempts             = 2
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["REMOVE"]
+        userIdentity = {
+          type        = ["Service"]
+          principalId = ["dynamodb.amazonaws.com"]
+        }
+      })
+    }
+  }
+}
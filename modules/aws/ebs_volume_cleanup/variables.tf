@@ -19,6 +19,12 @@ variable "cleanup_savings_table_name" {
   default     = "resource-cleanup-savings"
 }
 
+variable "cleanup_total_segments" {
+  description = "Number of index segments to fan cleanup out over, each handled by its own invocation (1 runs cleanup in a single invocation)"
+  type        = number
+  default     = 1
+}
+
 variable "cross_account_cleanup_role_name" {
   description = "Name of the IAM role to assume in target accounts"
   type        = string
@@ -40,6 +46,12 @@ variable "env" {
   default     = "dev"
 }
 
+variable "event_driven_cleanup" {
+  description = "Clean up resources from TTL expiry records on the inventory table stream instead of only on the schedule"
+  type        = bool
+  default     = false
+}
+
 variable "short_region" {
   description = "Short region code (e.g., usw2 for us-west-2)"
   type        = string
@@ -55,3 +67,9 @@ variable "sns_topic_arn" {
   description = "ARN of the SNS topic for notifications of errors and updates"
   type        = string
 }
+
+variable "ebs_volume_table_stream_arn" {
+  description = "Stream ARN of the DynamoDB table to store EBS volume information, required for event driven cleanup"
+  type        = string
+  default     = ""
+}
@@ -9,5 +9,40 @@ resource "aws_dynamodb_table" "detached_ebs_volumes_inventory_table" {
     type = "S"
   }
 
+  attribute {
+    name = "CleanupStatus"
+    type = "S"
+  }
+
+  attribute {
+    name = "DeletionDate"
+    type = "S"
+  }
+
+  # Sparse index: only non-excepted items carry CleanupStatus, so cleanup
+  # queries read just the items that are due instead of scanning the table.
+  global_secondary_index {
+    name            = "CleanupStatus-DeletionDate-index"
+    hash_key        = "CleanupStatus"
+    range_key       = "DeletionDate"
+    projection_type = "ALL"
+  }
+
+  # Event driven cleanup: TTL expires due records and the stream hands them to cleanup
+  stream_enabled   = var.event_driven_cleanup
+  stream_view_type = var.event_driven_cleanup ? "OLD_IMAGE" : null
+
+  dynamic "ttl" {
+    for_each = var.event_driven_cleanup ? [1] : []
+    content {
+      attribute_name = "ExpirationTime"
+      enabled        = true
+    }
+  }
+
+  point_in_time_recovery {
+    enabled = var.point_in_time_recovery
+  }
+
   tags = var.tags
 }
@@ -49,10 +49,12 @@ resource "aws_iam_policy" "detached_ebs_volume_inventory_policy" {
           "dynamodb:PutItem",
           "dynamodb:DeleteItem"
         ]
-        Resource = [
+        Resource = compact([
           var.account_table_arn,
-          aws_dynamodb_table.detached_ebs_volumes_inventory_table.arn
-        ]
+          "${var.account_table_arn}/index/ActiveRoster-index",
+          aws_dynamodb_table.detached_ebs_volumes_inventory_table.arn,
+          var.cost_timeseries_table_arn
+        ])
       },
       {
         Sid    = "TagPermissions"
@@ -97,3 +99,23 @@ resource "aws_iam_role_policy_attachment" "detached_ebs_volume_inventory_read_po
   role       = aws_iam_role.detached_ebs_volume_inventory_role.name
   policy_arn = "arn:aws:iam::aws:policy/ReadOnlyAccess"
 }
+
+# Read access to the account roster, only when the account pull publishes one
+resource "aws_iam_role_policy" "detached_ebs_volume_inventory_account_roster_policy" {
+  count = var.account_roster_bucket_arn == "" ? 0 : 1
+  name  = "detached-ebs-volume-inventory-account-roster-policy"
+  role  = aws_iam_role.detached_ebs_volume_inventory_role.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid    = "AccountRosterRead"
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject"
+        ]
+        Resource = ["${var.account_roster_bucket_arn}/account_roster/*"]
+      }
+    ]
+  })
+}
@@ -2,7 +2,9 @@
 Lambda Function Creates and Inventory of detached EBS Volumes
 """
 import os
-from datetime import datetime, timedelta
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
 import boto3
 from botocore.exceptions import ClientError
 import botocore
@@ -14,7 +16,16 @@ CORE_ACCOUNTS = []
 
 ACCOUNT_DDB_TABLE = os.environ['ACCOUNT_TABLE']  # 'aws-accounts'
 ACCOUNT_DDB_TABLE_INDEX = 'AccountName-index'
+ACTIVE_ROSTER_INDEX = 'ActiveRoster-index' # Sparse index of the active accounts
 EBS_VOLUME_DDB_TABLE = os.environ['EBS_VOLUME_TABLE'] # 'detached-ebs-volumes'
+CLEANUP_STATUS_PENDING = 'PENDING' # Sparse key for the CleanupStatus-DeletionDate-index
+CLEANUP_ATTRIBUTES = ['CleanupStatus', 'ExpirationTime']
+EVENT_DRIVEN_CLEANUP = os.environ.get('EVENT_DRIVEN_CLEANUP', 'false') == 'true'
+COST_TIMESERIES_TABLE = os.environ.get('COST_TIMESERIES_TABLE', '') # Optional daily cost trend table
+ACCOUNT_ROSTER_BUCKET = os.environ.get('ACCOUNT_ROSTER_BUCKET', '') # Optional roster published by the account pull
+ACCOUNT_ROSTER_KEY = 'account_roster/active_accounts.json.gz'
+ACCOUNT_ROSTER_CACHE = '/tmp/account_roster.json.gz'
+ACCOUNT_ROSTER_ETAG_CACHE = '/tmp/account_roster.etag'
 
 SNSTOPICARN=os.environ['SNS_ARN']
 
@@ -145,19 +156,82 @@ EBS_PRICING = {
 
 error_log = []
 
+def load_account_roster():
+    """
+    Load the roster of active accounts published by the account pull.
+    The roster is cached in /tmp across warm starts and only downloaded again
+    when its ETag has changed.
+    Returns:
+        list: Active accounts in DynamoDB-JSON format, with AccountId, AccountName,
+        Environment and AccountStatus.
+    """
+    request = {'Bucket': ACCOUNT_ROSTER_BUCKET, 'Key': ACCOUNT_ROSTER_KEY}
+    if os.path.exists(ACCOUNT_ROSTER_CACHE) and os.path.exists(ACCOUNT_ROSTER_ETAG_CACHE):
+        with open(ACCOUNT_ROSTER_ETAG_CACHE, encoding='utf-8') as etag_file:
+            request['IfNoneMatch'] = etag_file.read()
+
+    try:
+        response = boto3.client('s3').get_object(**request)
+        roster_data = response['Body'].read()
+        with open(ACCOUNT_ROSTER_CACHE, 'wb') as roster_file:
+            roster_file.write(roster_data)
+        with open(ACCOUNT_ROSTER_ETAG_CACHE, 'w', encoding='utf-8') as etag_file:
+            etag_file.write(response['ETag'])
+
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('304', 'NotModified') or 'IfNoneMatch' not in request:
+            raise
+        with open(ACCOUNT_ROSTER_CACHE, 'rb') as roster_file:
+            roster_data = roster_file.read()
+        print("Account roster unchanged, using cached copy")
+
+    roster = json.loads(gzip.decompress(roster_data))
+    return [{attribute: {'S': value} for attribute, value in account.items()} for account in roster['Accounts']]
+
+def query_active_accounts(dynamodb_client):
+    """
+    Get the active accounts from the sparse ActiveRoster index of the account table.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+    Returns:
+        list: Active accounts with AccountId, AccountName, Environment and AccountStatus.
+    """
+    active_accounts = []
+    paginator = dynamodb_client.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=ACCOUNT_DDB_TABLE,
+        IndexName=ACTIVE_ROSTER_INDEX,
+        KeyConditionExpression='ActiveRoster = :active',
+        ExpressionAttributeValues={':active': {'S': 'ACTIVE'}}
+    ):
+        active_accounts.extend(page['Items'])
+    return active_accounts
+
 def get_active_accounts():
-    """Retrieve active accounts from the DynamoDB table.
+    """Retrieve active accounts from the account roster, or from the DynamoDB table without one.
 
     Returns:
         list: A list of active account items from the DynamoDB table.
     """
+    if ACCOUNT_ROSTER_BUCKET:
+        try:
+            return load_account_roster()
+        except (ClientError, OSError, ValueError) as e:
+            print(f"Account roster not loaded, querying {ACCOUNT_DDB_TABLE} instead: {str(e)}")
+
     try:
         dynamodb_client = boto3.client('dynamodb')
+        active_accounts = query_active_accounts(dynamodb_client)
+        if active_accounts:
+            return active_accounts
+
+        # The index is empty until the account pull has set ActiveRoster on the accounts
+        print(f"No accounts in {ACTIVE_ROSTER_INDEX}, scanning {ACCOUNT_DDB_TABLE}")
         scan_response = dynamodb_client.scan(TableName=ACCOUNT_DDB_TABLE)
         return scan_response['Items']
 
     except ClientError as e:
-        error_message = f"Error in {ACCOUNT_DDB_TABLE} DynamoDB scan and processing: {str(e)}"
+        error_message = f"Error in {ACCOUNT_DDB_TABLE} DynamoDB query and processing: {str(e)}"
         print(error_message)
         error_log.append(error_message)
 
@@ -352,6 +426,9 @@ def create_ebs_volume_ddb_record(detached_volume):
     Args:
         detached_volume (dict): The detached volume information.
     """
+    cleanup_attributes = get_cleanup_attributes(detached_volume['Date'], detached_volume['Exception'])
+    cleanup_expression = "".join(f", {name} = :{name}" for name in cleanup_attributes)
+
     try:
         primary_session = boto3.Session()
         dynamodb_client = primary_session.client('dynamodb')
@@ -368,7 +445,7 @@ def create_ebs_volume_ddb_record(detached_volume):
                 ResourceRegion = :region, ResourceState = :state, \
                 VolumeType = :volumeType, VolumeSize = :volumeSize, \
                 VolumeIops = :volumeIops, VolumeThroughput = :volumeThroughput, \
-                MonthlyCost = :monthlyCost",
+                MonthlyCost = :monthlyCost" + cleanup_expression,
             ConditionExpression="attribute_not_exists(VolumeId)",
             ExpressionAttributeValues={
                 ':accountId': {'S': detached_volume['AccountId']},
@@ -381,7 +458,8 @@ def create_ebs_volume_ddb_record(detached_volume):
                 ':volumeSize': {'N': str(detached_volume['VolumeSize'])},
                 ':volumeIops': {'N': str(detached_volume['VolumeIops'])},
                 ':volumeThroughput': {'N': str(detached_volume['VolumeThroughput'])},
-                ':monthlyCost': {'N': detached_volume.get('MonthlyCost', '0.00')}
+                ':monthlyCost': {'N': detached_volume.get('MonthlyCost', '0.00')},
+                **{f":{name}": value for name, value in cleanup_attributes.items()}
             },
             TableName=EBS_VOLUME_DDB_TABLE,
         )
@@ -426,6 +504,74 @@ def update_ebs_volume_ddb_record(detached_volume):
         print(error_message)
         error_log.append(error_message)
 
+def get_cleanup_attributes(deletion_date, exception_flag):
+    """
+    Build the attributes that make a record visible to the cleanup function.
+    CleanupStatus keys the sparse deletion date index. With event driven cleanup
+    enabled, ExpirationTime lets DynamoDB TTL expire the record the day after its
+    deletion date. Records with an exception carry neither attribute.
+    Args:
+        deletion_date (str): The deletion date in 'YYYY-MM-DD' format.
+        exception_flag (str): The ExceptionFlag value of the record.
+    Returns:
+        dict: Attribute names mapped to DynamoDB attribute values.
+    """
+    if exception_flag != 'False':
+        return {}
+
+    cleanup_attributes = {'CleanupStatus': {'S': CLEANUP_STATUS_PENDING}}
+    if EVENT_DRIVEN_CLEANUP:
+        expiration_date = datetime.strptime(deletion_date, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+        cleanup_attributes['ExpirationTime'] = {'N': str(int(expiration_date.timestamp()))}
+
+    return cleanup_attributes
+
+def sync_cleanup_status(table_item):
+    """
+    Keep the CleanupStatus and ExpirationTime attributes in line with the ExceptionFlag.
+    Only volumes without an exception carry them, so only they are returned by the
+    deletion date index or expired by TTL for the cleanup function.
+    Args:
+        table_item (dict): The EBS volume record from DynamoDB.
+    """
+    cleanup_attributes = get_cleanup_attributes(table_item['DeletionDate']['S'], table_item['ExceptionFlag']['S'])
+    set_attributes = {name: value for name, value in cleanup_attributes.items() if table_item.get(name) != value}
+    # A retry scheduled by the cleanup function expires later than the DeletionDate, so keep it
+    if 'ExpirationTime' in set_attributes and 'ExpirationTime' in table_item \
+        and int(table_item['ExpirationTime']['N']) > int(set_attributes['ExpirationTime']['N']):
+        del set_attributes['ExpirationTime']
+    remove_attributes = [name for name in CLEANUP_ATTRIBUTES if name in table_item and name not in cleanup_attributes]
+    if not set_attributes and not remove_attributes:
+        return
+
+    update_expression = ""
+    if set_attributes:
+        update_expression += "SET " + ", ".join(f"{name} = :{name}" for name in set_attributes)
+    if remove_attributes:
+        update_expression += " REMOVE " + ", ".join(remove_attributes)
+
+    update_kwargs = {
+        'Key': {
+            'VolumeId': {
+                'S': table_item['VolumeId']['S'],
+            }
+        },
+        'UpdateExpression': update_expression.strip(),
+        'TableName': EBS_VOLUME_DDB_TABLE,
+    }
+    if set_attributes:
+        update_kwargs['ExpressionAttributeValues'] = {f":{name}": value for name, value in set_attributes.items()}
+
+    try:
+        primary_session = boto3.Session()
+        dynamodb_client = primary_session.client('dynamodb')
+        dynamodb_client.update_item(**update_kwargs)
+
+    except ClientError as e:
+        error_message = f"Error in DynamoDB cleanup attribute update_item ({table_item['VolumeId']['S']}): {str(e)}"
+        print(error_message)
+        error_log.append(error_message)
+
 def update_ddb_records(detached_volumes):
     """
     Update DynamoDB records for detached EBS volumes.
@@ -449,6 +595,9 @@ def update_ddb_records(detached_volumes):
                 print('updating:', table_item['VolumeId']['S'])
                 update_ebs_volume_ddb_record(detached_volume_entry)
 
+            # Backfill or clear the cleanup index key if the ExceptionFlag changed
+            sync_cleanup_status(table_item)
+
             # Check if EBS volume has deletion tag and if it is accurate
             deletion_tag_value = check_ebs_volume_for_deletion_tag(detached_volume_entry)
             if deletion_tag_value is None or deletion_tag_value != table_item['DeletionDate']['S']:
@@ -666,6 +815,65 @@ def calculate_monthly_cost(volumes):
 
     return total_cost
 
+def get_cost_aggregates(detached_volumes):
+    """
+    Total the detached volumes by account and region.
+    Args:
+        detached_volumes (list): Detached volumes with their MonthlyCost calculated.
+    Returns:
+        dict: [count, size in GB, monthly cost] keyed by (account id, region).
+    """
+    aggregates = {}
+    for volume in detached_volumes:
+        totals = aggregates.setdefault((volume['AccountId'], volume['Region']), [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += volume['VolumeSize']
+        totals[2] += float(volume.get('MonthlyCost', 0))
+    return aggregates
+
+def write_cost_timeseries(resource_type, aggregates):
+    """
+    Write today's totals into the monthly cost time-series items.
+    Each series gets one item per month with a DD attribute per day, so a year of
+    trend data is twelve reads per series regardless of fleet size. Reruns on the
+    same day overwrite that day.
+    Args:
+        resource_type (str): The resource type of the series.
+        aggregates (dict): [count, size, cost] keyed by (account id, region).
+    """
+    if COST_TIMESERIES_TABLE == '':
+        return
+
+    today = datetime.now(timezone.utc)
+    fleet_totals = [0, 0, 0.0]
+    series = {}
+    for (account_id, region), totals in aggregates.items():
+        series[f"{resource_type}#{account_id}#{region}"] = totals
+        fleet_totals = [fleet_total + total for fleet_total, total in zip(fleet_totals, totals)]
+    series[f"{resource_type}#ALL"] = fleet_totals
+
+    dynamodb_client = boto3.Session().client('dynamodb')
+    for series_key, totals in series.items():
+        try:
+            dynamodb_client.update_item(
+                TableName=COST_TIMESERIES_TABLE,
+                Key={
+                    'SeriesKey': {'S': series_key},
+                    'Period': {'S': today.strftime('%Y-%m')}
+                },
+                UpdateExpression="SET #day = :totals, LastUpdated = :lastUpdated",
+                ExpressionAttributeNames={'#day': f"D{today.strftime('%d')}"},
+                ExpressionAttributeValues={
+                    ':totals': {'L': [{'N': str(totals[0])}, {'N': str(totals[1])}, {'N': f"{totals[2]:.2f}"}]},
+                    ':lastUpdated': {'S': today.strftime('%Y-%m-%dT%H:%M:%SZ')}
+                }
+            )
+
+        except ClientError as e:
+            error_message = f"Error in {COST_TIMESERIES_TABLE} cost time-series update ({series_key}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+
 def publish_sns_topic(subject_message, sns_input):
     """
     Publish a message to an SNS topic.
@@ -709,6 +917,7 @@ def lambda_handler(event, context):
     total_monthly_cost = calculate_monthly_cost(detached_volumes)
     print(f"Total Monthly Cost for Unattached EBS Volumes: ${total_monthly_cost:.2f}")
     update_ddb_records(detached_volumes)
+    write_cost_timeseries('EBS Volume', get_cost_aggregates(detached_volumes))
 
     if error_log:
         message = ""
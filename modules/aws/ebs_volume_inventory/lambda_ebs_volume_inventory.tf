@@ -16,12 +16,15 @@ resource "aws_lambda_function" "ebs_volume_inventory_lambda_function" {
   description = "Lambda function to scan, document, and clean up detached ebs volumes."
   environment {
     variables = {
-      ENV                = var.env,
-      SNS_ARN            = var.sns_topic_arn,
-      ACTIVE_REGIONS     = var.active_regions,
-      CROSS_ACCOUNT_ROLE = var.cross_account_inventory_role_name,
-      ACCOUNT_TABLE      = var.account_table_name,
-      EBS_VOLUME_TABLE   = aws_dynamodb_table.detached_ebs_volumes_inventory_table.id,
+      ENV                   = var.env,
+      SNS_ARN               = var.sns_topic_arn,
+      ACTIVE_REGIONS        = var.active_regions,
+      CROSS_ACCOUNT_ROLE    = var.cross_account_inventory_role_name,
+      ACCOUNT_TABLE         = var.account_table_name,
+      ACCOUNT_ROSTER_BUCKET = var.account_roster_bucket_name,
+      EBS_VOLUME_TABLE      = aws_dynamodb_table.detached_ebs_volumes_inventory_table.id,
+      EVENT_DRIVEN_CLEANUP  = tostring(var.event_driven_cleanup),
+      COST_TIMESERIES_TABLE = var.cost_timeseries_table_name,
     }
   }
 
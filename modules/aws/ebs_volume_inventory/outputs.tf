@@ -7,3 +7,8 @@ output "detached_ebs_volume_inventory_table_arn" {
   value       = aws_dynamodb_table.detached_ebs_volumes_inventory_table.arn
   description = "ARN of the DynamoDB table for detached EBS volume inventory"
 }
+
+output "detached_ebs_volume_inventory_table_stream_arn" {
+  value       = aws_dynamodb_table.detached_ebs_volumes_inventory_table.stream_arn
+  description = "Stream ARN of the DynamoDB table for detached EBS volume inventory (empty unless event driven cleanup is enabled)"
+}
@@ -20,3 +20,31 @@ resource "aws_lambda_permission" "allow_eventbridge_to_call_cost_savings_total_l
   source_arn    = aws_cloudwatch_event_rule.cost_savings_total_lambda_every_morning.arn
 }
 
+
+resource "aws_cloudwatch_event_rule" "savings_report_table_exports" {
+  count = var.report_source == "export" ? 1 : 0
+
+  name                = "savings-report-table-exports-rule"
+  description         = "Starts the table exports an hour before the cost savings reports read them"
+  schedule_expression = "cron(0 9 * * ? *)"
+  state               = var.env != "prod" ? "DISABLED" : "ENABLED"
+}
+
+resource "aws_cloudwatch_event_target" "trigger_savings_report_table_exports_on_schedule" {
+  count = var.report_source == "export" ? 1 : 0
+
+  rule      = aws_cloudwatch_event_rule.savings_report_table_exports[0].name
+  target_id = "lambda"
+  arn       = aws_lambda_function.savings_totals_lambda_function.arn
+  input     = jsonencode({ StartExports = true })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_to_start_savings_report_table_exports" {
+  count = var.report_source == "export" ? 1 : 0
+
+  statement_id  = "AllowTableExportsFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.savings_totals_lambda_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.savings_report_table_exports[0].arn
+}
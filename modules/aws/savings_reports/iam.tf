@@ -51,11 +51,36 @@ resource "aws_iam_policy" "savings_totals_calculation_policy" {
           "dynamodb:PutItem"
         ]
         Resource = [
+          var.account_table_arn,
           var.ebs_snapshot_table_arn,
           var.ebs_volume_table_arn,
           var.resource_savings_table_arn
         ]
       },
+      {
+        Sid    = "TableExportPermissions"
+        Effect = "Allow"
+        Action = [
+          "dynamodb:ExportTableToPointInTime",
+          "dynamodb:DescribeExport"
+        ]
+        Resource = [
+          var.ebs_snapshot_table_arn,
+          var.ebs_volume_table_arn,
+          var.resource_savings_table_arn,
+          "${var.ebs_snapshot_table_arn}/export/*",
+          "${var.ebs_volume_table_arn}/export/*",
+          "${var.resource_savings_table_arn}/export/*"
+        ]
+      },
+      {
+        Sid    = "ListTableExports"
+        Effect = "Allow"
+        Action = [
+          "dynamodb:ListExports"
+        ]
+        Resource = ["*"]
+      },
       {
         Sid    = "S3Access"
         Effect = "Allow",
@@ -64,12 +89,23 @@ resource "aws_iam_policy" "savings_totals_calculation_policy" {
           "s3:PutObjectAcl",
           "s3:GetObject",
           "s3:GetObjectAcl",
-          "s3:DeleteObject"
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload"
         ],
         Resource = [
           "${var.s3_storage_bucket_arn}/*"
         ]
       },
+      {
+        Sid    = "S3ListReports"
+        Effect = "Allow",
+        Action = [
+          "s3:ListBucket"
+        ],
+        Resource = [
+          var.s3_storage_bucket_arn
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
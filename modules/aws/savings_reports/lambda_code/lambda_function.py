@@ -1,24 +1,152 @@
 """
 Lambda function to calculate cost savings from resource cleanup.
+Reports are streamed from DynamoDB scan pages through a CSV encoder straight into
+S3, so memory stays flat regardless of table size.
 """
 import os
+import io
 import csv
 import json
 import math
+import gzip
+import hashlib
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from datetime import datetime
+from datetime import timezone
 import boto3
 from botocore.exceptions import ClientError
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+    from pyarrow import fs as pyarrow_fs
+except ImportError: # Provided by the optional parquet layer
+    pyarrow = None
+
+ACCOUNT_TABLE = os.environ.get('ACCOUNT_TABLE', '')
+ALLOCATION_FIELDNAMES = ['CostCenter', 'CostDepartment', 'AccountOwner']
+
 EBS_VOLUME_TABLE = os.environ['EBS_VOLUME_TABLE']
 EBS_FILE_NAME = 'projected_ebs_cost_savings.csv'
+EBS_FIELDNAMES = ['VolumeId','ResourceType', 'ResourceState',\
+    'AccountId', 'AccountName', 'ResourceRegion', 'ExceptionFlag', \
+    'VolumeType', 'VolumeIops', 'VolumeSize', 'VolumeThroughput', \
+    'DeletionDate', 'MonthlyCost'] + ALLOCATION_FIELDNAMES
 
 EBS_SNAPSHOT_TABLE = os.environ['EBS_SNAPSHOT_TABLE']
 SNAPSHOT_FILE_NAME = 'projected_snapshot_cost_savings.csv'
+SNAPSHOT_FIELDNAMES = ['ResourceId', 'ResourceType', 'ResourceState', \
+    'AccountId', 'AccountName', 'ResourceRegion', 'ExceptionFlag', \
+    'VolumeSize', 'StorageTier', 'ConnectedResource', 'DeletionDate', \
+    'MonthlyCost'] + ALLOCATION_FIELDNAMES
 
-SAVINGS_DDB_TABLE = 'resource-cleanup-savings'
-S3_STORAGE_BUCKET = 'platformeng-enterprise-uswe2-prod-524024217541'
+SAVINGS_DDB_TABLE = os.environ['CLEANUP_SAVINGS_TABLE']
+S3_STORAGE_BUCKET = os.environ['S3_BUCKET']
 FILE_NAME = 'cost_savings.csv'
+SAVINGS_FIELDNAMES = ['ResourceId','ResourceType', 'ResourceState','AccountId', \
+    'AccountName', 'ResourceRegion', 'ExceptionFlag', 'VolumeType', \
+    'VolumeIops', 'VolumeSize', 'VolumeThroughput', 'StorageTier', \
+    'DeletionDate', 'MonthsSinceDeletion', 'MonthlyCost'] + ALLOCATION_FIELDNAMES
+
+SUMMARY_PREFIX = 'summaries'
+SUMMARY_DIMENSIONS = {
+    'account': ['AccountId', 'AccountName'],
+    'cost_center': ['CostCenter', 'CostDepartment'],
+    'region': ['ResourceRegion'],
+    'resource_type': ['ResourceType'],
+    'volume_type': ['VolumeType'],
+    'storage_tier': ['StorageTier'],
+    'month': ['DeletionMonth']
+}
+REPORT_SUMMARIES = {
+    FILE_NAME: ['account', 'cost_center', 'region', 'resource_type', 'volume_type', 'month'],
+    EBS_FILE_NAME: ['account', 'cost_center', 'region', 'volume_type', 'month'],
+    SNAPSHOT_FILE_NAME: ['account', 'cost_center', 'region', 'storage_tier', 'month']
+}
+SUMMARY_TOTAL_FIELDNAMES = ['ResourceCount', 'VolumeSize', 'MonthlyCost']
+
+REPORT_GZIP = os.environ.get('REPORT_GZIP', 'false') == 'true'
+MANIFEST_KEY = 'manifest.json'
+VERSIONS_PREFIX = 'versions' # Content addressed copies of each report
+REPORT_SPOOL_DIR = '/tmp' # Reports are spooled here while hashed, then uploaded only if changed
+ROW_HASH_MODULUS = 2 ** 256
+REPORT_SCAN_SEGMENTS = int(os.environ.get('REPORT_SCAN_SEGMENTS', '1'))
+SCAN_QUEUE_PAGES = 2 # Scan pages buffered per segment before the segment waits for the writer
+
+REPORT_SOURCE = os.environ.get('REPORT_SOURCE', 'scan') # scan, export or local
+EXPORT_PREFIX = 'ddb_exports'
+EXPORT_MAX_AGE_HOURS = int(os.environ.get('REPORT_EXPORT_MAX_AGE_HOURS', '24'))
+EXPORT_POLL_SECONDS = 30
+EXPORT_WAIT_MARGIN_SECONDS = 600 # Left for writing the reports after waiting on an export
+EXPORT_READ_WORKERS = 8 # Export data files decoded in parallel
+EXPORT_PAGE_ITEMS = 1000 # Decoded items handed over at a time
+LOCAL_EXPORT_DIR = os.environ.get('REPORT_LOCAL_EXPORT_DIR', '/tmp/ddb_exports')
+CSV_CHUNK_SIZE = 256 * 1024 # Encoded bytes handed down the pipeline at a time
+MULTIPART_PART_SIZE = 8 * 1024 * 1024 # S3 requires at least 5 MiB for every part but the last
+
+PARQUET_EXPORT = os.environ.get('PARQUET_EXPORT', 'false') == 'true'
+PARQUET_PARTITION_BY = os.environ.get('PARQUET_PARTITION_BY', 'month') # month or account
+PARQUET_PREFIX = 'parquet'
+PARQUET_BATCH_ROWS = 5000 # Rows buffered per partition before a row group is written
+PARQUET_COLUMNS = {
+    'cost_savings': [('ResourceId', 'string'), ('ResourceType', 'string'), \
+        ('ResourceState', 'string'), ('AccountId', 'string'), ('AccountName', 'string'), \
+        ('ResourceRegion', 'string'), ('ExceptionFlag', 'string'), ('VolumeType', 'string'), \
+        ('VolumeIops', 'int64'), ('VolumeSize', 'int64'), ('VolumeThroughput', 'int64'), \
+        ('StorageTier', 'string'), ('DeletionDate', 'date'), ('MonthlyCost', 'float64')],
+    'ebs_volumes': [('VolumeId', 'string'), ('ResourceState', 'string'), \
+        ('AccountId', 'string'), ('AccountName', 'string'), ('ResourceRegion', 'string'), \
+        ('ExceptionFlag', 'string'), ('VolumeType', 'string'), ('VolumeIops', 'int64'), \
+        ('VolumeSize', 'int64'), ('VolumeThroughput', 'int64'), ('DeletionDate', 'date'), \
+        ('MonthlyCost', 'float64')],
+    'ebs_snapshots': [('ResourceId', 'string'), ('ResourceState', 'string'), \
+        ('AccountId', 'string'), ('AccountName', 'string'), ('ResourceRegion', 'string'), \
+        ('ExceptionFlag', 'string'), ('VolumeSize', 'int64'), ('StorageTier', 'string'), \
+        ('ConnectedResource', 'string'), ('DeletionDate', 'date'), ('MonthlyCost', 'float64')]
+}
+
+SQL_REPORTS = os.environ.get('SQL_REPORTS', 'false') == 'true'
+SQL_DATABASE_PATH = '/tmp/savings_reports.db'
+SQL_REPORT_PREFIX = 'sql_reports'
+SQL_BATCH_ROWS = 5000 # Rows buffered per table before an insert
+SQL_COLUMN_TYPES = {'string': 'TEXT', 'int64': 'INTEGER', 'float64': 'REAL', 'date': 'TEXT'}
+SQL_INDEXES = [
+    'CREATE INDEX cost_savings_account ON cost_savings (AccountId)',
+    'CREATE INDEX cost_savings_deletion_date ON cost_savings (DeletionDate)',
+    'CREATE INDEX ebs_volumes_account ON ebs_volumes (AccountId)',
+    'CREATE INDEX ebs_snapshots_account ON ebs_snapshots (AccountId)'
+]
+export_sources = {} # Export to read each table from this run, filled by the handler
+
+# Reports over the loaded tables, the accounts table holds the cost allocation fields
+SQL_REPORT_QUERIES = {
+    'realized_savings_by_cost_center_month': ('csv', """
+        SELECT COALESCE(accounts.CostCenter, '') AS CostCenter, substr(DeletionDate, 1, 7) AS Month,
+            COUNT(*) AS ResourceCount, SUM(VolumeSize) AS VolumeSize, ROUND(SUM(MonthlyCost), 2) AS MonthlyCost
+        FROM cost_savings LEFT JOIN accounts USING (AccountId)
+        GROUP BY 1, 2 ORDER BY 2, 1"""),
+    'projected_savings_by_account': ('json', """
+        SELECT AccountId, AccountName, ResourceType, COUNT(*) AS ResourceCount,
+            SUM(VolumeSize) AS VolumeSize, ROUND(SUM(MonthlyCost), 2) AS MonthlyCost
+        FROM (SELECT AccountId, AccountName, 'EBS Volume' AS ResourceType, VolumeSize, MonthlyCost FROM ebs_volumes
+            UNION ALL
+            SELECT AccountId, AccountName, 'EBS Snapshot', VolumeSize, MonthlyCost FROM ebs_snapshots)
+        GROUP BY 1, 2, 3 ORDER BY MonthlyCost DESC"""),
+    'projected_savings_due_by_week': ('csv', """
+        SELECT date(DeletionDate, 'weekday 0', '-6 days') AS WeekStarting, COUNT(*) AS ResourceCount,
+            ROUND(SUM(MonthlyCost), 2) AS MonthlyCost
+        FROM (SELECT DeletionDate, MonthlyCost FROM ebs_volumes
+            UNION ALL
+            SELECT DeletionDate, MonthlyCost FROM ebs_snapshots)
+        GROUP BY 1 ORDER BY 1""")
+}
 
 def months_diff(start, end):
     """
@@ -31,176 +159,1178 @@ def months_diff(start, end):
     """
     return math.floor((end - start).days / 30)
 
-def total_ebs_volumes():
+def read_pages_in_parallel(read_pages, sources, workers):
     """
-    Calculate total EBS volume costs from DynamoDB.
+    Read pages of items from several sources in parallel worker threads.
+    Pages are handed over through a bounded queue, so a slow writer holds the
+    workers back instead of pages piling up in memory. Items from different
+    sources interleave.
+    Args:
+        read_pages (function): Yields lists of items from one source.
+        sources (list): The sources, such as scan segments or export data files.
+        workers (int): Number of worker threads.
+    Yields:
+        dict: Each item.
     """
-    s3_client = boto3.client('s3')
-    csv_data = []
+    workers = max(1, min(workers, len(sources)))
+    source_queue = queue.Queue()
+    for source in sources:
+        source_queue.put(source)
+    page_queue = queue.Queue(maxsize=workers * SCAN_QUEUE_PAGES)
+    stop_reading = threading.Event()
+
+    def put_page(page):
+        while not stop_reading.is_set():
+            try:
+                page_queue.put(page, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def read_sources():
+        try:
+            while not stop_reading.is_set():
+                try:
+                    source = source_queue.get_nowait()
+                except queue.Empty:
+                    break
+                for page in read_pages(source):
+                    if stop_reading.is_set():
+                        return
+                    put_page(page)
+            put_page(None)
+        except Exception as e: # Handed to the reader to raise
+            put_page(e)
+
+    threads = [threading.Thread(target=read_sources, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
 
     try:
-        dynamodb_client = boto3.client('dynamodb', region_name = 'us-west-2')
-        ebs_volumes_response = dynamodb_client.scan(TableName=EBS_VOLUME_TABLE)
-        items = ebs_volumes_response['Items']
+        finished_workers = 0
+        while finished_workers < workers:
+            items = page_queue.get()
+            if items is None:
+                finished_workers += 1
+            elif isinstance(items, Exception):
+                raise items
+            else:
+                yield from items
+    finally:
+        stop_reading.set()
+        for thread in threads:
+            thread.join()
 
-        for item in items:
-            csv_item = [{'VolumeId': item['VolumeId']['S'], \
-                'ResourceState': item['ResourceState']['S'], \
-                'AccountId': item['AccountId']['S'], \
-                'AccountName': item['AccountName']['S'], \
-                'ResourceRegion': item['ResourceRegion']['S'], \
-                'ExceptionFlag': item['ExceptionFlag']['S'], \
-                'VolumeType': item['VolumeType']['S'], \
-                'VolumeIops': item['VolumeIops']['N'], \
-                'VolumeSize': item['VolumeSize']['N'], \
-                'VolumeThroughput': item['VolumeThroughput']['N'], \
-                'DeletionDate': item['DeletionDate']['S'], \
-                'MonthlyCost': item['MonthlyCost']['N']}]
-            csv_data.extend(csv_item)
+def scan_table_items(table_name, total_segments=REPORT_SCAN_SEGMENTS):
+    """
+    Read every item of a DynamoDB table, from its export if one was prepared for
+    this run or else with a scan, one page at a time.
+    With more than one segment the table is scanned in parallel segments.
+    Args:
+        table_name (str): The name of the DynamoDB table to scan.
+        total_segments (int): Number of parallel scan segments.
+    Yields:
+        dict: Each item in the table.
+    """
+    export_source = export_sources.get(table_name)
+    if export_source is not None:
+        yield from read_export_items(export_source)
+        return
 
-    except ClientError as e:
-        error_message = f"Error in DynamoDB scan: {str(e)}"
-        print(error_message)
+    dynamodb_client = boto3.session.Session().client('dynamodb', region_name = 'us-west-2')
+    paginator = dynamodb_client.get_paginator('scan')
 
-    with open(f'/tmp/{EBS_FILE_NAME}', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['VolumeId','ResourceType', 'ResourceState',\
-            'AccountId', 'AccountName', 'ResourceRegion', 'ExceptionFlag', \
-            'VolumeType', 'VolumeIops', 'VolumeSize', 'VolumeThroughput', \
-            'DeletionDate', 'MonthlyCost']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
+    if total_segments <= 1:
+        for page in paginator.paginate(TableName=table_name):
+            yield from page['Items']
+        return
 
-    s3_client.upload_file(f'/tmp/{EBS_FILE_NAME}', S3_STORAGE_BUCKET, EBS_FILE_NAME)
+    def scan_segment(segment):
+        for page in paginator.paginate(TableName=table_name, Segment=segment, TotalSegments=total_segments):
+            yield page['Items']
 
-def total_ebs_snapshots():
+    yield from read_pages_in_parallel(scan_segment, list(range(total_segments)), total_segments)
+
+def open_export_file(export_source, key):
     """
-    Calculate total EBS snapshot costs from DynamoDB.
+    Open a file of a DynamoDB export.
+    Args:
+        export_source (dict): The export's Bucket, or the Directory of a local stand-in.
+        key (str): Key of the file, relative to the directory for a local stand-in.
+    Returns:
+        file: A binary file object.
     """
-    s3_client = boto3.client('s3')
-    csv_data = []
+    if 'Directory' in export_source:
+        return open(os.path.join(export_source['Directory'], key), 'rb')
+    s3_client = boto3.session.Session().client('s3')
+    return s3_client.get_object(Bucket=export_source['Bucket'], Key=key)['Body']
 
-    try:
-        dynamodb_client = boto3.client('dynamodb', region_name = 'us-west-2')
-        ebs_snapshot_response = dynamodb_client.scan(TableName=EBS_SNAPSHOT_TABLE)
-        items = ebs_snapshot_response['Items']
+def read_export_data_file(export_source, data_file_key):
+    """
+    Decode a gzipped DynamoDB JSON export data file one line at a time.
+    Args:
+        export_source (dict): The export's Bucket, or the Directory of a local stand-in.
+        data_file_key (str): Key of the data file.
+    Yields:
+        list: Up to EXPORT_PAGE_ITEMS items in DynamoDB-JSON format.
+    """
+    page = []
+    with open_export_file(export_source, data_file_key) as raw_file, gzip.GzipFile(fileobj=raw_file) as lines:
+        for line in lines:
+            page.append(json.loads(line)['Item'])
+            if len(page) >= EXPORT_PAGE_ITEMS:
+                yield page
+                page = []
+    if page:
+        yield page
 
-        for item in items:
-            csv_item = [{'ResourceId': item['ResourceId']['S'], \
-                'ResourceType': 'EBS Snapshot', \
-                'ResourceState': item['ResourceState']['S'], \
-                'AccountId': item['AccountId']['S'], \
-                'AccountName': item['AccountName']['S'], \
-                'ResourceRegion': item['ResourceRegion']['S'], \
-                'ExceptionFlag': item['ExceptionFlag']['S'], \
-                'VolumeSize': item['VolumeSize']['N'], \
-                'StorageTier': item['StorageTier']['S'], \
-                'ConnectedResource': item['ConnectedResource']['S'], \
-                'DeletionDate': item['DeletionDate']['S'], \
-                'MonthlyCost': item['MonthlyCost']['N']}]
-            csv_data.extend(csv_item)
+def read_export_items(export_source):
+    """
+    Read every item of a DynamoDB export, decoding its data files in parallel.
+    Args:
+        export_source (dict): The export's Bucket and ManifestFilesKey, or the
+            Directory of a local stand-in holding manifest-files.json.
+    Yields:
+        dict: Each item in DynamoDB-JSON format.
+    """
+    with open_export_file(export_source, export_source.get('ManifestFilesKey', 'manifest-files.json')) as manifest_file:
+        data_file_keys = [json.loads(line)['dataFileS3Key'] for line in manifest_file.read().decode('utf-8').splitlines() if line.strip()]
+
+    def read_data_file(data_file_key):
+        yield from read_export_data_file(export_source, data_file_key)
+
+    yield from read_pages_in_parallel(read_data_file, data_file_keys, EXPORT_READ_WORKERS)
+
+def get_export_request_time(export_arn):
+    """
+    Get when an export was requested from its ARN.
+    Export IDs start with the request time in epoch milliseconds, such as
+    table/<name>/export/01695353076000-06e2188f.
+    Args:
+        export_arn (str): ARN of the export.
+    Returns:
+        int: Epoch milliseconds the export was requested at.
+    """
+    return int(export_arn.rsplit('/', 1)[-1].split('-', 1)[0])
+
+def get_latest_export(dynamodb_client, table_arn):
+    """
+    Get the most recent export of a table.
+    The newest export is picked from the list by its ARN, so only that one is
+    described however many exports the table has had.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        table_arn (str): ARN of the table.
+    Returns:
+        dict: The export description, or None if the table has no exports.
+    """
+    response = dynamodb_client.list_exports(TableArn=table_arn)
+    export_summaries = response['ExportSummaries']
+
+    # Loop list_exports until every export of the table is listed
+    while 'NextToken' in response:
+        response = dynamodb_client.list_exports(TableArn=table_arn, NextToken=response['NextToken'])
+        export_summaries.extend(response['ExportSummaries'])
+
+    export_arns = [export_summary['ExportArn'] for export_summary in export_summaries \
+        if export_summary['ExportStatus'] != 'FAILED']
+    if not export_arns:
+        return None
+
+    latest_export_arn = max(export_arns, key=get_export_request_time)
+    return dynamodb_client.describe_export(ExportArn=latest_export_arn)['ExportDescription']
+
+def get_export_time(export):
+    """
+    Get the point in time an export holds the table as of.
+    Args:
+        export (dict): The export description.
+    Returns:
+        datetime: The export time, or its start time if that is not set yet.
+    """
+    return export.get('ExportTime') or export['StartTime']
+
+def is_fresh_export(export):
+    """
+    Check whether an export is recent enough to report from.
+    Args:
+        export (dict): The export description, or None.
+    Returns:
+        bool: True if the export is from the last EXPORT_MAX_AGE_HOURS.
+    """
+    if export is None:
+        return False
+    export_age = datetime.now(timezone.utc) - get_export_time(export)
+    return export_age.total_seconds() < EXPORT_MAX_AGE_HOURS * 3600
+
+def start_table_exports(dynamodb_client, table_names):
+    """
+    Start an export of each table that has no recent or running export.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        table_names (list): The tables to export.
+    Returns:
+        dict: The latest export description keyed by table name.
+    """
+    exports = {}
+    for table_name in table_names:
+        table_arn = dynamodb_client.describe_table(TableName=table_name)['Table']['TableArn']
+        export = get_latest_export(dynamodb_client, table_arn)
+        if not is_fresh_export(export):
+            print(f"Starting an export of {table_name}")
+            export = dynamodb_client.export_table_to_point_in_time(
+                TableArn=table_arn,
+                S3Bucket=S3_STORAGE_BUCKET,
+                S3Prefix=f'{EXPORT_PREFIX}/{table_name}',
+                ExportFormat='DYNAMODB_JSON'
+            )['ExportDescription']
+        exports[table_name] = export
+    return exports
+
+def prepare_export_sources(table_names, deadline):
+    """
+    Find a completed export of each table to report from, waiting on running
+    exports until the deadline.
+    Tables without a completed export by then are scanned as before.
+    Args:
+        table_names (list): The tables the reports read.
+        deadline (float): Epoch seconds to stop waiting at.
+    Returns:
+        dict: The export source keyed by table name, for tables with a completed export.
+    """
+    if REPORT_SOURCE == 'local':
+        return {table_name: {'Directory': os.path.join(LOCAL_EXPORT_DIR, table_name)} for table_name in table_names}
+
+    dynamodb_client = boto3.client('dynamodb', region_name = 'us-west-2')
+    sources = {}
+    try:
+        exports = start_table_exports(dynamodb_client, table_names)
+        while True:
+            for table_name, export in exports.items():
+                if export['ExportStatus'] == 'IN_PROGRESS':
+                    exports[table_name] = export = dynamodb_client.describe_export(ExportArn=export['ExportArn'])['ExportDescription']
+                if export['ExportStatus'] == 'COMPLETED' and table_name not in sources:
+                    sources[table_name] = {
+                        'Bucket': export['S3Bucket'],
+                        'ManifestFilesKey': f"{export['ExportManifest'].rsplit('/', 1)[0]}/manifest-files.json"
+                    }
+            if all(export['ExportStatus'] != 'IN_PROGRESS' for export in exports.values()) \
+                or time.time() + EXPORT_POLL_SECONDS > deadline:
+                break
+            time.sleep(EXPORT_POLL_SECONDS)
 
     except ClientError as e:
-        error_message = f"Error in DynamoDB scan: {str(e)}"
+        error_message = f"Error preparing table exports: {str(e)}"
         print(error_message)
 
-    with open(f'/tmp/{SNAPSHOT_FILE_NAME}', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['ResourceId', 'ResourceType', 'ResourceState', \
-            'AccountId', 'AccountName', 'ResourceRegion', 'ExceptionFlag', \
-            'VolumeSize', 'StorageTier', 'ConnectedResource', 'DeletionDate', \
-            'MonthlyCost']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
+    for table_name in table_names:
+        if table_name not in sources:
+            print(f"No completed export of {table_name}, scanning it instead")
+    return sources
 
-    s3_client.upload_file(f'/tmp/{SNAPSHOT_FILE_NAME}', S3_STORAGE_BUCKET, SNAPSHOT_FILE_NAME)
+def count_bytes(chunks, counts):
+    """
+    Count bytes as they pass through.
+    Args:
+        chunks (iterable): Bytes to count.
+        counts (dict): Counter updated in place under 'Bytes'.
+    Yields:
+        bytes: Each chunk, unchanged.
+    """
+    for chunk in chunks:
+        counts['Bytes'] += len(chunk)
+        yield chunk
 
-def total_resource_savings():
+def count_items(items, counts):
     """
-    Calculate total resource savings from DynamoDB.
+    Count items as they pass through to the report.
+    Args:
+        items (iterable): The DynamoDB records.
+        counts (dict): Counter updated in place under 'Rows'.
+    Yields:
+        dict: Each record, unchanged.
     """
-    s3_client = boto3.client('s3')
-    csv_data = []
+    for item in items:
+        counts['Rows'] += 1
+        yield item
+
+def load_account_index():
+    """
+    Load the cost allocation fields of every account from the account table.
+    Returns:
+        dict: The allocation fields keyed by AccountId.
+    """
+    account_index = {}
+    if ACCOUNT_TABLE == '':
+        return account_index
 
     try:
-        dynamodb_client = boto3.client('dynamodb', region_name = 'us-west-2')
-        response = dynamodb_client.scan(TableName=SAVINGS_DDB_TABLE)
-        total_cost_savings = 0
-
-        for item in response['Items']:
-            total_cost_savings += float(item['MonthlyCost']['N'])
-            storage_tier = ""
-            volume_iops = 0
-            volume_throughput = 0
-            volume_type = ""
-            months = months_diff(datetime.strptime(item['DeletionDate']['S'], \
-                "%Y-%m-%d").date(), date.today())
-
-            if item.get('StorageTier', '') != '':
-                storage_tier = item['StorageTier']['S']
-            if item.get('VolumeIops', '') != '':
-                volume_iops = item['VolumeIops']['N']
-            if item.get('VolumeThroughput', '') != '':
-                volume_throughput = item['VolumeThroughput']['N']
-            if item.get('VolumeType', '') != '':
-                volume_type = item['VolumeType']['S']
-
-            csv_item = [{'ResourceId': item['ResourceId']['S'], \
-                'ResourceType': item['ResourceType']['S'], \
-                'ResourceState': item['ResourceState']['S'], \
-                'AccountId': item['AccountId']['S'], \
-                'AccountName': item['AccountName']['S'], \
-                'ResourceRegion': item['ResourceRegion']['S'], \
-                'ExceptionFlag': item['ExceptionFlag']['S'], \
-                'VolumeType': volume_type, \
-                'VolumeIops': volume_iops, \
-                'VolumeSize': item['VolumeSize']['N'], \
-                'VolumeThroughput': volume_throughput, \
-                'StorageTier': storage_tier, \
-                'DeletionDate': item['DeletionDate']['S'], \
-                'MonthsSinceDeletion': months, \
-                'MonthlyCost': item['MonthlyCost']['N']}]
-            csv_data.extend(csv_item)
+        for item in scan_table_items(ACCOUNT_TABLE, 1):
+            account_index[item['AccountId']['S']] = {field: item.get(field, {}).get('S', '') \
+                for field in ALLOCATION_FIELDNAMES}
 
     except ClientError as e:
-        error_message = f"Error in DynamoDB scan: {str(e)}"
+        error_message = f"Error loading account allocation fields from {ACCOUNT_TABLE}: {str(e)}"
         print(error_message)
 
-    final_line_totals = [{'ResourceId': "" ,'ResourceType': "", \
+    return account_index
+
+def enrich_row(row, account_index):
+    """
+    Add the account's cost allocation fields to a report row.
+    Args:
+        row (dict): The CSV row, updated in place.
+        account_index (dict): Allocation fields keyed by AccountId, from load_account_index.
+    Returns:
+        dict: The CSV row.
+    """
+    allocation = account_index.get(row['AccountId'])
+    if allocation is None:
+        row.update(dict.fromkeys(ALLOCATION_FIELDNAMES, ''))
+    else:
+        row.update(allocation)
+    return row
+
+def get_ebs_volume_row(item):
+    """
+    Build the report row for an EBS volume record.
+    Args:
+        item (dict): EBS volume record from DynamoDB.
+    Returns:
+        dict: The CSV row.
+    """
+    return {'VolumeId': item['VolumeId']['S'], \
+        'ResourceState': item['ResourceState']['S'], \
+        'AccountId': item['AccountId']['S'], \
+        'AccountName': item['AccountName']['S'], \
+        'ResourceRegion': item['ResourceRegion']['S'], \
+        'ExceptionFlag': item['ExceptionFlag']['S'], \
+        'VolumeType': item['VolumeType']['S'], \
+        'VolumeIops': item['VolumeIops']['N'], \
+        'VolumeSize': item['VolumeSize']['N'], \
+        'VolumeThroughput': item['VolumeThroughput']['N'], \
+        'DeletionDate': item['DeletionDate']['S'], \
+        'MonthlyCost': item['MonthlyCost']['N']}
+
+def get_ebs_snapshot_row(item):
+    """
+    Build the report row for an EBS snapshot record.
+    Args:
+        item (dict): EBS snapshot record from DynamoDB.
+    Returns:
+        dict: The CSV row.
+    """
+    return {'ResourceId': item['ResourceId']['S'], \
+        'ResourceType': 'EBS Snapshot', \
+        'ResourceState': item['ResourceState']['S'], \
+        'AccountId': item['AccountId']['S'], \
+        'AccountName': item['AccountName']['S'], \
+        'ResourceRegion': item['ResourceRegion']['S'], \
+        'ExceptionFlag': item['ExceptionFlag']['S'], \
+        'VolumeSize': item['VolumeSize']['N'], \
+        'StorageTier': item['StorageTier']['S'], \
+        'ConnectedResource': item['ConnectedResource']['S'], \
+        'DeletionDate': item['DeletionDate']['S'], \
+        'MonthlyCost': item['MonthlyCost']['N']}
+
+def get_resource_savings_row(item):
+    """
+    Build the report row for a cleanup savings record.
+    Args:
+        item (dict): Cleanup savings record from DynamoDB.
+    Returns:
+        dict: The CSV row.
+    """
+    storage_tier = ""
+    volume_iops = 0
+    volume_throughput = 0
+    volume_type = ""
+    months = months_diff(datetime.strptime(item['DeletionDate']['S'], \
+        "%Y-%m-%d").date(), date.today())
+
+    if item.get('StorageTier', '') != '':
+        storage_tier = item['StorageTier']['S']
+    if item.get('VolumeIops', '') != '':
+        volume_iops = item['VolumeIops']['N']
+    if item.get('VolumeThroughput', '') != '':
+        volume_throughput = item['VolumeThroughput']['N']
+    if item.get('VolumeType', '') != '':
+        volume_type = item['VolumeType']['S']
+
+    return {'ResourceId': item['ResourceId']['S'], \
+        'ResourceType': item['ResourceType']['S'], \
+        'ResourceState': item['ResourceState']['S'], \
+        'AccountId': item['AccountId']['S'], \
+        'AccountName': item['AccountName']['S'], \
+        'ResourceRegion': item['ResourceRegion']['S'], \
+        'ExceptionFlag': item['ExceptionFlag']['S'], \
+        'VolumeType': volume_type, \
+        'VolumeIops': volume_iops, \
+        'VolumeSize': item['VolumeSize']['N'], \
+        'VolumeThroughput': volume_throughput, \
+        'StorageTier': storage_tier, \
+        'DeletionDate': item['DeletionDate']['S'], \
+        'MonthsSinceDeletion': months, \
+        'MonthlyCost': item['MonthlyCost']['N']}
+
+def get_resource_savings_rows(items, summaries=None, account_index=None):
+    """
+    Build the savings report rows, followed by a line with the total monthly savings.
+    Args:
+        items (iterable): Cleanup savings records from DynamoDB.
+        summaries (dict): Summary accumulators to add each row to, or None.
+        account_index (dict): Allocation fields keyed by AccountId to enrich each row with, or None.
+    Yields:
+        dict: Each CSV row.
+    """
+    total_cost_savings = 0
+
+    for item in items:
+        total_cost_savings += float(item['MonthlyCost']['N'])
+        row = get_resource_savings_row(item)
+        if account_index is not None:
+            enrich_row(row, account_index)
+        if summaries is not None:
+            add_summary_row(summaries, row)
+        yield row
+
+    yield {'ResourceId': "" ,'ResourceType': "", \
         'ResourceState': "", 'AccountId': "", 'AccountName': "", \
         'ResourceRegion': "", 'ExceptionFlag': "", 'VolumeType': "", \
         'VolumeIops': "", 'VolumeSize': "", 'VolumeThroughput': "", \
         'StorageTier': "", 'DeletionDate': "", 'MonthsSinceDeletion': '', \
-        'MonthlyCost': f'{total_cost_savings:.2f}'}]
-    csv_data.extend(final_line_totals)
+        'MonthlyCost': f'{total_cost_savings:.2f}'}
+
+def new_summaries(file_name):
+    """
+    Create the empty summary accumulators for a report.
+    Args:
+        file_name (str): Name of the detail report.
+    Returns:
+        dict: For each dimension, a dict of group key to [count, size, cost].
+    """
+    return {dimension: {} for dimension in REPORT_SUMMARIES[file_name]}
+
+def add_summary_row(summaries, row):
+    """
+    Add a report row to every summary it belongs to.
+    Args:
+        summaries (dict): Summary accumulators from new_summaries.
+        row (dict): The CSV row.
+    """
+    volume_size = float(row.get('VolumeSize') or 0)
+    monthly_cost = float(row['MonthlyCost'])
 
-    with open(f'/tmp/{FILE_NAME}', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['ResourceId','ResourceType', 'ResourceState','AccountId', \
-            'AccountName', 'ResourceRegion', 'ExceptionFlag', 'VolumeType', \
-            'VolumeIops', 'VolumeSize', 'VolumeThroughput', 'StorageTier', \
-            'DeletionDate', 'MonthsSinceDeletion', 'MonthlyCost']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(csv_data)
+    for dimension, groups in summaries.items():
+        group_key = tuple(row['DeletionDate'][:7] if column == 'DeletionMonth' else row.get(column, '') \
+            for column in SUMMARY_DIMENSIONS[dimension])
+        totals = groups.get(group_key)
+        if totals is None:
+            groups[group_key] = [1, volume_size, monthly_cost]
+        else:
+            totals[0] += 1
+            totals[1] += volume_size
+            totals[2] += monthly_cost
+
+def summarize_rows(rows, summaries):
+    """
+    Add rows to the summary accumulators as they pass through to the report.
+    Args:
+        rows (iterable): The CSV rows.
+        summaries (dict): Summary accumulators from new_summaries.
+    Yields:
+        dict: Each CSV row, unchanged.
+    """
+    for row in rows:
+        add_summary_row(summaries, row)
+        yield row
+
+def write_summaries(s3_client, file_name, summaries, manifest_reports=None):
+    """
+    Write a small CSV per summary dimension next to the detail report.
+    Args:
+        s3_client (boto3.client): S3 client.
+        file_name (str): Name of the detail report.
+        summaries (dict): Filled summary accumulators.
+        manifest_reports (dict): Manifest entries by report key, updated in place, or None.
+    """
+    report_name = file_name.rsplit('.', 1)[0]
+
+    for dimension, groups in summaries.items():
+        columns = SUMMARY_DIMENSIONS[dimension]
+        rows = [dict(zip(columns, group_key), ResourceCount=totals[0], \
+            VolumeSize=f'{totals[1]:.0f}', MonthlyCost=f'{totals[2]:.2f}') \
+            for group_key, totals in sorted(groups.items(), key=lambda group: (-group[1][2], group[0]))]
+        write_report(s3_client, f'{SUMMARY_PREFIX}/{report_name}_by_{dimension}.csv', \
+            columns + SUMMARY_TOTAL_FIELDNAMES, rows, manifest_reports)
+
+def encode_csv_chunks(fieldnames, rows):
+    """
+    Encode rows as CSV, handing back the output in chunks.
+    Args:
+        fieldnames (list): The CSV header columns.
+        rows (iterable): The CSV rows.
+    Yields:
+        bytes: UTF-8 encoded CSV of about CSV_CHUNK_SIZE bytes.
+    """
+    csv_buffer = io.StringIO()
+    writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
+    writer.writeheader()
+
+    for row in rows:
+        writer.writerow(row)
+        if csv_buffer.tell() >= CSV_CHUNK_SIZE:
+            yield csv_buffer.getvalue().encode('utf-8')
+            csv_buffer.seek(0)
+            csv_buffer.truncate()
+
+    yield csv_buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """
+    Compress a stream of chunks into a single gzip stream.
+    Args:
+        chunks (iterable): Uncompressed bytes.
+    Yields:
+        bytes: Gzip compressed bytes.
+    """
+    compressor = zlib.compressobj(wbits=31) # 31 writes the gzip header and trailer
+
+    for chunk in chunks:
+        compressed_chunk = compressor.compress(chunk)
+        if compressed_chunk:
+            yield compressed_chunk
+
+    yield compressor.flush()
+
+def hash_rows(rows, fieldnames, content_digest):
+    """
+    Hash rows as they pass through, into a digest that does not depend on their order.
+    Each row is hashed on its own and the row hashes are summed modulo 2**256, so the
+    digest stays the same however parallel scan segments or export files interleave.
+    Args:
+        rows (iterable): The CSV rows.
+        fieldnames (list): The CSV header columns.
+        content_digest (dict): 'Rows' and 'Sum' of the row hashes, updated in place.
+    Yields:
+        dict: Each CSV row, unchanged.
+    """
+    for row in rows:
+        row_text = '\x1f'.join(str(row.get(field, '')) for field in fieldnames)
+        row_hash = int.from_bytes(hashlib.sha256(row_text.encode('utf-8')).digest(), 'big')
+        content_digest['Sum'] = (content_digest['Sum'] + row_hash) % ROW_HASH_MODULUS
+        content_digest['Rows'] += 1
+        yield row
+
+def get_content_hash(fieldnames, content_digest):
+    """
+    Get the hash of a report's header and rows from its row digest.
+    Args:
+        fieldnames (list): The CSV header columns.
+        content_digest (dict): Filled digest from hash_rows.
+    Returns:
+        str: Hex SHA-256 of the header, row count and summed row hashes.
+    """
+    digest_text = f"{','.join(fieldnames)}\n{content_digest['Rows']}\n{content_digest['Sum']:064x}"
+    return hashlib.sha256(digest_text.encode('utf-8')).hexdigest()
+
+def read_spooled_chunks(spool_file):
+    """
+    Read a spooled report back from the start.
+    Args:
+        spool_file (file): Binary temporary file holding the report.
+    Yields:
+        bytes: Up to CSV_CHUNK_SIZE bytes at a time.
+    """
+    spool_file.seek(0)
+    while True:
+        chunk = spool_file.read(CSV_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+def upload_stream(s3_client, bucket, key, chunks, content_type):
+    """
+    Upload a stream of chunks to S3 without holding the whole object.
+    Chunks are buffered into parts of MULTIPART_PART_SIZE for a multipart upload.
+    Objects that fit in one part are sent with a single put_object instead. A failed
+    upload is aborted so the previous report stays in place and no parts are left behind.
+    Args:
+        s3_client (boto3.client): S3 client.
+        bucket (str): Name of the S3 bucket.
+        key (str): Key of the object to write.
+        chunks (iterable): Bytes to upload.
+        content_type (str): Content type of the object.
+    """
+    part_buffer = bytearray()
+    upload_id = None
+    parts = []
+
+    def upload_part():
+        part_number = len(parts) + 1
+        response = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, \
+            PartNumber=part_number, Body=bytes(part_buffer))
+        parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        part_buffer.clear()
+
+    try:
+        for chunk in chunks:
+            part_buffer.extend(chunk)
+            if len(part_buffer) >= MULTIPART_PART_SIZE:
+                if upload_id is None:
+                    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)['UploadId']
+                upload_part()
 
-    s3_client.upload_file(f'/tmp/{FILE_NAME}', S3_STORAGE_BUCKET, FILE_NAME)
+        if upload_id is None:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=bytes(part_buffer), ContentType=content_type)
+            return
+
+        if part_buffer:
+            upload_part()
+        s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, \
+            MultipartUpload={'Parts': parts})
+
+    except Exception:
+        if upload_id is not None:
+            s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+def get_versioned_key(report_key, content_hash):
+    """
+    Get the content addressed key of a report.
+    Args:
+        report_key (str): The report's fixed key, such as cost_savings.csv.gz.
+        content_hash (str): Hash of the report's rows, from get_content_hash.
+    Returns:
+        str: The key, such as versions/cost_savings.<hash>.csv.gz.
+    """
+    report_name, extension = report_key.split('.', 1)
+    return f"{VERSIONS_PREFIX}/{report_name}.{content_hash[:16]}.{extension}"
+
+def load_manifest(s3_client):
+    """
+    Load the manifest of published reports.
+    Args:
+        s3_client (boto3.client): S3 client.
+    Returns:
+        dict: The manifest, empty if none has been written yet.
+    """
+    try:
+        response = s3_client.get_object(Bucket=S3_STORAGE_BUCKET, Key=MANIFEST_KEY)
+        return json.loads(response['Body'].read())
+
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchKey':
+            raise
+    return {'Reports': {}}
+
+def write_manifest(s3_client, manifest):
+    """
+    Write the manifest of published reports.
+    Args:
+        s3_client (boto3.client): S3 client.
+        manifest (dict): The manifest.
+    """
+    manifest['GeneratedAt'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    s3_client.put_object(Bucket=S3_STORAGE_BUCKET, Key=MANIFEST_KEY, \
+        Body=json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'), ContentType='application/json')
+
+def write_report(s3_client, file_name, fieldnames, rows, manifest_reports=None):
+    """
+    Stream report rows into a CSV object in the report bucket, gzipped if REPORT_GZIP is set.
+    With a manifest the report is spooled to /tmp while its rows are hashed. If the hash
+    matches the manifest entry nothing is uploaded and only the entry's CheckedAt is
+    updated. Otherwise the spooled report is published under a content addressed key
+    and copied to its fixed key.
+    Args:
+        s3_client (boto3.client): S3 client.
+        file_name (str): Name of the CSV report.
+        fieldnames (list): The CSV header columns.
+        rows (iterable): The CSV rows.
+        manifest_reports (dict): Manifest entries by report key, updated in place, or None
+            to write straight to the fixed key.
+    """
+    content_digest = {'Rows': 0, 'Sum': 0}
+    counts = {'Bytes': 0}
+    chunks = count_bytes(encode_csv_chunks(fieldnames, hash_rows(rows, fieldnames, content_digest)), counts)
+    report_key, content_type = file_name, 'text/csv'
+
+    if REPORT_GZIP:
+        report_key, content_type = f'{file_name}.gz', 'application/gzip'
+        chunks = gzip_chunks(chunks)
+
+    if manifest_reports is None:
+        upload_stream(s3_client, S3_STORAGE_BUCKET, report_key, chunks, content_type)
+        return
+
+    previous_entry = manifest_reports.get(report_key, {})
+
+    with tempfile.TemporaryFile(dir=REPORT_SPOOL_DIR) as spool_file:
+        for chunk in chunks:
+            spool_file.write(chunk)
+
+        content_hash = get_content_hash(fieldnames, content_digest)
+        checked_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        if previous_entry.get('Sha256') == content_hash:
+            print(f"{report_key} unchanged, upload skipped")
+            manifest_reports[report_key] = dict(previous_entry, CheckedAt=checked_at)
+            return
+
+        versioned_key = get_versioned_key(report_key, content_hash)
+        upload_stream(s3_client, S3_STORAGE_BUCKET, versioned_key, read_spooled_chunks(spool_file), content_type)
+
+    # Keep the fixed key current for consumers that read it directly
+    s3_client.copy_object(Bucket=S3_STORAGE_BUCKET, Key=report_key, \
+        CopySource={'Bucket': S3_STORAGE_BUCKET, 'Key': versioned_key})
+    manifest_reports[report_key] = {
+        'Key': versioned_key,
+        'Sha256': content_hash,
+        'Bytes': counts['Bytes'],
+        'PublishedAt': checked_at,
+        'CheckedAt': checked_at
+    }
+
+def get_parquet_value(attribute, column_type):
+    """
+    Convert a DynamoDB attribute to a typed Parquet value.
+    Args:
+        attribute (dict): The DynamoDB attribute, or None if the item does not have it.
+        column_type (str): The Parquet column type from PARQUET_COLUMNS.
+    Returns:
+        The typed value, or None if it is missing or cannot be converted.
+    """
+    if attribute is None:
+        return None
+
+    value = next(iter(attribute.values()))
+    try:
+        if column_type == 'int64':
+            return int(float(value))
+        if column_type == 'float64':
+            return float(value)
+        if column_type == 'date':
+            return date.fromisoformat(value)
+    except ValueError:
+        return None
+    return value
+
+def get_parquet_partition(item, resource_type):
+    """
+    Get the Hive style partition path of a record.
+    Args:
+        item (dict): The DynamoDB record.
+        resource_type (str): The resource type of the record.
+    Returns:
+        str: The partition path, by resource type and then by month or account.
+    """
+    resource_type_value = resource_type.lower().replace(' ', '_')
+    if PARQUET_PARTITION_BY == 'account':
+        return f"resource_type={resource_type_value}/account_id={item['AccountId']['S']}"
+    return f"resource_type={resource_type_value}/month={item['DeletionDate']['S'][:7]}"
+
+def write_into_parquet(items, parquet_export, dataset_name, resource_type=None):
+    """
+    Write records to a partitioned Parquet dataset as they pass through to a report,
+    so the export needs no scan of its own.
+    Each partition gets one file, written a row group at a time so only
+    PARQUET_BATCH_ROWS rows per partition are held in memory. Once every record
+    has passed through, the keys written are recorded in the export. A Parquet
+    error stops the dataset but not the report the records are passing through to.
+    Args:
+        items (iterable): The DynamoDB records.
+        parquet_export (dict): The export from open_parquet_export, or None to skip writing.
+        dataset_name (str): Name of the dataset in PARQUET_COLUMNS.
+        resource_type (str): The resource type of every record, or None to read it from each record.
+    Yields:
+        dict: Each record, unchanged.
+    """
+    if parquet_export is None:
+        yield from items
+        return
+
+    columns = PARQUET_COLUMNS[dataset_name]
+    parquet_types = {'string': pyarrow.string(), 'int64': pyarrow.int64(), \
+        'float64': pyarrow.float64(), 'date': pyarrow.date32()}
+    schema = pyarrow.schema([(name, parquet_types[column_type]) for name, column_type in columns])
+    partitions = {}
+
+    def write_row_group(partition):
+        if partition['rows']:
+            partition['writer'].write_table(pyarrow.Table.from_pylist(partition['rows'], schema=schema))
+            partition['rows'] = []
+
+    def close_partitions():
+        for partition in partitions.values():
+            write_row_group(partition)
+            partition['writer'].close()
+            partition['stream'].close()
+
+    failed = False
+    try:
+        for item in items:
+            if not failed:
+                try:
+                    item_resource_type = resource_type or item['ResourceType']['S']
+                    key = f"{PARQUET_PREFIX}/{dataset_name}/{get_parquet_partition(item, item_resource_type)}/part-00000.parquet"
+
+                    partition = partitions.get(key)
+                    if partition is None:
+                        stream = parquet_export['filesystem'].open_output_stream(f"{S3_STORAGE_BUCKET}/{key}")
+                        partition = partitions[key] = {'stream': stream, 'writer': pyarrow.parquet.ParquetWriter(stream, schema), 'rows': []}
+
+                    partition['rows'].append({name: get_parquet_value(item.get(name), column_type) for name, column_type in columns})
+                    if len(partition['rows']) >= PARQUET_BATCH_ROWS:
+                        write_row_group(partition)
+
+                except OSError as e:
+                    print(f"Error in {dataset_name} Parquet export: {str(e)}")
+                    failed = True
+            yield item
+
+    finally:
+        try:
+            close_partitions()
+        except OSError as e:
+            print(f"Error in {dataset_name} Parquet export: {str(e)}")
+            failed = True
+
+    # Only a dataset that saw every record may have its other partitions removed
+    if not failed:
+        parquet_export['written_keys'][dataset_name] = set(partitions)
+
+def remove_stale_parquet_objects(s3_client, dataset_name, written_keys):
+    """
+    Remove partition files that were not rewritten, such as months with no records left.
+    Args:
+        s3_client (boto3.client): S3 client.
+        dataset_name (str): Name of the dataset.
+        written_keys (set): The object keys written in this run.
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    stale_keys = [s3_object['Key'] \
+        for page in paginator.paginate(Bucket=S3_STORAGE_BUCKET, Prefix=f"{PARQUET_PREFIX}/{dataset_name}/") \
+        for s3_object in page.get('Contents', []) if s3_object['Key'] not in written_keys]
+
+    for start in range(0, len(stale_keys), 1000):
+        s3_client.delete_objects(Bucket=S3_STORAGE_BUCKET, Delete={
+            'Objects': [{'Key': key} for key in stale_keys[start:start + 1000]],
+            'Quiet': True
+        })
+
+def open_parquet_export():
+    """
+    Set up the Parquet export of the savings, volume and snapshot tables.
+    Returns:
+        dict: The filesystem holding the report bucket and the keys written per dataset,
+            or None if pyarrow is not available.
+    """
+    if pyarrow is None:
+        print("PARQUET_EXPORT is enabled but pyarrow is not available, attach the parquet layer")
+        return None
+
+    return {
+        'filesystem': pyarrow_fs.S3FileSystem(region=pyarrow_fs.resolve_s3_region(S3_STORAGE_BUCKET)),
+        'written_keys': {}
+    }
+
+def finish_parquet_export(s3_client, parquet_export):
+    """
+    Remove the partition files that were not rewritten from each dataset that was fully written.
+    Args:
+        s3_client (boto3.client): S3 client.
+        parquet_export (dict): The export from open_parquet_export.
+    """
+    for dataset_name in PARQUET_COLUMNS:
+        if dataset_name not in parquet_export['written_keys']:
+            print(f"Keeping stale {dataset_name} Parquet partitions, the dataset was not fully written")
+            continue
+        try:
+            remove_stale_parquet_objects(s3_client, dataset_name, parquet_export['written_keys'][dataset_name])
+
+        except ClientError as e:
+            error_message = f"Error in {dataset_name} Parquet export: {str(e)}"
+            print(error_message)
+
+def open_report_database(account_index):
+    """
+    Create an empty SQLite database in /tmp for the SQL reports.
+    The savings, volume and snapshot tables use the typed PARQUET_COLUMNS schema,
+    and the accounts table holds the allocation fields from the account table.
+    Args:
+        account_index (dict): Allocation fields keyed by AccountId.
+    Returns:
+        dict: The connection and the lock that serializes the report threads' inserts.
+    """
+    if os.path.exists(SQL_DATABASE_PATH): # Left behind by a previous run in a warm container
+        os.remove(SQL_DATABASE_PATH)
+
+    connection = sqlite3.connect(SQL_DATABASE_PATH, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+
+    for dataset_name, columns in PARQUET_COLUMNS.items():
+        column_definitions = ', '.join(f'{name} {SQL_COLUMN_TYPES[column_type]}' for name, column_type in columns)
+        connection.execute(f'CREATE TABLE {dataset_name} ({column_definitions})')
+
+    connection.execute(f"CREATE TABLE accounts (AccountId TEXT PRIMARY KEY, {', '.join(f'{name} TEXT' for name in ALLOCATION_FIELDNAMES)})")
+    connection.executemany(f"INSERT INTO accounts VALUES (?, {', '.join('?' for _ in ALLOCATION_FIELDNAMES)})", \
+        [(account_id, *(allocation[name] for name in ALLOCATION_FIELDNAMES)) for account_id, allocation in account_index.items()])
+
+    return {'connection': connection, 'lock': threading.Lock()}
+
+def get_sql_value(attribute, column_type):
+    """
+    Convert a DynamoDB attribute to a SQLite value.
+    Args:
+        attribute (dict): The DynamoDB attribute, or None if the item does not have it.
+        column_type (str): The column type from PARQUET_COLUMNS.
+    Returns:
+        The value, with dates as ISO strings, or None if it is missing.
+    """
+    value = get_parquet_value(attribute, column_type)
+    return value.isoformat() if isinstance(value, date) else value
+
+def load_into_database(items, database, dataset_name):
+    """
+    Insert records into the report database as they pass through to a report,
+    so the SQL reports need no scan of their own.
+    Args:
+        items (iterable): The DynamoDB records.
+        database (dict): The report database from open_report_database, or None to skip loading.
+        dataset_name (str): Name of the table in PARQUET_COLUMNS.
+    Yields:
+        dict: Each record, unchanged.
+    """
+    if database is None:
+        yield from items
+        return
+
+    columns = PARQUET_COLUMNS[dataset_name]
+    insert_statement = f"INSERT INTO {dataset_name} VALUES ({', '.join('?' for _ in columns)})"
+    batch = []
+
+    def insert_batch():
+        with database['lock']:
+            database['connection'].executemany(insert_statement, batch)
+        batch.clear()
+
+    for item in items:
+        batch.append(tuple(get_sql_value(item.get(name), column_type) for name, column_type in columns))
+        if len(batch) >= SQL_BATCH_ROWS:
+            insert_batch()
+        yield item
+
+    if batch:
+        insert_batch()
+
+def run_sql_reports(s3_client, database, manifest_reports):
+    """
+    Index the loaded tables and write every SQL_REPORT_QUERIES report.
+    CSV reports are published like the other reports, JSON reports are written as
+    a list of row objects.
+    Args:
+        s3_client (boto3.client): S3 client.
+        database (dict): The loaded report database.
+        manifest_reports (dict): Manifest entries by report key, updated in place.
+    """
+    connection = database['connection']
+    connection.commit()
+    for index_statement in SQL_INDEXES:
+        connection.execute(index_statement)
+    connection.execute('ANALYZE')
+
+    for report_name, (report_format, query) in SQL_REPORT_QUERIES.items():
+        try:
+            cursor = connection.execute(query)
+            fieldnames = [column[0] for column in cursor.description]
+            rows = (dict(zip(fieldnames, row)) for row in cursor)
+
+            if report_format == 'json':
+                s3_client.put_object(Bucket=S3_STORAGE_BUCKET, Key=f'{SQL_REPORT_PREFIX}/{report_name}.json', \
+                    Body=json.dumps(list(rows)).encode('utf-8'), ContentType='application/json')
+            else:
+                write_report(s3_client, f'{SQL_REPORT_PREFIX}/{report_name}.csv', fieldnames, rows, manifest_reports)
+
+        except (ClientError, sqlite3.Error) as e:
+            error_message = f"Error in {report_name} SQL report: {str(e)}"
+            print(error_message)
+
+def total_ebs_volumes(manifest_reports=None, account_index=None, database=None, parquet_export=None):
+    """
+    Calculate total EBS volume costs from DynamoDB.
+    Args:
+        manifest_reports (dict): Manifest entries by report key, updated in place, or None.
+        account_index (dict): Allocation fields keyed by AccountId, or None for an empty index.
+        database (dict): Report database to load the records into, or None.
+        parquet_export (dict): Parquet export to write the records into, or None.
+    Returns:
+        int: Number of volumes reported, or None if the report failed.
+    """
+    s3_client = boto3.session.Session().client('s3')
+    counts = {'Rows': 0}
+    summaries = new_summaries(EBS_FILE_NAME)
+    account_index = account_index or {}
+
+    try:
+        items = load_into_database(count_items(scan_table_items(EBS_VOLUME_TABLE), counts), database, 'ebs_volumes')
+        items = write_into_parquet(items, parquet_export, 'ebs_volumes', 'EBS Volume')
+        rows = summarize_rows((enrich_row(get_ebs_volume_row(item), account_index) for item in items), summaries)
+        write_report(s3_client, EBS_FILE_NAME, EBS_FIELDNAMES, rows, manifest_reports)
+        write_summaries(s3_client, EBS_FILE_NAME, summaries, manifest_reports)
+
+    except ClientError as e:
+        error_message = f"Error in EBS volume report: {str(e)}"
+        print(error_message)
+        return None
+
+    return counts['Rows']
+
+def total_ebs_snapshots(manifest_reports=None, account_index=None, database=None, parquet_export=None):
+    """
+    Calculate total EBS snapshot costs from DynamoDB.
+    Args:
+        manifest_reports (dict): Manifest entries by report key, updated in place, or None.
+        account_index (dict): Allocation fields keyed by AccountId, or None for an empty index.
+        database (dict): Report database to load the records into, or None.
+        parquet_export (dict): Parquet export to write the records into, or None.
+    Returns:
+        int: Number of snapshots reported, or None if the report failed.
+    """
+    s3_client = boto3.session.Session().client('s3')
+    counts = {'Rows': 0}
+    summaries = new_summaries(SNAPSHOT_FILE_NAME)
+    account_index = account_index or {}
+
+    try:
+        items = load_into_database(count_items(scan_table_items(EBS_SNAPSHOT_TABLE), counts), database, 'ebs_snapshots')
+        items = write_into_parquet(items, parquet_export, 'ebs_snapshots', 'EBS Snapshot')
+        rows = summarize_rows((enrich_row(get_ebs_snapshot_row(item), account_index) for item in items), summaries)
+        write_report(s3_client, SNAPSHOT_FILE_NAME, SNAPSHOT_FIELDNAMES, rows, manifest_reports)
+        write_summaries(s3_client, SNAPSHOT_FILE_NAME, summaries, manifest_reports)
+
+    except ClientError as e:
+        error_message = f"Error in EBS snapshot report: {str(e)}"
+        print(error_message)
+        return None
+
+    return counts['Rows']
+
+def total_resource_savings(manifest_reports=None, account_index=None, database=None, parquet_export=None):
+    """
+    Calculate total resource savings from DynamoDB.
+    Args:
+        manifest_reports (dict): Manifest entries by report key, updated in place, or None.
+        account_index (dict): Allocation fields keyed by AccountId, or None for an empty index.
+        database (dict): Report database to load the records into, or None.
+        parquet_export (dict): Parquet export to write the records into, or None.
+    Returns:
+        int: Number of savings records reported, or None if the report failed.
+    """
+    s3_client = boto3.session.Session().client('s3')
+    counts = {'Rows': 0}
+    summaries = new_summaries(FILE_NAME)
+    account_index = account_index or {}
+
+    try:
+        items = load_into_database(count_items(scan_table_items(SAVINGS_DDB_TABLE), counts), database, 'cost_savings')
+        items = write_into_parquet(items, parquet_export, 'cost_savings')
+        rows = get_resource_savings_rows(items, summaries, account_index)
+        write_report(s3_client, FILE_NAME, SAVINGS_FIELDNAMES, rows, manifest_reports)
+        write_summaries(s3_client, FILE_NAME, summaries, manifest_reports)
+
+    except ClientError as e:
+        error_message = f"Error in resource savings report: {str(e)}"
+        print(error_message)
+        return None
+
+    return counts['Rows']
+
+def timed_report(report_name, build_report, manifest_reports, account_index, database, parquet_export):
+    """
+    Run a report builder and time it.
+    Args:
+        report_name (str): Name of the report for the response.
+        build_report (function): The report builder, returning its row count.
+        manifest_reports (dict): Manifest entries by report key, updated in place.
+        account_index (dict): Allocation fields keyed by AccountId.
+        database (dict): Report database to load the records into, or None.
+        parquet_export (dict): Parquet export to write the records into, or None.
+    Returns:
+        dict: The report name, row count and seconds taken.
+    """
+    start = time.perf_counter()
+    rows = build_report(manifest_reports, account_index, database, parquet_export)
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"{report_name}: {rows} rows in {seconds}s")
+    return {'Report': report_name, 'Rows': rows, 'Seconds': seconds}
 
 def lambda_handler(event, context):
     """
     Main Lambda function handler.
+    The three reports are built concurrently, so the run takes about as long as
+    the largest table rather than the sum of all three. Once they finish the
+    manifest is written with the latest version of every report.
+    With REPORT_SOURCE set to export the tables are read from DynamoDB exports in
+    S3 instead of scanned. An event with StartExports only starts the exports, so
+    a run scheduled ahead of the reports can have them ready.
     Args:
         event (dict): The event data.
         context (object): The context object.
     Returns:
-        dict: The response object.
+        dict: The response object, with the rows and seconds of each report.
     """
     print("Event: ", event, "Context: ", context)
+    export_sources.clear()
+    report_tables = [SAVINGS_DDB_TABLE, EBS_VOLUME_TABLE, EBS_SNAPSHOT_TABLE]
+
+    if event.get('StartExports'):
+        start_table_exports(boto3.client('dynamodb', region_name = 'us-west-2'), report_tables)
+        return {
+            'statusCode': 200,
+            'body': json.dumps('Table exports started')
+        }
+
+    if REPORT_SOURCE != 'scan':
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - EXPORT_WAIT_MARGIN_SECONDS \
+            if context else time.time()
+        export_sources.update(prepare_export_sources(report_tables, deadline))
+
+    s3_client = boto3.client('s3')
+    manifest = load_manifest(s3_client)
+    account_index = load_account_index()
+    database = open_report_database(account_index) if SQL_REPORTS else None
+    parquet_export = open_parquet_export() if PARQUET_EXPORT else None
+
+    report_builders = [
+        (FILE_NAME, total_resource_savings),
+        (EBS_FILE_NAME, total_ebs_volumes),
+        (SNAPSHOT_FILE_NAME, total_ebs_snapshots)
+    ]
+    with ThreadPoolExecutor(max_workers=len(report_builders)) as executor:
+        futures = [executor.submit(timed_report, report_name, build_report, manifest['Reports'], account_index, database, parquet_export) \
+            for report_name, build_report in report_builders]
+        reports = [future.result() for future in futures]
+
+    # A report that failed part way through leaves its table incomplete
+    if database is not None:
+        if all(report['Rows'] is not None for report in reports):
+            run_sql_reports(s3_client, database, manifest['Reports'])
+        else:
+            print("Skipping the SQL reports, not every table loaded")
+        database['connection'].close()
+
+    try:
+        write_manifest(s3_client, manifest)
+
+    except ClientError as e:
+        error_message = f"Error writing report manifest: {str(e)}"
+        print(error_message)
 
-    total_resource_savings()
-    total_ebs_volumes()
-    total_ebs_snapshots()
+    if parquet_export is not None:
+        finish_parquet_export(s3_client, parquet_export)
 
     return {
         'statusCode': 200,
-        'body': json.dumps('Cost Savings Files complete')
+        'body': json.dumps({'Message': 'Cost Savings Files complete', 'Reports': reports})
     }
@@ -18,16 +18,29 @@ resource "aws_lambda_function" "savings_totals_lambda_function" {
     variables = {
       ENV                   = var.env,
       SNS_ARN               = var.sns_topic_arn,
+      ACCOUNT_TABLE         = var.account_table_name,
       EBS_VOLUME_TABLE      = var.ebs_volume_table_name,
       CLEANUP_SAVINGS_TABLE = var.resource_savings_table_name,
       EBS_SNAPSHOT_TABLE    = var.ebs_snapshot_table_name,
-      S3_BUCKET             = var.s3_storage_bucket_name
+      S3_BUCKET             = var.s3_storage_bucket_name,
+      REPORT_GZIP           = tostring(var.report_gzip),
+      REPORT_SCAN_SEGMENTS  = tostring(var.report_scan_segments),
+      REPORT_SOURCE         = var.report_source,
+      PARQUET_EXPORT        = tostring(var.parquet_export),
+      PARQUET_PARTITION_BY  = var.parquet_partition_by,
+      SQL_REPORTS           = tostring(var.sql_reports)
     }
   }
 
   handler     = "lambda_function.lambda_handler"
-  memory_size = 256
+  memory_size = var.parquet_export ? 1024 : 256
   runtime     = "python3.13"
+  layers      = compact([var.parquet_layer_arn])
+
+  # Reports are spooled to /tmp while hashed, alongside the SQL report database
+  ephemeral_storage {
+    size = var.sql_reports ? 3072 : 1024
+  }
 
   filename         = data.archive_file.savings_totals_lambda_code.output_path
   source_code_hash = data.archive_file.savings_totals_lambda_code.output_base64sha256
@@ -1,3 +1,13 @@
+variable "account_table_arn" {
+  description = "ARN of the DynamoDB table that holds AWS account information"
+  type        = string
+}
+
+variable "account_table_name" {
+  description = "Name of the DynamoDB table that holds AWS account information"
+  type        = string
+}
+
 variable "ebs_volume_table_arn" {
   description = "ARN of the DynamoDB table to store EBS volume information"
   type        = string
@@ -24,6 +34,57 @@ variable "env" {
   default     = "dev"
 }
 
+variable "parquet_export" {
+  description = "Also export the savings, volume and snapshot tables as partitioned Parquet datasets (requires parquet_layer_arn)"
+  type        = bool
+  default     = false
+}
+
+variable "parquet_layer_arn" {
+  description = "ARN of a Lambda layer providing pyarrow, such as the AWS SDK for pandas layer"
+  type        = string
+  default     = ""
+}
+
+variable "parquet_partition_by" {
+  description = "Second level partition of the Parquet datasets, after resource type (month or account)"
+  type        = string
+  default     = "month"
+
+  validation {
+    condition     = contains(["month", "account"], var.parquet_partition_by)
+    error_message = "parquet_partition_by must be month or account."
+  }
+}
+
+variable "report_gzip" {
+  description = "Gzip the generated CSV reports (written with a .gz suffix)"
+  type        = bool
+  default     = false
+}
+
+variable "report_scan_segments" {
+  description = "Number of parallel scan segments each report reads its table with"
+  type        = number
+  default     = 1
+
+  validation {
+    condition     = var.report_scan_segments >= 1
+    error_message = "report_scan_segments must be at least 1."
+  }
+}
+
+variable "report_source" {
+  description = "Where the reports read the tables from, scan or export (DynamoDB exports to S3, needs point-in-time recovery on the tables)"
+  type        = string
+  default     = "scan"
+
+  validation {
+    condition     = contains(["scan", "export"], var.report_source)
+    error_message = "report_source must be scan or export."
+  }
+}
+
 variable "resource_savings_table_arn" {
   description = "ARN of the DynamoDB table to store resource savings information"
   type        = string
@@ -54,6 +115,12 @@ variable "sns_topic_arn" {
   type        = string
 }
 
+variable "sql_reports" {
+  description = "Load the report tables into a SQLite database in /tmp and write the SQL defined reports"
+  type        = bool
+  default     = false
+}
+
 variable "tags" {
   description = "The key-value map of strings"
   type        = map(string)
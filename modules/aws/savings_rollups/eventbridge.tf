@@ -0,0 +1,22 @@
+###  EVENTBRIDGE SAVINGS ROLLUP REBUILD RULE CONFIGURATION  ###
+resource "aws_cloudwatch_event_rule" "savings_rollups_weekly_rebuild" {
+  name                = "savings-rollups-rebuild-rule"
+  description         = "Rebuilds the savings rollups from the savings table every week"
+  schedule_expression = "cron(0 9 ? * SUN *)"
+  state               = var.env != "prod" ? "DISABLED" : "ENABLED"
+}
+
+resource "aws_cloudwatch_event_target" "trigger_savings_rollups_rebuild_on_schedule" {
+  rule      = aws_cloudwatch_event_rule.savings_rollups_weekly_rebuild.name
+  target_id = "lambda"
+  arn       = aws_lambda_function.savings_rollups_lambda_function.arn
+  input     = jsonencode({ Rebuild = true })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_to_call_savings_rollups_lambda" {
+  statement_id  = "AllowSavingsRollupsExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.savings_rollups_lambda_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.savings_rollups_weekly_rebuild.arn
+}
@@ -0,0 +1,108 @@
+# ### Savings Rollups role ###
+
+resource "aws_iam_role" "savings_rollups_role" {
+  name = "savings-rollups-role"
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = "sts:AssumeRole"
+      Effect = "Allow"
+      Principal = {
+        Service = "lambda.amazonaws.com"
+      }
+    }]
+  })
+}
+
+
+resource "aws_iam_policy" "savings_rollups_policy" {
+  name = "savings-rollups-policy"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid    = "AWSLambdaBasicExecutionPermissions",
+        Effect = "Allow",
+        Action = [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents"
+        ],
+        Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeTable",
+          "dynamodb:Scan"
+        ]
+        Resource = [
+          var.resource_savings_table_arn
+        ]
+      },
+      {
+        Sid    = "SavingsStreamPermissions"
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = [
+          var.resource_savings_table_stream_arn
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeTable",
+          "dynamodb:GetItem",
+          "dynamodb:Query",
+          "dynamodb:Scan",
+          "dynamodb:UpdateItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = [
+          var.savings_rollup_table_arn
+        ]
+      },
+      {
+        Sid    = "StreamMappingListPermissions"
+        Effect = "Allow"
+        Action = [
+          "lambda:ListEventSourceMappings",
+          "lambda:GetEventSourceMapping"
+        ]
+        Resource = "*"
+      },
+      {
+        Sid    = "StreamMappingPausePermissions"
+        Effect = "Allow"
+        Action = [
+          "lambda:UpdateEventSourceMapping"
+        ]
+        Resource = "*"
+        Condition = {
+          StringEquals = {
+            "lambda:FunctionArn" = aws_lambda_function.savings_rollups_lambda_function.arn
+          }
+        }
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sns:publish"
+        ]
+        Resource = [var.sns_topic_arn]
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "savings_rollups_role_policy_attachment" {
+  policy_arn = aws_iam_policy.savings_rollups_policy.arn
+  role       = aws_iam_role.savings_rollups_role.name
+}
@@ -0,0 +1,361 @@
+"""
+Lambda function to maintain realized savings rollups from the cleanup savings table stream.
+Each savings record adds to a total, a per month, a per account and a per resource type
+rollup item with atomic ADD updates, so reports can read a handful of items instead of
+scanning the whole savings history.
+It also sends notifications via SNS if any issues occur during the process.
+"""
+import os
+import time
+from datetime import datetime, timezone
+import boto3
+from botocore.exceptions import ClientError
+import botocore
+
+ROLLUP_TABLE = os.environ['ROLLUP_TABLE']
+CLEANUP_SAVINGS_TABLE = os.environ['CLEANUP_SAVINGS_TABLE']
+SNSTOPICARN = os.environ['SNS_ARN']
+REBUILD_MARKER_KEY = 'REBUILD' # Holds the cutoffs of the last rebuild rather than a rollup
+REBUILD_SETTLE_SECONDS = 30 # Lets savings writes stamped before the cutoff land before the scan
+STREAM_PAUSE_TIMEOUT_SECONDS = 300
+BATCH_WRITE_MAX_ATTEMPTS = 5
+BATCH_WRITE_BASE_DELAY = 0.5
+BATCH_WRITE_MAX_DELAY = 20
+
+error_log = []
+
+def get_rollup_keys(savings_item):
+    """
+    Get the rollup items a savings record counts towards.
+    Args:
+        savings_item (dict): Cleanup savings record in DynamoDB-JSON format.
+    Returns:
+        list: The RollupKey of each rollup item.
+    """
+    return [
+        'TOTAL',
+        f"MONTH#{savings_item['DeletionDate']['S'][:7]}",
+        f"ACCOUNT#{savings_item['AccountId']['S']}",
+        f"TYPE#{savings_item['ResourceType']['S']}"
+    ]
+
+def add_rollup_deltas(rollup_deltas, savings_item, sign):
+    """
+    Add a savings record's contribution to the pending rollup deltas.
+    Args:
+        rollup_deltas (dict): Pending deltas keyed by RollupKey.
+        savings_item (dict): Cleanup savings record in DynamoDB-JSON format.
+        sign (int): 1 to add the record, -1 to take it away.
+    """
+    monthly_cost = float(savings_item.get('MonthlyCost', {}).get('N', '0'))
+    volume_size = float(savings_item.get('VolumeSize', {}).get('N', '0'))
+
+    for rollup_key in get_rollup_keys(savings_item):
+        delta = rollup_deltas.setdefault(rollup_key, {'ResourceCount': 0, 'MonthlyCost': 0.0, 'VolumeSize': 0.0})
+        delta['ResourceCount'] += sign
+        delta['MonthlyCost'] += sign * monthly_cost
+        delta['VolumeSize'] += sign * volume_size
+        if rollup_key.startswith('ACCOUNT#') and sign > 0:
+            delta['AccountName'] = savings_item['AccountName']['S']
+
+def get_rebuild_cutoffs(dynamodb_client):
+    """
+    Get the cutoffs of the last rebuild from its marker item.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+    Returns:
+        dict: SavedCutoff and StreamCutoff in epoch seconds, or None if the rollups were never rebuilt.
+    """
+    response = dynamodb_client.get_item(
+        TableName=ROLLUP_TABLE,
+        Key={'RollupKey': {'S': REBUILD_MARKER_KEY}},
+        ConsistentRead=True
+    )
+    if 'Item' not in response:
+        return None
+    return {
+        'SavedCutoff': float(response['Item']['SavedCutoff']['N']),
+        'StreamCutoff': float(response['Item']['StreamCutoff']['N'])
+    }
+
+def is_counted_by_rebuild(record, rebuild_cutoffs):
+    """
+    Check if the last rebuild already counted the change in a stream record.
+    The rebuild counts savings records first saved before its SavedCutoff, and sees
+    every change made before its scan started at StreamCutoff.
+    Args:
+        record (dict): A DynamoDB stream record from the savings table.
+        rebuild_cutoffs (dict): Cutoffs from get_rebuild_cutoffs, or None.
+    Returns:
+        bool: True if the record must not be applied again.
+    """
+    if rebuild_cutoffs is None:
+        return False
+    if record['eventName'] == 'INSERT':
+        saved_at = float(record['dynamodb']['NewImage'].get('SavedAt', {}).get('N', '0'))
+        return saved_at < rebuild_cutoffs['SavedCutoff']
+    return record['dynamodb'].get('ApproximateCreationDateTime', 0) < rebuild_cutoffs['StreamCutoff']
+
+def get_stream_rollup_deltas(records, rebuild_cutoffs=None):
+    """
+    Merge the changes in a batch of stream records into one delta per rollup item.
+    A new record adds to its rollups, a removed record takes away from them and a
+    changed record takes away its old values and adds its new ones. Changes the
+    last rebuild already counted are skipped.
+    Args:
+        records (list): DynamoDB stream records from the savings table.
+        rebuild_cutoffs (dict): Cutoffs from get_rebuild_cutoffs, or None.
+    Returns:
+        dict: Deltas keyed by RollupKey.
+    """
+    rollup_deltas = {}
+
+    for record in records:
+        if is_counted_by_rebuild(record, rebuild_cutoffs):
+            continue
+        old_image = record['dynamodb'].get('OldImage')
+        new_image = record['dynamodb'].get('NewImage')
+        if old_image:
+            add_rollup_deltas(rollup_deltas, old_image, -1)
+        if new_image:
+            add_rollup_deltas(rollup_deltas, new_image, 1)
+
+    # A rewrite of the same values nets out, so there is nothing to update
+    return {rollup_key: delta for rollup_key, delta in rollup_deltas.items() \
+        if delta['ResourceCount'] != 0 or round(delta['MonthlyCost'], 6) != 0 \
+            or round(delta['VolumeSize'], 6) != 0}
+
+def get_batch_id(records):
+    """
+    Get an ID for a batch of stream records that stays the same when the batch is retried.
+    Args:
+        records (list): DynamoDB stream records from the savings table.
+    Returns:
+        str: The event IDs of the first and last record.
+    """
+    return f"{records[0]['eventID']}:{records[-1]['eventID']}"
+
+def apply_rollup_deltas(dynamodb_client, rollup_deltas, batch_id):
+    """
+    Apply deltas to the rollup items with atomic ADD updates.
+    Each rollup item keeps the ID of the last batch applied to it, so a retried
+    batch skips the rollups it already updated on an earlier attempt.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        rollup_deltas (dict): Deltas keyed by RollupKey.
+        batch_id (str): ID of the stream batch from get_batch_id.
+    Returns:
+        list: RollupKey of each rollup that could not be updated.
+    """
+    last_updated = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    failed_keys = []
+
+    for rollup_key, delta in rollup_deltas.items():
+        update_expression = "ADD ResourceCount :count, MonthlyCost :cost, VolumeSize :size \
+            SET LastUpdated = :lastUpdated, LastBatch = :batch"
+        expression_values = {
+            ':count': {'N': str(delta['ResourceCount'])},
+            ':cost': {'N': f"{delta['MonthlyCost']:.6f}"},
+            ':size': {'N': f"{delta['VolumeSize']:.6f}"},
+            ':lastUpdated': {'S': last_updated},
+            ':batch': {'S': batch_id}
+        }
+        if 'AccountName' in delta:
+            update_expression += ", AccountName = :accountName"
+            expression_values[':accountName'] = {'S': delta['AccountName']}
+
+        try:
+            dynamodb_client.update_item(
+                TableName=ROLLUP_TABLE,
+                Key={'RollupKey': {'S': rollup_key}},
+                UpdateExpression=update_expression,
+                ConditionExpression="attribute_not_exists(LastBatch) OR LastBatch <> :batch",
+                ExpressionAttributeValues=expression_values
+            )
+
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                print(f"Batch already applied to {rollup_key}, skipping")
+                continue
+            error_message = f"Error in {ROLLUP_TABLE} DynamoDB rollup update ({rollup_key}): {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+            failed_keys.append(rollup_key)
+
+    return failed_keys
+
+def set_stream_mappings_enabled(lambda_client, function_name, enabled):
+    """
+    Pause or resume the stream event source mappings of this function.
+    Pausing waits until the mappings are disabled, so no batch is still being applied.
+    Args:
+        lambda_client (boto3.client): Lambda client.
+        function_name (str): Name of this Lambda function.
+        enabled (bool): True to resume the mappings, False to pause them.
+    """
+    mappings = lambda_client.list_event_source_mappings(FunctionName=function_name)['EventSourceMappings']
+    for mapping in mappings:
+        lambda_client.update_event_source_mapping(UUID=mapping['UUID'], Enabled=enabled)
+    if enabled:
+        return
+
+    deadline = time.time() + STREAM_PAUSE_TIMEOUT_SECONDS
+    for mapping in mappings:
+        while lambda_client.get_event_source_mapping(UUID=mapping['UUID'])['State'] != 'Disabled':
+            if time.time() > deadline:
+                raise RuntimeError(f"Stream mapping {mapping['UUID']} was not disabled in time")
+            time.sleep(5)
+
+def batch_write_rollups(dynamodb_client, write_requests):
+    """
+    Write put and delete requests to the rollup table 25 at a time.
+    A failed batch is reported and the remaining batches are still written.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        write_requests (list): PutRequest and DeleteRequest entries.
+    """
+    for start in range(0, len(write_requests), 25):
+        request_items = {ROLLUP_TABLE: write_requests[start:start + 25]}
+        attempt = 0
+        try:
+            while request_items:
+                if attempt > 0:
+                    time.sleep(min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * 2 ** attempt))
+                response = dynamodb_client.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems')
+                attempt += 1
+                if request_items and attempt >= BATCH_WRITE_MAX_ATTEMPTS:
+                    raise RuntimeError(f"{len(request_items[ROLLUP_TABLE])} items still unprocessed")
+
+        except (ClientError, RuntimeError) as e:
+            error_message = f"Error writing rollups to {ROLLUP_TABLE}: {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+
+def rebuild_rollups(dynamodb_client, lambda_client, function_name):
+    """
+    Recompute every rollup item from a full scan of the savings table.
+    Used to backfill the rollups and to correct drift, such as a stream batch that
+    was applied twice after a retry.
+    The stream mapping is paused while the rollups are rewritten, so no stream
+    update lands between the scan and the overwrite. Only savings records saved
+    before the cutoff are counted. Later records, and changes made once the scan
+    started, are applied from the stream when it resumes, and the marker item
+    tells the stream updates which changes the rebuild already counted.
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client.
+        lambda_client (boto3.client): Lambda client.
+        function_name (str): Name of this Lambda function.
+    """
+    set_stream_mappings_enabled(lambda_client, function_name, False)
+    try:
+        saved_cutoff = time.time()
+        time.sleep(REBUILD_SETTLE_SECONDS)
+        stream_cutoff = time.time()
+
+        rollup_totals = {}
+        paginator = dynamodb_client.get_paginator('scan')
+        for page in paginator.paginate(TableName=CLEANUP_SAVINGS_TABLE):
+            for savings_item in page['Items']:
+                if float(savings_item.get('SavedAt', {}).get('N', '0')) < saved_cutoff:
+                    add_rollup_deltas(rollup_totals, savings_item, 1)
+
+        last_updated = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        rollup_items = []
+        for rollup_key, totals in rollup_totals.items():
+            rollup_item = {
+                'RollupKey': {'S': rollup_key},
+                'ResourceCount': {'N': str(totals['ResourceCount'])},
+                'MonthlyCost': {'N': f"{totals['MonthlyCost']:.6f}"},
+                'VolumeSize': {'N': f"{totals['VolumeSize']:.6f}"},
+                'LastUpdated': {'S': last_updated}
+            }
+            if 'AccountName' in totals:
+                rollup_item['AccountName'] = {'S': totals['AccountName']}
+            rollup_items.append({'PutRequest': {'Item': rollup_item}})
+
+        # Rollups with no savings records left, such as removed accounts, are deleted
+        for page in paginator.paginate(TableName=ROLLUP_TABLE, ProjectionExpression='RollupKey'):
+            for rollup_item in page['Items']:
+                if rollup_item['RollupKey']['S'] not in rollup_totals \
+                    and rollup_item['RollupKey']['S'] != REBUILD_MARKER_KEY:
+                    rollup_items.append({'DeleteRequest': {'Key': {'RollupKey': rollup_item['RollupKey']}}})
+
+        batch_write_rollups(dynamodb_client, rollup_items)
+        dynamodb_client.put_item(TableName=ROLLUP_TABLE, Item={
+            'RollupKey': {'S': REBUILD_MARKER_KEY},
+            'SavedCutoff': {'N': f"{saved_cutoff:.3f}"},
+            'StreamCutoff': {'N': f"{stream_cutoff:.3f}"},
+            'LastUpdated': {'S': last_updated}
+        })
+        print(f"Rebuilt {len(rollup_totals)} rollup items")
+
+    finally:
+        set_stream_mappings_enabled(lambda_client, function_name, True)
+
+def publish_sns_topic(subject_message, sns_input):
+    """Publish a message to an SNS topic.
+
+    Args:
+        subject_message (str): The subject line for the SNS message.
+        sns_input (str): The message body for the SNS message.
+    """
+    try:
+        sns_client = boto3.client('sns')
+        response = sns_client.publish(
+            TopicArn=SNSTOPICARN,
+            Message=sns_input,
+            Subject=subject_message,
+        )
+        print(response)
+    except botocore.exceptions.ClientError:
+        print("Couldn't publish message to topic %s.", SNSTOPICARN)
+        raise
+    except Exception as e:
+        print("Encountered Unknown Error when publishing to SNS Topic", SNSTOPICARN, " in Lambda: ", e)
+        raise
+    return
+
+def lambda_handler(event, context):
+    """
+    Lambda function to maintain savings rollups.
+    Runs on records from the savings table stream, or on a schedule to rebuild
+    every rollup from the savings table.
+    Args:
+        event (dict): The event data passed to the Lambda function.
+        context (LambdaContext): The context object containing runtime information.
+    Returns:
+        dict: The response object.
+    """
+    print("Event: ", event, "Context: ", context)
+    error_log.clear()
+
+    dynamodb_client = boto3.Session().client('dynamodb')
+    failed_keys = []
+    if 'Records' in event:
+        rollup_deltas = get_stream_rollup_deltas(event['Records'], get_rebuild_cutoffs(dynamodb_client))
+        failed_keys = apply_rollup_deltas(dynamodb_client, rollup_deltas, get_batch_id(event['Records']))
+        print(f"Applied {len(event['Records'])} records to {len(rollup_deltas) - len(failed_keys)} rollup items")
+    else:
+        try:
+            rebuild_rollups(dynamodb_client, boto3.client('lambda'), context.function_name)
+        except (ClientError, RuntimeError) as e:
+            error_message = f"Error rebuilding rollups in {ROLLUP_TABLE}: {str(e)}"
+            print(error_message)
+            error_log.append(error_message)
+
+    if error_log:
+        message = ""
+        for error in error_log:
+            message += error + ",\n"
+        print(message)
+        publish_sns_topic('Savings Rollup Issues', message)
+
+    # Fail the invocation so the event source mapping retries the batch
+    if failed_keys:
+        raise RuntimeError(f"Failed to update rollups {', '.join(failed_keys)}")
+
+    return {
+        'statusCode': 200,
+        'body': 'Savings Rollups Updated Successfully'
+    }
@@ -0,0 +1,68 @@
+
+# ######  Savings Rollups Lambda  ######
+data "archive_file" "savings_rollups_lambda_code" {
+  type        = "zip"
+  source_file = "${path.module}/lambda_code/lambda_function.py"
+  output_path = "savings_rollups.zip"
+}
+
+resource "aws_lambda_function" "savings_rollups_lambda_function" {
+  depends_on = [
+    aws_iam_role.savings_rollups_role
+  ]
+  function_name = "savings-rollups-lambda-${var.short_region}-${var.env}"
+  role          = aws_iam_role.savings_rollups_role.arn
+
+  description = "Lambda function to keep per month, account and resource type savings rollups up to date."
+  environment {
+    variables = {
+      ENV                   = var.env,
+      SNS_ARN               = var.sns_topic_arn,
+      ROLLUP_TABLE          = var.savings_rollup_table_name,
+      CLEANUP_SAVINGS_TABLE = var.resource_savings_table_name
+    }
+  }
+
+  handler     = "lambda_function.lambda_handler"
+  memory_size = 256
+  runtime     = "python3.13"
+
+  filename         = data.archive_file.savings_rollups_lambda_code.output_path
+  source_code_hash = data.archive_file.savings_rollups_lambda_code.output_base64sha256
+
+  tags    = var.tags
+  timeout = 900
+
+}
+
+resource "aws_cloudwatch_log_group" "savings_rollups_lambda_logs" {
+  name              = "/aws/lambda/${aws_lambda_function.savings_rollups_lambda_function.function_name}"
+  retention_in_days = 30
+}
+
+resource "aws_lambda_function_event_invoke_config" "savings_rollups_lambda_failure_event" {
+  function_name          = aws_lambda_function.savings_rollups_lambda_function.function_name
+  maximum_retry_attempts = 0
+
+  destination_config {
+    on_failure {
+      destination = var.sns_topic_arn
+    }
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "savings_rollups_stream" {
+  event_source_arn                   = var.resource_savings_table_stream_arn
+  function_name                      = aws_lambda_function.savings_rollups_lambda_function.arn
+  starting_position                  = "TRIM_HORIZON"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 60
+  maximum_retry_attempts             = 2
+
+  # Batches that still fail after the retries are reported, the weekly rebuild corrects the rollups
+  destination_config {
+    on_failure {
+      destination_arn = var.sns_topic_arn
+    }
+  }
+}
@@ -0,0 +1,46 @@
+variable "env" {
+  description = "Deployment environment of the solution."
+  type        = string
+  default     = "dev"
+}
+
+variable "resource_savings_table_arn" {
+  description = "ARN of the DynamoDB table to store resource savings information"
+  type        = string
+}
+
+variable "resource_savings_table_name" {
+  description = "Name of the DynamoDB table to store resource savings information"
+  type        = string
+}
+
+variable "resource_savings_table_stream_arn" {
+  description = "ARN of the resource savings table stream the rollups are updated from"
+  type        = string
+}
+
+variable "savings_rollup_table_arn" {
+  description = "ARN of the DynamoDB table to store savings rollups"
+  type        = string
+}
+
+variable "savings_rollup_table_name" {
+  description = "Name of the DynamoDB table to store savings rollups"
+  type        = string
+}
+
+variable "short_region" {
+  description = "Short region code (e.g., usw2 for us-west-2)"
+  type        = string
+}
+
+variable "sns_topic_arn" {
+  description = "ARN of the SNS topic for notifications of errors and updates"
+  type        = string
+}
+
+variable "tags" {
+  description = "The key-value map of strings"
+  type        = map(string)
+  default     = {}
+}
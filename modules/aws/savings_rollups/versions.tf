@@ -0,0 +1,13 @@
+terraform {
+  required_version = "~> 1.13.0"
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 6.15"
+    }
+    archive = {
+      source  = "hashicorp/archive"
+      version = ">= 2.7.0"
+    }
+  }
+}
\ No newline at end of file
@@ -14,6 +14,11 @@ resource "aws_dynamodb_table" "aws_accounts" {
     type = "S"
   }
 
+  attribute {
+    name = "ActiveRoster"
+    type = "S"
+  }
+
   global_secondary_index {
     name               = "AccountName-index"
     hash_key           = "AccountName"
@@ -21,5 +26,14 @@ resource "aws_dynamodb_table" "aws_accounts" {
     non_key_attributes = ["GlobalRegion", "Environment"]
   }
 
+  # Sparse index of active accounts, ActiveRoster is only set on accounts with an ACTIVE status
+  global_secondary_index {
+    name               = "ActiveRoster-index"
+    hash_key           = "ActiveRoster"
+    range_key          = "AccountId"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["AccountName", "Environment", "AccountStatus"]
+  }
+
   tags = var.tags
 }
@@ -53,7 +53,9 @@ resource "aws_iam_policy" "terraform_policy" {
           "dynamodb:Query",
           "dynamodb:Scan",
           "dynamodb:UpdateItem",
-          "dynamodb:PutItem"
+          "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:DeleteItem"
         ]
         Resource = [aws_dynamodb_table.terraform_workspace_table.arn]
       },
@@ -0,0 +1,241 @@
+"""
+Client for the HCP Terraform API shared by the HCP collector Lambdas.
+    1. Sends every request through one keep-alive connection pool.
+    2. Waits out 429 responses using Retry-After and the X-RateLimit headers, and
+       backs off on 5xx responses.
+    3. Adapts how many requests are in flight: halved on throttling and grown
+       again by one per round of successful requests.
+    4. Keeps request, latency and retry metrics for the Lambda's output.
+"""
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = "https://app.terraform.io/api/v2"
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 1
+RETRY_MAX_SECONDS = 60
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+REQUEST_TIMEOUT = 10
+
+def create_client(api_token, max_concurrency=8, base_url=BASE_URL):
+    """Create an HCP Terraform API client.
+
+    Args:
+        api_token (str): The API token for Terraform Cloud.
+        max_concurrency (int): Most requests the client lets run at once.
+        base_url (str): The API root, changed to point at a local stand-in.
+
+    Returns:
+        dict: The client state used by the other functions in this module.
+    """
+    session = requests.Session()
+    session.headers.update({
+        "Authorization": f"Bearer {api_token}",
+        "Content-Type": "application/vnd.api+json"
+    })
+    # urllib3 only retries failed connections, responses are retried here so they can be counted
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max_concurrency,
+        max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5, \
+            respect_retry_after_header=False, raise_on_status=False)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return {
+        'session': session,
+        'base_url': base_url,
+        'max_concurrency': max_concurrency,
+        'concurrency_limit': float(max_concurrency),
+        'in_flight': 0,
+        'resume_at': 0.0,
+        'condition': threading.Condition(),
+        'metrics': {
+            'Requests': 0,
+            'Retries': 0,
+            'Throttled': 0,
+            'ServerErrors': 0,
+            'Failures': 0,
+            'RetryWaitSeconds': 0.0,
+            'LatencySeconds': 0.0,
+            'MaxLatencySeconds': 0.0,
+            'MinConcurrencyLimit': max_concurrency
+        }
+    }
+
+def close_client(client):
+    """Close the client's connection pool.
+
+    Args:
+        client (dict): Client from create_client.
+    """
+    client['session'].close()
+
+def acquire_request_slot(client):
+    """Wait until the client is not paused and is below its concurrency limit.
+
+    Args:
+        client (dict): Client from create_client.
+    """
+    with client['condition']:
+        while True:
+            pause = client['resume_at'] - time.monotonic()
+            if pause > 0:
+                client['condition'].wait(pause)
+            elif client['in_flight'] >= int(client['concurrency_limit']):
+                client['condition'].wait()
+            else:
+                client['in_flight'] += 1
+                return
+
+def release_request_slot(client, throttled):
+    """Give back a request slot and adjust the concurrency limit.
+
+    Args:
+        client (dict): Client from create_client.
+        throttled (bool): Whether the request was rate limited.
+    """
+    with client['condition']:
+        client['in_flight'] -= 1
+        if throttled:
+            client['concurrency_limit'] = max(1.0, client['concurrency_limit'] / 2)
+            client['metrics']['MinConcurrencyLimit'] = min(client['metrics']['MinConcurrencyLimit'], \
+                int(client['concurrency_limit']))
+        else:
+            client['concurrency_limit'] = min(float(client['max_concurrency']), \
+                client['concurrency_limit'] + 1 / client['concurrency_limit'])
+        client['condition'].notify_all()
+
+def pause_requests(client, seconds):
+    """Hold back every request of the client for a number of seconds.
+
+    Args:
+        client (dict): Client from create_client.
+        seconds (float): How long to pause for.
+    """
+    with client['condition']:
+        client['resume_at'] = max(client['resume_at'], time.monotonic() + seconds)
+        client['metrics']['RetryWaitSeconds'] += seconds
+
+def get_retry_seconds(headers, attempt):
+    """Get how long to wait before retrying a request.
+
+    Uses Retry-After when the API sends it, then X-RateLimit-Reset, and otherwise
+    an exponential backoff with jitter.
+
+    Args:
+        headers (dict): Headers of the throttled or failed response, empty if there was none.
+        attempt (int): Number of attempts made so far.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    for header in ("Retry-After", "X-RateLimit-Reset"):
+        try:
+            return min(RETRY_MAX_SECONDS, max(0.0, float(headers[header])))
+        except (KeyError, ValueError):
+            continue
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+def add_metric(client, name, value=1):
+    """Add to one of the client's metrics, safe to call from concurrent requests.
+
+    Args:
+        client (dict): Client from create_client.
+        name (str): Name of the metric.
+        value (int/float): Amount to add.
+    """
+    with client['condition']:
+        client['metrics'][name] += value
+
+def add_latency(client, latency):
+    """Record the latency of one request.
+
+    Args:
+        client (dict): Client from create_client.
+        latency (float): Seconds the request took.
+    """
+    with client['condition']:
+        client['metrics']['Requests'] += 1
+        client['metrics']['LatencySeconds'] += latency
+        client['metrics']['MaxLatencySeconds'] = max(client['metrics']['MaxLatencySeconds'], latency)
+
+def get_json(client, path):
+    """Send a GET request to the API and parse the response.
+
+    Rate limited and server error responses are retried up to MAX_ATTEMPTS times.
+
+    Args:
+        client (dict): Client from create_client.
+        path (str): Path and query string below the API root.
+
+    Returns:
+        dict: The parsed response, or None if the request failed.
+    """
+    url = f"{client['base_url']}{path}"
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt > 0:
+            add_metric(client, 'Retries')
+
+        acquire_request_slot(client)
+        throttled = False
+        start = time.perf_counter()
+        try:
+            response = client['session'].get(url, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Error requesting {path}: {str(e)}")
+            response = None
+        finally:
+            add_latency(client, time.perf_counter() - start)
+
+        try:
+            if response is None:
+                pause_requests(client, get_retry_seconds({}, attempt))
+                continue
+
+            # Stop everyone before the quota runs out, rather than collecting 429s
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                pause_requests(client, get_retry_seconds(response.headers, attempt))
+
+            if response.status_code == 200:
+                return response.json()
+
+            if response.status_code == 429:
+                throttled = True
+                add_metric(client, 'Throttled')
+                pause_requests(client, get_retry_seconds(response.headers, attempt))
+            elif response.status_code in SERVER_ERROR_STATUSES:
+                add_metric(client, 'ServerErrors')
+                pause_requests(client, get_retry_seconds(response.headers, attempt))
+            else:
+                print(f"Error requesting {path}: {response.status_code} - {response.text}")
+                break
+        finally:
+            release_request_slot(client, throttled)
+
+    add_metric(client, 'Failures')
+    print(f"Giving up on {path}")
+    return None
+
+def get_metrics(client):
+    """Summarize the client's metrics.
+
+    Args:
+        client (dict): Client from create_client.
+
+    Returns:
+        dict: Request, retry and latency metrics.
+    """
+    with client['condition']:
+        metrics = dict(client['metrics'])
+    metrics['AverageLatencyMs'] = round(1000 * metrics['LatencySeconds'] / metrics['Requests'], 1) \
+        if metrics['Requests'] else 0
+    metrics['RetryWaitSeconds'] = round(metrics['RetryWaitSeconds'], 3)
+    metrics['LatencySeconds'] = round(metrics['LatencySeconds'], 3)
+    metrics['MaxLatencySeconds'] = round(metrics['MaxLatencySeconds'], 3)
+    return metrics
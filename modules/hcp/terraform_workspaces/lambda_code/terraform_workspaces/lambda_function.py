@@ -2,17 +2,24 @@
 Lambda function to fetch all Terraform Cloud workspaces for a specified organization
     1. Retrieves an API token from AWS Secrets Manager.
     2. Uses the token to fetch all Terraform Cloud workspaces for a specified organization.
-    3. Stores or updates the workspace information in a DynamoDB table.
+    3. Writes the new and changed workspaces to a DynamoDB table and removes deleted ones.
 """
 import os
 import base64
+import hashlib
 import json
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 from botocore.exceptions import ClientError
+import hcp_api_client
 
-BASE_URL = "https://app.terraform.io/api/v2"
+BASE_URL = os.environ.get('HCP_API_URL', hcp_api_client.BASE_URL)
 ORGANIZATION_ID = os.environ['HCP_ORG_ID']
+WORKSPACE_PAGE_SIZE = 100 # Largest page size the workspaces API allows
+WORKSPACE_FETCH_WORKERS = int(os.environ.get('WORKSPACE_FETCH_WORKERS', '8'))
+TERRAFORM_WORKSPACE_TABLE = os.environ.get('TERRAFORM_WORKSPACE_TABLE', 'terraform-workspace-table')
+BATCH_WRITE_MAX_ATTEMPTS = 5
 
 def get_api_token():
     """Retrieve the API token from AWS Secrets Manager.
@@ -57,166 +64,250 @@ def get_api_token():
     return token
 
 
-def get_all_workspaces(api_token):
-    """Fetch all workspaces from Terraform Cloud API.
+def parse_workspace(item):
+    """Get the fields stored for a workspace from its JSON:API record.
+
+    Args:
+        item (dict): A workspace record from the workspaces API.
 
     Returns:
-        dict: A dictionary containing all workspace information.
+        tuple: The workspace ID and a dictionary of its details.
     """
+    workspace_id = item["id"]
+    workspace_name = item["attributes"].get("name") or "N/A"
+    resource_count = item["attributes"].get("resource-count") or "N/A"
+    last_updated = item["attributes"].get("latest-change-at") or "N/A"
+    tags = item["attributes"].get("tag-names") or "N/A"
+    description = item["attributes"].get("description") or "N/A"
+    latest_change_at = item["attributes"].get("latest-change-at") or "N/A"
+    created_at = item["attributes"].get("created-at") or "N/A"
+    execution_mode = item["attributes"].get("execution-mode") or "N/A"
+    vcs_repo_identifier = item["attributes"].get("vcs-repo-identifier") or "N/A"
+    vcs_repo = item["attributes"].get("vcs-repo") or "N/A"
+    locked = item["attributes"].get("locked") or "False"
+    apply_duration_average = item["attributes"].get("apply-duration-average") or "N/A"
+    working_directory= item["attributes"].get("working-directory") or "N/A"
+    terraform_version= item["attributes"].get("terraform-version") or "N/A"
+    project_id = item["relationships"]["project"]["data"]["id"]
+    if item.get('relationships', {}).get('current-run', {}).get('data', {}):
+        current_run_id = item['relationships']['current-run']['data']['id']
+    else:
+        current_run_id = "N/A"
+    if item.get('relationships', {}).get('current-state-version', {}).get('data', {}):
+        current_state_version_id = item['relationships']['current-state-version']['data']['id']
+    else:
+        current_state_version_id = "N/A"
 
-    # Headers for authentication
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/vnd.api+json"
+    workspace = {
+        "name": workspace_name,
+        "resource_count": resource_count,
+        "last_updated": last_updated,
+        "tags": tags,
+        "created_at":created_at,
+        "execution_mode":execution_mode,
+        "vcs_repo":vcs_repo,    
+        "vcs_repo_identifier":vcs_repo_identifier,
+        "current_run_id": current_run_id,
+        "current_state_version_id": current_state_version_id,
+        "description": description,
+        "latest_change_at": latest_change_at,
+        "locked": locked,
+        "apply_duration_average": apply_duration_average,
+        "working_directory": working_directory,
+        "terraform_version": terraform_version,
+        "project_id": project_id
     }
 
+    return workspace_id, workspace
+
+def get_workspace_page(client, page_number):
+    """Fetch one page of workspaces from Terraform Cloud API.
+
+    Args:
+        client (dict): HCP API client from hcp_api_client.create_client.
+        page_number (int): The page to fetch, starting at 1.
+
+    Returns:
+        tuple: A dictionary of the page's workspaces keyed by workspace ID and the pagination
+        metadata, or None and an empty dictionary if the page could not be fetched.
+    """
+    path = f"/organizations/{ORGANIZATION_ID}/workspaces?page[number]={page_number}&page[size]={WORKSPACE_PAGE_SIZE}"
+    page = hcp_api_client.get_json(client, path)
+
+    if page is None:
+        print(f"Error fetching workspaces page {page_number}")
+        return None, {}
+
+    # Parse the page once for both the records and the pagination info
+    workspaces = dict(parse_workspace(item) for item in page["data"])
+    return workspaces, page.get("meta", {}).get("pagination", {})
+
+def get_all_workspaces(api_token, client=None):
+    """Fetch all workspaces from Terraform Cloud API.
+
+    The first page gives the total number of pages, the remaining pages are then
+    fetched concurrently through the HCP API client, which keeps within the API's
+    rate limits.
+
+    Args:
+        api_token (str): The API token for Terraform Cloud.
+        client (dict): HCP API client, created from api_token when not given.
+
+    Returns:
+        tuple: A dictionary containing all workspace information, and whether every page was fetched.
+    """
+    if client is None:
+        client = hcp_api_client.create_client(api_token, WORKSPACE_FETCH_WORKERS, BASE_URL)
+
     all_workspaces = {}
-    current_page = 1
-    per_page = 50  # Default per page value, you can adjust based on API limitations
-    total_pages = 1  # Initial assumption, will be updated after the first request
-
-    while current_page <= total_pages:
-        url = f"{BASE_URL}/organizations/{ORGANIZATION_ID}/workspaces?page[number]={current_page}&page[size]={per_page}"
-        response = requests.get(url, headers=headers, timeout=10)
-
-        if response.status_code == 200:
-            workspaces_data = response.json()["data"]
-            # Collect all workspace IDs and names
-            for item in workspaces_data:
-                workspace_id = item["id"]
-                workspace_name = item["attributes"].get("name") or "N/A"
-                resource_count = item["attributes"].get("resource-count") or "N/A"
-                last_updated = item["attributes"].get("latest-change-at") or "N/A"
-                tags = item["attributes"].get("tag-names") or "N/A"
-                description = item["attributes"].get("description") or "N/A"
-                latest_change_at = item["attributes"].get("latest-change-at") or "N/A"
-                created_at = item["attributes"].get("created-at") or "N/A"
-                execution_mode = item["attributes"].get("execution-mode") or "N/A"
-                vcs_repo_identifier = item["attributes"].get("vcs-repo-identifier") or "N/A"
-                vcs_repo = item["attributes"].get("vcs-repo") or "N/A"
-                locked = item["attributes"].get("locked") or "False"
-                apply_duration_average = item["attributes"].get("apply-duration-average") or "N/A"
-                working_directory= item["attributes"].get("working-directory") or "N/A"
-                terraform_version= item["attributes"].get("terraform-version") or "N/A"
-                project_id = item["relationships"]["project"]["data"]["id"]
-                if item.get('relationships', {}).get('current-run', {}).get('data', {}):
-                    current_run_id = item['relationships']['current-run']['data']['id']
-                else:
-                    current_run_id = "N/A"
-                if item.get('relationships', {}).get('current-state-version', {}).get('data', {}):
-                    current_state_version_id = item['relationships']['current-state-version']['data']['id']
-                else:
-                    current_state_version_id = "N/A"
-
-                all_workspaces[workspace_id] = {
-                    "name": workspace_name,
-                    "resource_count": resource_count,
-                    "last_updated": last_updated,
-                    "tags": tags,
-                    "created_at":created_at,
-                    "execution_mode":execution_mode,
-                    "vcs_repo":vcs_repo,    
-                    "vcs_repo_identifier":vcs_repo_identifier,
-                    "current_run_id": current_run_id,
-                    "current_state_version_id": current_state_version_id,
-                    "description": description,
-                    "latest_change_at": latest_change_at,
-                    "locked": locked,
-                    "apply_duration_average": apply_duration_average,
-                    "working_directory": working_directory,
-                    "terraform_version": terraform_version,
-                    "project_id": project_id
-                }
-            # Get pagination info from the 'meta' field
-            pagination_info = response.json().get("meta", {}).get("pagination", {})
-            total_pages = pagination_info.get("total-pages", 1)
-
-            # Move to the next page
-            current_page += 1
-        else:
-            print(f"Error fetching workspaces: {response.status_code} - {response.text}")
-            break
+    complete = True
+    workspaces, pagination_info = get_workspace_page(client, 1)
+    if workspaces is None:
+        return all_workspaces, False
+    all_workspaces.update(workspaces)
+    total_pages = pagination_info.get("total-pages", 1)
+
+    with ThreadPoolExecutor(max_workers=WORKSPACE_FETCH_WORKERS) as executor:
+        for workspaces, _ in executor.map(lambda page_number: get_workspace_page(client, page_number), \
+                range(2, total_pages + 1)):
+            if workspaces is None:
+                complete = False
+            else:
+                all_workspaces.update(workspaces)
+
+    print(f"Fetched {len(all_workspaces)} workspaces from {total_pages} pages")
+    return all_workspaces, complete
 
-    return all_workspaces
+def build_workspace_item(workspace_id, info):
+    """Build the DynamoDB item stored for a workspace, with a fingerprint of its content.
 
-def create_workspace_records(workspaces_info):
+    Parameters:
+        workspace_id (str): The workspace ID.
+        info (dict): Workspace details from parse_workspace.
+
+    Returns:
+        dict: The workspace item in DynamoDB-JSON format.
     """
-    Creates or updates resource records in a DynamoDB table for multiple workspaces.
+    resource_count = info.get('resource_count')
+    tags = info.get('tags')
+    workspace_item = {
+        'WorkspaceId': {'S': workspace_id},
+        'WorkspaceName': {'S': info.get('name', 'N/A')},
+        'ResourceCount': {'N': str(resource_count) if isinstance(resource_count, int) else '0'},
+        'LastUpdated': {'S': info.get('last_updated', 'N/A')},
+        'Tags': {'L': [{'S': tag} for tag in tags] if isinstance(tags, list) else []},
+        'ExecutionMode': {'S': info.get('execution_mode', 'N/A')},
+        'VcsRepo': {'S': json.dumps(info.get('vcs_repo', 'N/A'))},
+        'VcsRepoIdentifier': {'S': str(info.get('vcs_repo_identifier', 'N/A'))},
+        'CurrentRunId': {'S': info.get('current_run_id', 'N/A')},
+        'CurrentStateVersionId': {'S': info.get('current_state_version_id', 'N/A')},
+        'Description': {'S': info.get('description', 'N/A')},
+        'LatestChangeAt': {'S': info.get('latest_change_at', 'N/A')},
+        'Locked': {'S': str(info.get('locked', 'False'))},
+        'ApplyDurationAverage': {'S': str(info.get('apply_duration_average', 'N/A'))},
+        'WorkingDirectory': {'S': info.get('working_directory', 'N/A')},
+        'TerraformVersion': {'S': info.get('terraform_version', 'N/A')},
+        'ProjectId': {'S': info.get('project_id', 'N/A')}
+    }
+    workspace_item['Fingerprint'] = {'S': hashlib.sha256(json.dumps(workspace_item, sort_keys=True).encode('utf-8')).hexdigest()}
+    return workspace_item
+
+def get_workspace_fingerprints(dynamodb_client):
+    """Load the fingerprint of every workspace in the DynamoDB table.
+
+    Parameters:
+        dynamodb_client (boto3.client): DynamoDB client.
+
+    Returns:
+        dict: Fingerprints keyed by workspace ID, empty for items written before fingerprints were stored.
+    """
+    fingerprints = {}
+    paginator = dynamodb_client.get_paginator('scan')
+    for page in paginator.paginate(TableName=TERRAFORM_WORKSPACE_TABLE, ProjectionExpression='WorkspaceId, Fingerprint'):
+        for item in page['Items']:
+            fingerprints[item['WorkspaceId']['S']] = item.get('Fingerprint', {}).get('S', '')
+    return fingerprints
+
+def batch_write_workspaces(dynamodb_client, write_requests):
+    """Write put and delete requests to the workspace table 25 at a time.
+
+    Parameters:
+        dynamodb_client (boto3.client): DynamoDB client.
+        write_requests (list): PutRequest and DeleteRequest entries.
+
+    Returns:
+        int: Number of requests that could not be written.
+    """
+    failed_requests = 0
+    for start in range(0, len(write_requests), 25):
+        request_items = {TERRAFORM_WORKSPACE_TABLE: write_requests[start:start + 25]}
+        attempt = 0
+        try:
+            while request_items:
+                if attempt > 0:
+                    time.sleep(min(10, 0.5 * 2 ** attempt))
+                response = dynamodb_client.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems')
+                attempt += 1
+                if request_items and attempt >= BATCH_WRITE_MAX_ATTEMPTS:
+                    raise RuntimeError(f"{len(request_items[TERRAFORM_WORKSPACE_TABLE])} items still unprocessed")
+
+        except (ClientError, RuntimeError) as e:
+            failed_requests += len(request_items[TERRAFORM_WORKSPACE_TABLE])
+            print(f"Error writing workspace records: {str(e)}")
+
+    return failed_requests
+
+def create_workspace_records(workspaces_info, complete=True, dynamodb_client=None):
+    """
+    Writes new and changed workspaces to the DynamoDB table and removes deleted ones.
+
+    The table is read once for the stored fingerprints, so only workspaces whose
+    content changed since the last run are written.
 
     Parameters:
         workspaces_info (dict): A dictionary where keys are workspace IDs and values are
         dictionaries containing workspace details such as resource count, last updated date, 
         and tags.
+        complete (bool): Whether workspaces_info holds every workspace. Workspaces missing
+        from the table are only removed after a complete fetch.
+        dynamodb_client (boto3.client): DynamoDB client, created when not given.
     
     Returns:
-        None
+        dict: Number of workspaces created, changed, unchanged, removed and failed.
     """
-    try:
-        # Initialize a session using boto3
-        primary_session = boto3.Session()
-        dynamodb_client = primary_session.client('dynamodb', region_name='us-west-2')
-
-        for workspace_id, info in workspaces_info.items():
-            try:
-                # Prepare the update expression
-                update_expression = (
-                    "SET WorkspaceName = :name, "
-                    "ResourceCount = :resourceCount, "
-                    "LastUpdated = :lastUpdated, "
-                    "Tags = :tags, "
-                    "ExecutionMode = :executionMode, "
-                    "VcsRepo = :vcsRepo, "
-                    "VcsRepoIdentifier = :vcsRepoIdentifier, "
-                    "CurrentRunId = :currentRunId, "
-                    "CurrentStateVersionId = :currentStateVersionId, "
-                    "Description = :description, "
-                    "LatestChangeAt = :latestChangeAt, "
-                    "Locked = :locked, "
-                    "ApplyDurationAverage = :applyDurationAverage, "
-                    "WorkingDirectory = :workingDirectory, "
-                    "TerraformVersion = :terraformVersion, "
-                    "ProjectId = :projectId"
-                )
-
-                # Prepare the ExpressionAttributeValues
-                expression_attribute_values = {
-                    ':name': {'S': info.get('name', 'N/A')},
-                    ':resourceCount': {'N': str(info.get('resource_count', '0'))},
-                    ':lastUpdated': {'S': info.get('last_updated', 'N/A')},
-                    ':tags': {'L': [{'S': tag} for tag in info.get('tags', [])]},
-                    ':executionMode': {'S': info.get('execution_mode', 'N/A')},
-                    ':vcsRepo': {'S': json.dumps(info.get('vcs_repo', 'N/A'))},
-                    ':vcsRepoIdentifier': {'S': str(info.get('vcs_repo_identifier', 'N/A'))},
-                    ':currentRunId': {'S': info.get('current_run_id', 'N/A')},
-                    ':currentStateVersionId': {'S': info.get('current_state_version_id', 'N/A')},
-                    ':description': {'S': info.get('description', 'N/A')},
-                    ':latestChangeAt': {'S': info.get('latest_change_at', 'N/A')},
-                    ':locked': {'S': str(info.get('locked', 'False'))},
-                    ':applyDurationAverage': {'S': str(info.get('apply_duration_average', 'N/A'))},
-                    ':workingDirectory': {'S': info.get('working_directory', 'N/A')},
-                    ':terraformVersion': {'S': info.get('terraform_version', 'N/A')},
-                    ':projectId': {'S': info.get('project_id', 'N/A')}
-                }
-
-                # Update the record in the DynamoDB table
-                response = dynamodb_client.update_item(
-                    Key={
-                        'WorkspaceId': {
-                            'S': workspace_id  # Use workspace_id as the key
-                        }
-                    },
-                    UpdateExpression=update_expression,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    TableName='terraform-workspace-table',
-                )
-                print(f"Workspace {workspace_id} updated successfully: {response}")
-
-            except ClientError as e:
-                error_message = f"Error updating workspace {workspace_id}: {str(e)}"
-                print(error_message)
+    sync_counts = {'Created': 0, 'Changed': 0, 'Unchanged': 0, 'Removed': 0, 'Failed': 0}
+    if dynamodb_client is None:
+        dynamodb_client = boto3.Session().client('dynamodb')
 
+    try:
+        fingerprints = get_workspace_fingerprints(dynamodb_client)
     except ClientError as e:
         print(f"Error in creating workspace records: {str(e)}")
+        return sync_counts
+
+    write_requests = []
+    for workspace_id, info in workspaces_info.items():
+        workspace_item = build_workspace_item(workspace_id, info)
+        if workspace_id not in fingerprints:
+            sync_counts['Created'] += 1
+        elif fingerprints[workspace_id] != workspace_item['Fingerprint']['S']:
+            sync_counts['Changed'] += 1
+        else:
+            sync_counts['Unchanged'] += 1
+            continue
+        write_requests.append({'PutRequest': {'Item': workspace_item}})
+
+    if complete:
+        for workspace_id in fingerprints.keys() - workspaces_info.keys():
+            sync_counts['Removed'] += 1
+            write_requests.append({'DeleteRequest': {'Key': {'WorkspaceId': {'S': workspace_id}}}})
+    else:
+        print("Workspace fetch was incomplete, not removing workspaces missing from it")
+
+    sync_counts['Failed'] = batch_write_workspaces(dynamodb_client, write_requests)
+    print(f"Workspace table sync: {json.dumps(sync_counts)}")
+    return sync_counts
 
 def lambda_handler(event, context):
     """
@@ -224,5 +315,21 @@ def lambda_handler(event, context):
     """
     print("Event: ", event, "Context: ", context)
     api_token = get_api_token()
-    workspaces = get_all_workspaces(api_token)
-    create_workspace_records(workspaces)
+    client = hcp_api_client.create_client(api_token, WORKSPACE_FETCH_WORKERS, BASE_URL)
+    try:
+        workspaces, complete = get_all_workspaces(api_token, client)
+    finally:
+        hcp_api_client.close_client(client)
+    api_metrics = hcp_api_client.get_metrics(client)
+    print(f"HCP API metrics: {json.dumps(api_metrics)}")
+
+    sync_counts = create_workspace_records(workspaces, complete)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'Message': 'Terraform workspace table updated',
+            'Workspaces': sync_counts,
+            'Api': api_metrics
+        })
+    }
@@ -2,7 +2,7 @@
 # ######  TERRAFORM WORKSPACES Lambda  ######
 data "archive_file" "terraform_workspaces_lambda_code" {
   type        = "zip"
-  source_file = "${path.module}/lambda_code/lambda_function.py"
+  source_dir  = "${path.module}/lambda_code/terraform_workspaces"
   output_path = "terraform_workspaces.zip"
 }
 
@@ -22,6 +22,7 @@ resource "aws_lambda_function" "terraform_workspaces_lambda_function" {
       HCP_ORG_ID                = var.hcp_organization_id,
       SNS_ARN                   = var.sns_topic_arn,
       TERRAFORM_WORKSPACE_TABLE = aws_dynamodb_table.terraform_workspace_table.name,
+      WORKSPACE_FETCH_WORKERS   = var.workspace_fetch_workers,
     }
   }
 
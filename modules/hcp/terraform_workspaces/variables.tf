@@ -51,3 +51,9 @@ variable "tags" {
   type        = map(string)
   default     = {}
 }
+
+variable "workspace_fetch_workers" {
+  description = "Number of workspace pages fetched concurrently from the HCP Terraform API"
+  type        = number
+  default     = 8
+}
@@ -1,8 +1,8 @@
 ###  EVENTBRIDGE ACCOUNT RULE CONFIGURATION  ###
 resource "aws_cloudwatch_event_rule" "aws_account_pull_lambda_every_day" {
   name                = "aws-account-pull-rule"
-  description         = "Triggers account pull every day at 2AM"
-  schedule_expression = "cron(0 6 * * ? *)"
+  description         = var.organization_events ? "Triggers a full account pull every Sunday at 2AM to reconcile event updates" : "Triggers account pull every day at 2AM"
+  schedule_expression = var.organization_events ? "cron(0 6 ? * SUN *)" : "cron(0 6 * * ? *)"
   state               = var.env != "prod" ? "DISABLED" : "ENABLED"
 }
 
@@ -19,3 +19,40 @@ resource "aws_lambda_permission" "allow_eventbridge_to_call_aws_account_pull_lam
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.aws_account_pull_lambda_every_day.arn
 }
+
+###  ORGANIZATIONS ACCOUNT EVENTS CONFIGURATION  ###
+# Organizations events are only sent in the management account, which forwards them to this account's default bus
+resource "aws_cloudwatch_event_permission" "allow_management_account_events" {
+  count        = var.organization_events ? 1 : 0
+  principal    = split(":", var.management_account_role_arn)[4]
+  statement_id = "AllowOrganizationEventsFromManagementAccount"
+}
+
+resource "aws_cloudwatch_event_rule" "organization_account_events" {
+  count       = var.organization_events ? 1 : 0
+  name        = "aws-account-pull-organization-events-rule"
+  description = "Updates an account when Organizations creates, tags, moves or closes it"
+  event_pattern = jsonencode({
+    source = ["aws.organizations"]
+    detail = {
+      eventSource = ["organizations.amazonaws.com"]
+      eventName   = ["CreateAccountResult", "TagResource", "UntagResource", "MoveAccount", "CloseAccount"]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_target" "trigger_account_pull_lambda_on_organization_event" {
+  count     = var.organization_events ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.organization_account_events[0].name
+  target_id = "lambda"
+  arn       = aws_lambda_function.aws_account_pull.arn
+}
+
+resource "aws_lambda_permission" "allow_organization_events_to_call_aws_account_pull_lambda" {
+  count         = var.organization_events ? 1 : 0
+  statement_id  = "AllowAccountPullExecutionFromOrganizationEvents"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.aws_account_pull.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.organization_account_events[0].arn
+}
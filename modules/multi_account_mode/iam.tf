@@ -55,9 +55,14 @@ resource "aws_iam_policy" "account_list_processing_lambda_policy" {
           "dynamodb:Query",
           "dynamodb:Scan",
           "dynamodb:UpdateItem",
-          "dynamodb:PutItem"
+          "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = [
+          var.dynamodb_accounts_table_arn,
+          "${var.dynamodb_accounts_table_arn}/index/ActiveRoster-index"
         ]
-        Resource = [var.dynamodb_accounts_table_arn]
       },
       {
         Effect = "Allow"
@@ -91,3 +96,24 @@ resource "aws_iam_role_policy_attachment" "account_list_processing_role_policy_a
   policy_arn = aws_iam_policy.account_list_processing_lambda_policy.arn
   role       = aws_iam_role.account_list_processing_lambda_role.name
 }
+
+# Publishing the account roster, only when a roster bucket is given
+resource "aws_iam_role_policy" "account_list_processing_account_roster_policy" {
+  count = var.account_roster_bucket_arn == "" ? 0 : 1
+  name  = "account-list-processing-account-roster-policy"
+  role  = aws_iam_role.account_list_processing_lambda_role.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Sid    = "AccountRosterPublish"
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject"
+        ]
+        Resource = ["${var.account_roster_bucket_arn}/account_roster/*"]
+      }
+    ]
+  })
+}
@@ -15,11 +15,13 @@ resource "aws_lambda_function" "aws_account_pull" {
   description = "Lambda function to scan and store current AWS accounts pulled from Master account."
   environment {
     variables = {
-      ACCOUNTS_DDB_TABLE = var.dynamodb_accounts_table_name,
-      ACCOUNT_ROLE_ARN   = var.management_account_role_arn,
-      ENV                = var.env,
-      INACTIVE_ACCOUNTS  = var.inactive_accounts_list,
-      SNS_ARN            = var.sns_topic_arn
+      ACCOUNTS_DDB_TABLE    = var.dynamodb_accounts_table_name,
+      ACCOUNT_ROLE_ARN      = var.management_account_role_arn,
+      ACCOUNT_ROSTER_BUCKET = var.account_roster_bucket_name,
+      ENV                   = var.env,
+      INACTIVE_ACCOUNTS     = var.inactive_accounts_list,
+      SNS_ARN               = var.sns_topic_arn,
+      TAG_FETCH_WORKERS     = var.tag_fetch_workers
     }
   }
 
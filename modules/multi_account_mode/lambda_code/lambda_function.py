@@ -11,9 +11,16 @@ Returns:
 
 import os
 import datetime
+import gzip
+import hashlib
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 import botocore
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 INACTIVE_ACCOUNTS = os.environ['INACTIVE_ACCOUNTS'].split(',')
@@ -21,7 +28,41 @@ ACCOUNT_ROLE_ARN = os.environ['ACCOUNT_ROLE_ARN']
 DDB_TABLE = os.environ['ACCOUNTS_DDB_TABLE']
 SNSTOPICARN=os.environ['SNS_ARN']
 
+# Tag fetching settings, Organizations allows only a few requests per second per account
+TAG_FETCH_WORKERS = int(os.environ.get('TAG_FETCH_WORKERS', '4'))
+TAG_FETCH_MAX_ATTEMPTS = int(os.environ.get('TAG_FETCH_MAX_ATTEMPTS', '8'))
+TAG_FETCH_BASE_DELAY = 0.5
+TAG_FETCH_MAX_DELAY = 20
+
+# Account table sync settings, the run summary item holds the time and counts of the last pull
+ACCOUNT_ATTRIBUTES = ['Arn', 'Email', 'GlobalRegion', 'AccountName', 'AccountStatus', 'JoinedMethod', \
+    'JoinedDatetime', 'Custodian', 'AccountOwner', 'CostCenter', 'CostDepartment', 'Environment', \
+    'ParentId', 'ParentType', 'OuPath']
+RUN_SUMMARY_ID = 'RUN_SUMMARY'
+ACTIVE_ROSTER_INDEX = 'ActiveRoster-index' # Sparse index of the active accounts
+BATCH_WRITE_MAX_ATTEMPTS = 5
+
+# Organizations CloudTrail events that change an account's information
+ORGANIZATION_EVENT_NAMES = ['CreateAccountResult', 'TagResource', 'UntagResource', 'MoveAccount', 'CloseAccount']
+
+# Optional compact roster of active accounts that the inventory functions load instead of scanning the table
+ACCOUNT_ROSTER_BUCKET = os.environ.get('ACCOUNT_ROSTER_BUCKET', '')
+ACCOUNT_ROSTER_KEY = 'account_roster/active_accounts.json.gz'
+ROSTER_ATTRIBUTES = ['AccountId', 'AccountName', 'Environment', 'AccountStatus']
+
 error_log = []
+run_metrics = {}
+metrics_lock = threading.Lock()
+
+def add_metric(name, value=1):
+    """Add to a per-run metric, safe to call from the tag fetching threads.
+
+    Args:
+        name (string): Name of the metric
+        value (int/float): Amount to add
+    """
+    with metrics_lock:
+        run_metrics[name] = run_metrics.get(name, 0) + value
 
 def assume_new_account_role():
     """Assume a role in a new AWS account.
@@ -41,56 +82,412 @@ def assume_new_account_role():
 
     return access_key, secret_access_key, session_token
 
-def update_accounts_in_dynamodb(account_list) -> None:
+def load_account_table(dynamodb_client) -> dict:
+    """Load every account item currently in the DynamoDB table.
+
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client
+
+    Returns:
+        dict: Account items in DynamoDB-JSON format keyed by account ID, without the run summary item
+    """
+    account_items = {}
+    paginator = dynamodb_client.get_paginator('scan')
+    for page in paginator.paginate(TableName=DDB_TABLE):
+        for item in page['Items']:
+            if item['AccountId']['S'] != RUN_SUMMARY_ID:
+                account_items[item['AccountId']['S']] = item
+    return account_items
+
+def query_active_accounts(dynamodb_client) -> dict:
+    """Load the active accounts from the sparse ActiveRoster index.
+
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client
+
+    Returns:
+        dict: Active accounts with AccountId, AccountName, Environment and AccountStatus, keyed by account ID
+    """
+    active_accounts = {}
+    paginator = dynamodb_client.get_paginator('query')
+    for page in paginator.paginate(
+        TableName=DDB_TABLE,
+        IndexName=ACTIVE_ROSTER_INDEX,
+        KeyConditionExpression='ActiveRoster = :active',
+        ExpressionAttributeValues={':active': {'S': 'ACTIVE'}}
+    ):
+        for item in page['Items']:
+            active_accounts[item['AccountId']['S']] = item
+    return active_accounts
+
+def get_changed_attributes(account, account_item) -> list:
+    """Compare a pulled account with its item in the table, ignoring LastUpdated.
+
+    Args:
+        account (dict): Account information from get_accounts
+        account_item (dict): The account's item in DynamoDB-JSON format
+
+    Returns:
+        list: Names of the attributes whose values differ
+    """
+    changed_attributes = [attribute for attribute in ACCOUNT_ATTRIBUTES \
+        if account_item.get(attribute, {}).get('S') != account[attribute]]
+    if ('ActiveRoster' in account_item) != (account['AccountStatus'] == 'ACTIVE'):
+        changed_attributes.append('ActiveRoster')
+    return changed_attributes
+
+def set_account_attributes(account_item, account) -> None:
+    """Set the pulled account's information on its item.
+
+    ActiveRoster is only set on active accounts, which keeps them, and only them,
+    in the sparse ActiveRoster-index.
+
+    Args:
+        account_item (dict): The account's item in DynamoDB-JSON format, updated in place
+        account (dict): Account information from build_account
+    """
+    for attribute in ACCOUNT_ATTRIBUTES + ['LastUpdated']:
+        account_item[attribute] = {'S': account[attribute]}
+    if account['AccountStatus'] == 'ACTIVE':
+        account_item['ActiveRoster'] = {'S': 'ACTIVE'}
+    else:
+        account_item.pop('ActiveRoster', None)
+
+def batch_write_accounts(dynamodb_client, write_requests) -> int:
+    """Write put and delete requests to the account table 25 at a time.
+
+    A failed batch is reported and the remaining batches are still written.
+
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client
+        write_requests (list): PutRequest and DeleteRequest entries
+
+    Returns:
+        int: Number of requests that could not be written
+    """
+    failed_requests = 0
+    for start in range(0, len(write_requests), 25):
+        request_items = {DDB_TABLE: write_requests[start:start + 25]}
+        attempt = 0
+        try:
+            while request_items:
+                if attempt > 0:
+                    time.sleep(min(TAG_FETCH_MAX_DELAY, TAG_FETCH_BASE_DELAY * 2 ** attempt))
+                response = dynamodb_client.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems')
+                attempt += 1
+                if request_items and attempt >= BATCH_WRITE_MAX_ATTEMPTS:
+                    raise RuntimeError(f"{len(request_items[DDB_TABLE])} items still unprocessed")
+
+        except (ClientError, RuntimeError) as e:
+            failed_requests += len(request_items[DDB_TABLE])
+            error_message = f"Error writing account information to DynamoDB table: {DDB_TABLE}: {str(e)}"
+            error_log.append(error_message)
+            print(error_message)
+
+    return failed_requests
+
+def update_accounts_in_dynamodb(account_list, organization_account_ids) -> dict:
     """Update AWS account information in DynamoDB.
 
+    Only accounts that are new or have changed are written, and accounts that have
+    left the organization are deleted. The run time and counts are kept in a single
+    run summary item rather than in every account's LastUpdated.
+
     Args:
         account_list (list): A list of dictionaries containing account information.
+        organization_account_ids (set): IDs of every account found in the organization,
+            including those whose details could not be read this run
+
+    Returns:
+        tuple: Number of accounts created, changed, unchanged, removed and failed, and the
+        account items as written, or None when the table could not be read
     """
-    # Put account information into DynamoDB table
     session = boto3.Session()
     dynamodb_client = session.client('dynamodb')
+    sync_counts = {'Created': 0, 'Changed': 0, 'Unchanged': 0, 'Removed': 0, 'Failed': 0}
+
+    try:
+        account_items = load_account_table(dynamodb_client)
+    except ClientError as e:
+        error_message = f"Error getting account information from DynamoDB table: {DDB_TABLE}: {str(e)}"
+        error_log.append(error_message)
+        print(error_message)
+        return sync_counts, None
+
+    write_requests = []
+    for account in account_list:
+        account_item = account_items.get(account['AccountId'])
+        if account_item is None:
+            sync_counts['Created'] += 1
+            account_item = {'AccountId': {'S': account['AccountId']}}
+            account_items[account['AccountId']] = account_item
+        elif get_changed_attributes(account, account_item):
+            sync_counts['Changed'] += 1
+        else:
+            sync_counts['Unchanged'] += 1
+            continue
+
+        # Attributes this function doesn't manage are kept on the item
+        set_account_attributes(account_item, account)
+        write_requests.append({'PutRequest': {'Item': account_item}})
+
+    for account_id in account_items.keys() - organization_account_ids:
+        sync_counts['Removed'] += 1
+        account_items.pop(account_id)
+        write_requests.append({'DeleteRequest': {'Key': {'AccountId': {'S': account_id}}}})
+
+    sync_counts['Failed'] = batch_write_accounts(dynamodb_client, write_requests)
+    print('Account table sync:', json.dumps(sync_counts))
 
     try:
-        for account in account_list:
-            dynamodb_client.update_item(
-                Key={
-                    'AccountId': {
-                        'S': account['AccountId'],
-                    }
-                },
-                UpdateExpression="SET Arn = :arn, Email = :email, GlobalRegion = :globalRegion, \
-                    AccountName = :accountName, AccountStatus = :status, JoinedMethod = :joinedMethod, \
-                    JoinedDatetime = :joinedDatetime, Custodian = :custodian, AccountOwner = :owner, \
-                    CostCenter = :costCenter, CostDepartment = :costDepartment, Environment = :environment, \
-                    ParentId = :parentId, ParentType = :parentType, LastUpdated = :lastUpdated",
-                ExpressionAttributeValues={
-                    ':arn': {'S': account['Arn']},
-                    ':email': {'S': account['Email']},
-                    ':globalRegion': {'S': account['GlobalRegion']},
-                    ':accountName': {'S': account['AccountName']},
-                    ':status': {'S': account['AccountStatus']},
-                    ':joinedMethod': {'S': account['JoinedMethod']},
-                    ':joinedDatetime': {'S': account['JoinedDatetime']},
-                    ':custodian': {'S': account['Custodian']},
-                    ':owner': {'S': account['AccountOwner']},
-                    ':costCenter': {'S': account['CostCenter']},
-                    ':costDepartment': {'S': account['CostDepartment']},
-                    ':environment': {'S': account['Environment']},
-                    ':parentId': {'S': account['ParentId']},
-                    ':parentType': {'S': account['ParentType']},
-                    ':lastUpdated': {'S': account['LastUpdated']}
-                },
-                TableName=DDB_TABLE,
-            )
+        dynamodb_client.put_item(
+            TableName=DDB_TABLE,
+            Item={
+                'AccountId': {'S': RUN_SUMMARY_ID},
+                'AccountStatus': {'S': RUN_SUMMARY_ID},
+                'LastUpdated': {'S': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
+                **{name: {'N': str(count)} for name, count in sync_counts.items()}
+            }
+        )
 
     except ClientError as e:
-        error_message = f"Error getting/updating account information in \DynamoDB table: {DDB_TABLE}: {str(e)}"
+        error_message = f"Error updating run summary in DynamoDB table: {DDB_TABLE}: {str(e)}"
         error_log.append(error_message)
         print(error_message)
-    return
 
-def get_accounts(access_key, secret_access_key, session_token) -> list:
+    return sync_counts, account_items
+
+def publish_account_roster(account_items) -> bool:
+    """Publish the compact roster of active accounts to S3.
+
+    The roster is only rewritten when its content changes, so its ETag stays the
+    same and the inventory functions keep using their cached copy.
+
+    Args:
+        account_items (dict): Account items in DynamoDB-JSON format keyed by account ID
+
+    Returns:
+        bool: True if a new roster version was written
+    """
+    roster = [{attribute: account_item.get(attribute, {}).get('S', '') for attribute in ROSTER_ATTRIBUTES} \
+        for account_item in account_items.values() if account_item.get('AccountStatus', {}).get('S') == 'ACTIVE']
+    roster.sort(key=lambda account: account['AccountId'])
+    roster_body = json.dumps({'Accounts': roster}, separators=(',', ':')).encode('utf-8')
+    roster_version = hashlib.sha256(roster_body).hexdigest()
+
+    s3_client = boto3.client('s3')
+    try:
+        current_version = s3_client.head_object(Bucket=ACCOUNT_ROSTER_BUCKET, Key=ACCOUNT_ROSTER_KEY)['Metadata'].get('roster-version')
+    except ClientError:
+        current_version = None
+    if current_version == roster_version:
+        return False
+
+    s3_client.put_object(
+        Bucket=ACCOUNT_ROSTER_BUCKET,
+        Key=ACCOUNT_ROSTER_KEY,
+        Body=gzip.compress(roster_body, mtime=0),
+        ContentType='application/gzip',
+        Metadata={'roster-version': roster_version}
+    )
+    print(f"Published account roster version {roster_version[:12]} with {len(roster)} active accounts")
+    return True
+
+def upsert_account(dynamodb_client, account) -> str:
+    """Write one account to DynamoDB if it is new or has changed.
+
+    Args:
+        dynamodb_client (boto3.client): DynamoDB client
+        account (dict): Account information from build_account
+
+    Returns:
+        string: Created, Changed or Unchanged
+    """
+    response = dynamodb_client.get_item(TableName=DDB_TABLE, Key={'AccountId': {'S': account['AccountId']}})
+    account_item = response.get('Item')
+    if account_item is None:
+        result = 'Created'
+        account_item = {'AccountId': {'S': account['AccountId']}}
+    elif get_changed_attributes(account, account_item):
+        result = 'Changed'
+    else:
+        return 'Unchanged'
+
+    set_account_attributes(account_item, account)
+    dynamodb_client.put_item(TableName=DDB_TABLE, Item=account_item)
+    return result
+
+def get_organization_tree(organizations_client) -> tuple:
+    """Walk the organization's OU tree once from its roots.
+
+    Each parent is listed with one paginated call for its OUs and one for its
+    accounts, so the number of calls grows with the number of OUs rather than
+    the number of accounts.
+
+    Args:
+        organizations_client (boto3.client): Organizations client for the management account
+
+    Returns:
+        tuple: The accounts as returned by list_accounts_for_parent, and a dictionary
+        of each account's ParentId, ParentType and OuPath keyed by account ID
+    """
+    roots_paginator = organizations_client.get_paginator('list_roots')
+    ous_paginator = organizations_client.get_paginator('list_organizational_units_for_parent')
+    accounts_paginator = organizations_client.get_paginator('list_accounts_for_parent')
+
+    # Queue of (parent ID, parent type, OU path of the parent)
+    parent_queue = []
+    for page in roots_paginator.paginate():
+        for root in page['Roots']:
+            parent_queue.append((root['Id'], 'ROOT', root['Name']))
+
+    account_list_output = []
+    account_parents = {}
+    parents_crawled = 0
+    while parent_queue:
+        parent_id, parent_type, ou_path = parent_queue.pop(0)
+        parents_crawled += 1
+
+        for page in ous_paginator.paginate(ParentId=parent_id):
+            for ou in page['OrganizationalUnits']:
+                parent_queue.append((ou['Id'], 'ORGANIZATIONAL_UNIT', f"{ou_path}/{ou['Name']}"))
+
+        for page in accounts_paginator.paginate(ParentId=parent_id):
+            for item in page['Accounts']:
+                account_list_output.append(item)
+                account_parents[item['Id']] = {
+                    'ParentId': parent_id,
+                    'ParentType': parent_type,
+                    'OuPath': ou_path
+                }
+
+    print('Number of roots and OUs crawled:', parents_crawled)
+
+    return account_list_output, account_parents
+
+def list_tags_with_backoff(organizations_client, account_id) -> list:
+    """Get every tag on an account, backing off when Organizations throttles.
+
+    Args:
+        organizations_client (boto3.client): Organizations client with botocore retries turned off
+        account_id (string): ID of the account
+
+    Returns:
+        list: The account's tags
+    """
+    tags = []
+    request = {'ResourceId': account_id}
+    attempt = 0
+    while True:
+        try:
+            add_metric('TagRequests')
+            response = organizations_client.list_tags_for_resource(**request)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TooManyRequestsException' or attempt + 1 >= TAG_FETCH_MAX_ATTEMPTS:
+                raise
+            # Full jitter so the workers don't retry in step
+            delay = random.uniform(0, min(TAG_FETCH_MAX_DELAY, TAG_FETCH_BASE_DELAY * 2 ** attempt))
+            add_metric('Throttles')
+            add_metric('ThrottleWaitSeconds', delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        tags.extend(response['Tags'])
+        if 'NextToken' not in response:
+            return tags
+        request['NextToken'] = response['NextToken']
+        attempt = 0
+
+def get_account_tags(organizations_client, account_ids) -> dict:
+    """Get the tags of many accounts with a bounded number of concurrent requests.
+
+    Args:
+        organizations_client (boto3.client): Organizations client with botocore retries turned off
+        account_ids (list): IDs of the accounts
+
+    Returns:
+        dict: Each account's tags keyed by account ID, or None for an account whose tags could not be read
+    """
+    def fetch_tags(account_id):
+        try:
+            return list_tags_with_backoff(organizations_client, account_id)
+        except ClientError as e:
+            error_message = f"Error getting tags for account {account_id}: {str(e)}"
+            error_log.append(error_message)
+            print(error_message)
+            add_metric('TagFailures')
+            return None
+
+    with ThreadPoolExecutor(max_workers=TAG_FETCH_WORKERS) as executor:
+        return dict(zip(account_ids, executor.map(fetch_tags, account_ids)))
+
+def build_account(item, tags, parent) -> dict:
+    """Build the account information stored in DynamoDB.
+
+    Args:
+        item (dict): The account as returned by Organizations
+        tags (list): The account's tags
+        parent (dict): The account's ParentId, ParentType and OuPath
+
+    Returns:
+        dict: The account information
+    """
+    if item['Id'] in INACTIVE_ACCOUNTS:
+        account_status = "TEST"
+    else:
+        account_status = item['Status']
+
+    # Tag values default to empty so an account never keeps the previous account's tags
+    account = {
+        'Custodian': '',
+        'AccountOwner': '',
+        'CostCenter': '',
+        'CostDepartment': '',
+        'Environment': '',
+        'GlobalRegion': ''
+    }
+    account['AccountId'] =  item['Id']
+    account['Arn'] = item['Arn']
+    account['Email'] = item['Email']
+    account['AccountName'] = item['Name']
+    account['AccountStatus'] = account_status
+    account['JoinedMethod'] = item['JoinedMethod']
+    account['JoinedDatetime'] = (item['JoinedTimestamp']).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Tags of the account (Augment as needed)
+    for tag in tags:
+        if tag['Key'] == "Custodian":
+            account['Custodian'] = tag['Value']
+        elif tag['Key'] == "Owner":
+            account['AccountOwner'] = tag['Value']
+        elif tag['Key'] == "CostCenter":
+            account['CostCenter'] = tag['Value']
+        elif tag['Key'] == "CostDepartment":
+            account['CostDepartment'] = tag['Value']
+        elif tag['Key'] == "Environment":
+            account['Environment'] = (tag['Value']).lower()
+        elif tag['Key'] == "Region":
+            account['GlobalRegion'] = (tag['Value']).lower()
+
+    # Organizations Parent/OU information
+    account.update(parent)
+
+    account['LastUpdated'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Update GlobalRegion based on AccountName if not set via tag
+    if account.get('GlobalRegion', "") == "":
+        if '-apac-' in account['AccountName'].lower():
+            account['GlobalRegion'] = 'apac'
+        elif '-eu-' in account['AccountName'].lower():
+            account['GlobalRegion'] = 'eu'
+        else:
+            account['GlobalRegion'] = 'us'
+
+    return account
+
+def get_accounts(access_key, secret_access_key, session_token) -> tuple:
     """Retrieve a list of AWS accounts.
 
     Args:
@@ -99,82 +496,128 @@ def get_accounts(access_key, secret_access_key, session_token) -> list:
         session_token (string): Session token for the assumed role session
 
     Returns:
-        list: A list of AWS accounts
+        tuple: A list of AWS accounts, and the IDs of every account in the organization
     """
     # Establish Python SDK client for AWS Organizations
     organizations_client = boto3.client('organizations', aws_access_key_id = access_key, aws_secret_access_key = secret_access_key, aws_session_token = session_token)
 
-    # Initialize List and Dictionary for Account info storage
-    account_list = []
-    account = {}
+    # Botocore retries are off for tags so throttling is counted and backed off in list_tags_with_backoff
+    tags_client = boto3.client('organizations', aws_access_key_id = access_key, aws_secret_access_key = secret_access_key, aws_session_token = session_token, \
+        config=Config(retries={'max_attempts': 0}, max_pool_connections=TAG_FETCH_WORKERS))
 
-    # Get initial account list
-    response = organizations_client.list_accounts(MaxResults=20)
+    # Initialize List for Account info storage
+    account_list = []
 
-    account_list_output = response['Accounts']
+    # Get every account along with its parent and OU path from one walk of the OU tree
+    start = time.perf_counter()
+    account_list_output, account_parents = get_organization_tree(organizations_client)
+    run_metrics['OrganizationTreeSeconds'] = round(time.perf_counter() - start, 3)
 
-    # Loop list_accounts until all accounts are added to the account_list_output
-    while 'NextToken' in response:
-        response = organizations_client.list_accounts(MaxResults=20, NextToken=response['NextToken'])
-        accounts = response['Accounts']
-        account_list_output.extend(accounts) # Add new accounts to the account_list_output
+    start = time.perf_counter()
+    account_tags = get_account_tags(tags_client, [item['Id'] for item in account_list_output])
+    run_metrics['TagFetchSeconds'] = round(time.perf_counter() - start, 3)
 
     # Loop through account info in account_list_output create clean account list with needed info
     # Configure account info processing to add/remove info as needed
     for item in account_list_output:
-        if item['Id'] in INACTIVE_ACCOUNTS:
-            account_status = "TEST"
-        else:
-            account_status = item['Status']
-
-        account['AccountId'] =  item['Id']
-        account['Arn'] = item['Arn']
-        account['Email'] = item['Email']
-        account['AccountName'] = item['Name']
-        account['AccountStatus'] = account_status
-        account['JoinedMethod'] = item['JoinedMethod']
-        account['JoinedDatetime'] = (item['JoinedTimestamp']).strftime("%Y-%m-%d %H:%M:%S")
-
-        # Get tags for each account (Augment as needed)
-        tag_response = (organizations_client.list_tags_for_resource(ResourceId=item['Id']))['Tags']
-        for tag in tag_response:
-            if tag['Key'] == "Custodian":
-                account['Custodian'] = tag['Value']
-            elif tag['Key'] == "Owner":
-                account['AccountOwner'] = tag['Value']
-            elif tag['Key'] == "CostCenter":
-                account['CostCenter'] = tag['Value']
-            elif tag['Key'] == "CostDepartment":
-                account['CostDepartment'] = tag['Value']
-            elif tag['Key'] == "Environment":
-                account['Environment'] = (tag['Value']).lower()
-            elif tag['Key'] == "Region":
-                account['GlobalRegion'] = (tag['Value']).lower()
-
-        # Get Organizations Parent/OU information for each account
-        ou_parents_response = organizations_client.list_parents(ChildId=item['Id'])['Parents']
-        parent = ou_parents_response[0] if len(ou_parents_response) > 0 else None
-        if parent is not None:
-            account['ParentId'] = parent['Id']
-            account['ParentType'] = parent['Type']
-
-        account['LastUpdated'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Update GlobalRegion based on AccountName if not set via tag
-        if account.get('GlobalRegion', "") == "":
-            if '-apac-' in account['AccountName'].lower():
-                account['GlobalRegion'] = 'apac'
-            elif '-eu-' in account['AccountName'].lower():
-                account['GlobalRegion'] = 'eu'
-            else:
-                account['GlobalRegion'] = 'us'
-
-        account_list.append(account.copy())
+        # Accounts whose tags could not be read are left as they are in the table
+        if account_tags[item['Id']] is None:
+            continue
+
+        account_list.append(build_account(item, account_tags[item['Id']], account_parents[item['Id']]))
 
     print (json.dumps(account_list))
     print ('Number of accounts:', len(account_list))
 
-    return account_list
+    return account_list, set(account_tags)
+
+def get_event_account_id(event):
+    """Get the account an Organizations CloudTrail event is about.
+
+    Args:
+        event (dict): EventBridge event from Organizations
+
+    Returns:
+        string: The account ID, or None when the event doesn't change an account
+    """
+    detail = event.get('detail', {})
+    event_name = detail.get('eventName')
+    if event_name not in ORGANIZATION_EVENT_NAMES or detail.get('errorCode'):
+        return None
+
+    if event_name == 'CreateAccountResult':
+        create_account_status = detail.get('serviceEventDetails', {}).get('createAccountStatus', {})
+        return create_account_status.get('accountId') if create_account_status.get('state') == 'SUCCEEDED' else None
+
+    request_parameters = detail.get('requestParameters') or {}
+    if event_name in ('TagResource', 'UntagResource'):
+        # Tags on roots, OUs and policies don't change any account
+        resource_id = request_parameters.get('resourceId', '')
+        return resource_id if resource_id.isdigit() else None
+
+    return request_parameters.get('accountId')
+
+def get_account_parent(organizations_client, account_id) -> dict:
+    """Get an account's parent and OU path by walking up from the account.
+
+    Args:
+        organizations_client (boto3.client): Organizations client for the management account
+        account_id (string): ID of the account
+
+    Returns:
+        dict: The account's ParentId, ParentType and OuPath
+    """
+    parent = organizations_client.list_parents(ChildId=account_id)['Parents'][0]
+    ou_names = []
+    ancestor = parent
+    while ancestor['Type'] != 'ROOT':
+        ou_names.append(organizations_client.describe_organizational_unit(OrganizationalUnitId=ancestor['Id'])['OrganizationalUnit']['Name'])
+        ancestor = organizations_client.list_parents(ChildId=ancestor['Id'])['Parents'][0]
+
+    root_names = {root['Id']: root['Name'] for root in organizations_client.list_roots()['Roots']}
+    ou_names.append(root_names[ancestor['Id']])
+
+    return {
+        'ParentId': parent['Id'],
+        'ParentType': parent['Type'],
+        'OuPath': '/'.join(reversed(ou_names))
+    }
+
+def update_account_from_event(event) -> dict:
+    """Update the one account an Organizations event is about.
+
+    Args:
+        event (dict): EventBridge event from Organizations
+
+    Returns:
+        dict: Count of the account's result, Created, Changed, Unchanged or Ignored
+    """
+    account_id = get_event_account_id(event)
+    if account_id is None:
+        print("Event does not change an account, ignoring")
+        return {'Ignored': 1}
+
+    access_key, secret_access_key, session_token = assume_new_account_role()
+    organizations_client = boto3.client('organizations', aws_access_key_id = access_key, aws_secret_access_key = secret_access_key, aws_session_token = session_token)
+
+    item = organizations_client.describe_account(AccountId=account_id)['Account']
+    tags = list_tags_with_backoff(organizations_client, account_id)
+    account = build_account(item, tags, get_account_parent(organizations_client, account_id))
+
+    dynamodb_client = boto3.Session().client('dynamodb')
+    result = upsert_account(dynamodb_client, account)
+    print(f"Account {account_id} {result.lower()} from {event['detail']['eventName']} event")
+
+    event_counts = {result: 1}
+    if ACCOUNT_ROSTER_BUCKET and result != 'Unchanged':
+        # The index is eventually consistent and can lag the write above, so apply the account to it
+        active_accounts = query_active_accounts(dynamodb_client)
+        if account['AccountStatus'] == 'ACTIVE':
+            active_accounts[account_id] = {attribute: {'S': account[attribute]} for attribute in ROSTER_ATTRIBUTES}
+        else:
+            active_accounts.pop(account_id, None)
+        event_counts['RosterPublished'] = int(publish_account_roster(active_accounts))
+    return event_counts
 
 def publish_sns_topic(subject_message, sns_input):
     """Publish a message to an SNS topic.
@@ -202,6 +645,9 @@ def publish_sns_topic(subject_message, sns_input):
 def lambda_handler(event, context):
     """Lambda function to handle account pull events.
 
+    Scheduled events pull every account in the organization, and Organizations
+    CloudTrail events update just the account they are about.
+
     Args:
         event (dict): An event dictionary passed from the trigger source
         context (LambdaContext): The context object for the Lambda function
@@ -210,10 +656,48 @@ def lambda_handler(event, context):
         dict: The response from the Lambda function
     """
     print("Event: ", event, "Context: ", context)
-    access_key, secret_access_key, session_token = assume_new_account_role()
-    account_list = get_accounts(access_key, secret_access_key, session_token)
+    error_log.clear()
+    run_metrics.clear()
+
+    # Organizations events update a single account, the scheduled full pull reconciles the whole table
+    if event.get('source') == 'aws.organizations':
+        try:
+            run_metrics.update(update_account_from_event(event))
+        except ClientError as e:
+            error_message = f"Error updating account from {event.get('detail', {}).get('eventName')} event: {str(e)}"
+            error_log.append(error_message)
+            print(error_message)
+
+        if error_log:
+            publish_sns_topic("Error: Account Event Update", "\n".join(error_log))
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'Message': 'DynamoDB account table updated from Organizations event',
+                'Metrics': run_metrics
+            })
+        }
 
-    update_accounts_in_dynamodb(account_list)
+    access_key, secret_access_key, session_token = assume_new_account_role()
+    account_list, organization_account_ids = get_accounts(access_key, secret_access_key, session_token)
+
+    start = time.perf_counter()
+    sync_counts, account_items = update_accounts_in_dynamodb(account_list, organization_account_ids)
+    run_metrics.update(sync_counts)
+    run_metrics['DynamoDBSeconds'] = round(time.perf_counter() - start, 3)
+
+    if ACCOUNT_ROSTER_BUCKET and account_items is not None:
+        try:
+            run_metrics['RosterPublished'] = int(publish_account_roster(account_items))
+        except ClientError as e:
+            error_message = f"Error publishing account roster to S3 bucket: {ACCOUNT_ROSTER_BUCKET}: {str(e)}"
+            error_log.append(error_message)
+            print(error_message)
+    run_metrics['Accounts'] = len(account_list)
+    if 'ThrottleWaitSeconds' in run_metrics:
+        run_metrics['ThrottleWaitSeconds'] = round(run_metrics['ThrottleWaitSeconds'], 3)
+    print("Run metrics: ", json.dumps(run_metrics))
 
     if error_log:
         error_log_body = ""
@@ -223,5 +707,8 @@ def lambda_handler(event, context):
 
     return {
         'statusCode': 200,
-        'body': 'DynamoDB account table updated with latest account information'
+        'body': json.dumps({
+            'Message': 'DynamoDB account table updated with latest account information',
+            'Metrics': run_metrics
+        })
     }
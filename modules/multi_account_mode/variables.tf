@@ -1,3 +1,15 @@
+variable "account_roster_bucket_arn" {
+  description = "ARN of the S3 bucket to publish the roster of active accounts to, empty to not publish one"
+  type        = string
+  default     = ""
+}
+
+variable "account_roster_bucket_name" {
+  description = "Name of the S3 bucket to publish the roster of active accounts to, empty to not publish one"
+  type        = string
+  default     = ""
+}
+
 variable "dynamodb_accounts_table_name" {
   description = "Name of the DynamoDB table to store AWS accounts"
   type        = string
@@ -25,6 +37,12 @@ variable "management_account_role_arn" {
   type        = string
 }
 
+variable "organization_events" {
+  description = "Update accounts from Organizations events forwarded by the management account, with the full pull run weekly to reconcile"
+  type        = bool
+  default     = false
+}
+
 variable "short_region" {
   description = "Short region code (e.g., usw2 for us-west-2)"
   type        = string
@@ -40,3 +58,9 @@ variable "tags" {
   type        = map(string)
   default     = {}
 }
+
+variable "tag_fetch_workers" {
+  description = "Number of concurrent Organizations tag requests made by the account pull"
+  type        = number
+  default     = 4
+}
@@ -4,10 +4,51 @@ resource "aws_dynamodb_table" "resource_cleanup_savings_table" {
   billing_mode = "PAY_PER_REQUEST"
   hash_key     = "ResourceId"
 
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   attribute {
     name = "ResourceId"
     type = "S"
   }
 
+  point_in_time_recovery {
+    enabled = var.point_in_time_recovery
+  }
+
+  tags = var.tags
+}
+
+# #### Resource Cleanup Savings Rollups TABLE #### #
+resource "aws_dynamodb_table" "resource_cleanup_savings_rollups_table" {
+  name         = "resource-cleanup-savings-rollups-${var.env}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "RollupKey"
+
+  attribute {
+    name = "RollupKey"
+    type = "S"
+  }
+
+  tags = var.tags
+}
+
+# #### Resource Cost Time-Series TABLE #### #
+resource "aws_dynamodb_table" "resource_cost_timeseries_table" {
+  name         = "resource-cost-timeseries-${var.env}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "SeriesKey"
+  range_key    = "Period"
+
+  attribute {
+    name = "SeriesKey"
+    type = "S"
+  }
+
+  attribute {
+    name = "Period"
+    type = "S"
+  }
+
   tags = var.tags
 }
@@ -17,3 +17,28 @@ output "resource_cleanup_savings_table_arn" {
   description = "DynamoDB table arn for resource cleanup savings"
   value       = aws_dynamodb_table.resource_cleanup_savings_table.arn
 }
+
+output "resource_cleanup_savings_table_stream_arn" {
+  description = "DynamoDB stream arn for resource cleanup savings"
+  value       = aws_dynamodb_table.resource_cleanup_savings_table.stream_arn
+}
+
+output "resource_cleanup_savings_rollups_table_name" {
+  description = "DynamoDB table name for resource cleanup savings rollups"
+  value       = aws_dynamodb_table.resource_cleanup_savings_rollups_table.id
+}
+
+output "resource_cleanup_savings_rollups_table_arn" {
+  description = "DynamoDB table arn for resource cleanup savings rollups"
+  value       = aws_dynamodb_table.resource_cleanup_savings_rollups_table.arn
+}
+
+output "resource_cost_timeseries_table_name" {
+  description = "DynamoDB table name for daily resource cost time-series"
+  value       = aws_dynamodb_table.resource_cost_timeseries_table.id
+}
+
+output "resource_cost_timeseries_table_arn" {
+  description = "DynamoDB table arn for daily resource cost time-series"
+  value       = aws_dynamodb_table.resource_cost_timeseries_table.arn
+}
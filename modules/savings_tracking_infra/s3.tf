@@ -22,4 +22,33 @@ resource "aws_s3_bucket_server_side_encryption_configuration" "account_storage_b
       sse_algorithm = "AES256"
     }
   }
-}
\ No newline at end of file
+}
+
+# Reports are written with multipart uploads, clear out any that were never completed
+resource "aws_s3_bucket_lifecycle_configuration" "account_storage_bucket_lifecycle" {
+  bucket = aws_s3_bucket.account_storage_bucket.id
+
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+
+    filter {}
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+
+  rule {
+    id     = "expire-table-exports"
+    status = "Enabled"
+
+    filter {
+      prefix = "ddb_exports/"
+    }
+
+    expiration {
+      days = 7
+    }
+  }
+}
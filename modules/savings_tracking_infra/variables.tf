@@ -9,6 +9,12 @@ variable "env" {
   default     = "dev"
 }
 
+variable "point_in_time_recovery" {
+  description = "Enable point-in-time recovery on the savings table, required to report from table exports"
+  type        = bool
+  default     = false
+}
+
 variable "short_region" {
   description = "Short region code (e.g., usw2 for us-west-2)"
   type        = string
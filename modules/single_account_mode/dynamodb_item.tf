@@ -12,6 +12,7 @@ resource "aws_dynamodb_table_item" "DDB_Item_Target_Account" {
     "AccountName": {"S": "${var.target_account_name}"},
     "AccountOwner": {"S": ""},
     "AccountStatus": {"S": "ACTIVE"},
+    "ActiveRoster": {"S": "ACTIVE"},
     "Arn": {"S": ""},
     "CostCenter": {"S": ""},
     "CostDepartment": {"S": ""},
@@ -22,6 +23,7 @@ resource "aws_dynamodb_table_item" "DDB_Item_Target_Account" {
     "JoinedDatetime": {"S": ""},
     "JoinedMethod": {"S": ""},
     "LastUpdated": {"S": ""},
+    "OuPath": {"S": ""},
     "ParentId": {"S": ""},
     "ParentType": {"S": ""}
   }